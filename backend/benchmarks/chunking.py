@@ -0,0 +1,58 @@
+"""Compare the single-pass chunker against the previous implementation.
+
+Run from the backend directory:
+
+    python -m benchmarks.chunking --size-mb 5
+"""
+import argparse
+import json
+import time
+from documents.chunking import Chunker
+from .corpus import synthetic_text
+from .legacy_chunker import LegacyChunker
+
+def _time(function, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=2.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the new chunker')
+    args = parser.parse_args()
+
+    text = synthetic_text(int(args.size_mb * 1024 * 1024), page_markers=True)
+    report = {'input_chars': len(text)}
+
+    seconds, chunks = _time(lambda: Chunker(500, 50).chunk(text), args.repeat)
+    report['single_pass'] = {
+        'seconds': round(seconds, 4),
+        'chunks': len(chunks),
+        'mb_per_second': round(len(text) / 1048576 / seconds, 2),
+        'max_chunk_chars': max(len(chunk.text) for chunk in chunks),
+        'pages': chunks[-1].page_end if chunks else 0
+    }
+
+    if not args.skip_legacy:
+        seconds, legacy_chunks = _time(lambda: LegacyChunker().chunk_text(text, 500, 50), args.repeat)
+        report['legacy'] = {
+            'seconds': round(seconds, 4),
+            'chunks': len(legacy_chunks),
+            'mb_per_second': round(len(text) / 1048576 / seconds, 2),
+            'max_chunk_chars': max(len(chunk) for chunk in legacy_chunks)
+        }
+        report['speedup'] = round(report['legacy']['seconds'] / report['single_pass']['seconds'], 1)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Synthetic benchmark corpora: deterministic prose written as TXT, PDF or DOCX."""
+import itertools
+import os
+import random
+import re
+from typing import List
+
+FORMATS = ('txt', 'pdf', 'docx')
+
+_COMMON_WORDS = (
+    "the of and to in is that for it as with was on be by this are from at "
+    "which an or have not were has their can more also its these other been"
+).split()
+_SYLLABLES = "ka lo mi ne ru sa ti vo ze ba de fi go hu ja ke li mo nu pa re si to".split()
+_LINES_PER_PAGE = 45
+_LINE_WIDTH = 95
+
+
+def _vocabulary(size: int = 4000) -> List[str]:
+    """Pseudo-words built from syllables, so retrieval has distinctive terms to match."""
+    words = [''.join(parts) for parts in itertools.product(_SYLLABLES, repeat=3)]
+    return words[:size]
+
+
+_VOCABULARY = _COMMON_WORDS + _vocabulary()
+# Zipf-like weights: common words dominate, as in real prose
+_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(_VOCABULARY))]
+
+
+def synthetic_text(size_bytes: int, seed: int = 0, page_markers: bool = False) -> str:
+    """Build paragraphed prose of roughly `size_bytes` characters.
+
+    With `page_markers`, "=== Page N ===" lines are inserted every ~3000
+    characters, as DocumentProcessor does for PDFs.
+    """
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    page = 1
+    while total < size_bytes:
+        if page_markers and total >= page * 3000:
+            page += 1
+            parts.append(f"\n=== Page {page} ===\n")
+        words = rng.choices(_VOCABULARY, weights=_WEIGHTS, k=rng.randint(6, 24))
+        sentence = ' '.join(words).capitalize() + rng.choice('..?!') + (' ' if rng.random() < 0.9 else '\n\n')
+        parts.append(sentence)
+        total += len(sentence)
+    return ''.join(parts)
+
+
+def synthetic_questions(count: int, seed: int = 1) -> List[str]:
+    """Short questions over the corpus vocabulary."""
+    rng = random.Random(seed)
+    distinctive = _VOCABULARY[len(_COMMON_WORDS):len(_COMMON_WORDS) + 500]
+    return [
+        f"What does the document say about {' '.join(rng.sample(distinctive, rng.randint(2, 4)))}?"
+        for _ in range(count)
+    ]
+
+
+def parse_size(value: str) -> int:
+    """Parse sizes such as '10KB', '1MB' or '512' into bytes."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', value.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    number, unit = match.groups()
+    multiplier = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3}[unit]
+    return int(float(number) * multiplier)
+
+
+def format_size(size_bytes: int) -> str:
+    for unit, multiplier in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if size_bytes >= multiplier and size_bytes % multiplier == 0:
+            return f"{size_bytes // multiplier}{unit}"
+    return f"{size_bytes}B"
+
+
+def build_corpus(directory: str, formats: List[str], sizes: List[int], seed: int = 0) -> List[str]:
+    """Write one file per format and size, reusing files generated by an earlier run."""
+    os.makedirs(directory, exist_ok=True)
+    writers = {'txt': write_txt, 'pdf': write_pdf, 'docx': write_docx}
+
+    paths = []
+    for size in sizes:
+        text = None
+        for file_format in formats:
+            path = os.path.join(directory, f"synthetic_{format_size(size)}_seed{seed}.{file_format}")
+            if not os.path.exists(path):
+                if text is None:
+                    text = synthetic_text(size, seed)
+                writers[file_format](path, text)
+            paths.append(path)
+    return paths
+
+
+def write_txt(path: str, text: str) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def write_docx(path: str, text: str) -> None:
+    import docx
+
+    document = docx.Document()
+    for number, paragraph in enumerate(p.strip() for p in text.split('\n\n')):
+        if not paragraph:
+            continue
+        if number % 20 == 0:
+            document.add_heading(f"Section {number // 20 + 1}", level=1)
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_pdf(path: str, text: str) -> None:
+    """Write text as an uncompressed Helvetica PDF, ~45 lines of ~95 characters per page."""
+    pages = list(_paginate(text))
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 770 Td\n" + ''.join(f"({_pdf_escape(line)}) Tj T*\n" for line in lines) + "ET"
+        stream = stream.encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b' '.join(page_refs), len(page_refs))
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+
+
+def _paginate(text: str):
+    lines = []
+    for paragraph in text.split('\n\n'):
+        line = ''
+        for word in paragraph.split():
+            if line and len(line) + 1 + len(word) > _LINE_WIDTH:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        if line:
+            lines.append(line)
+        lines.append('')
+    for start in range(0, len(lines), _LINES_PER_PAGE):
+        yield lines[start:start + _LINES_PER_PAGE]
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
@@ -0,0 +1,129 @@
+"""The chunker RAGEngine used before the single-pass rewrite, kept as a benchmark baseline."""
+import re
+from typing import List
+
+
+class LegacyChunker:
+    def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
+        """Split text into overlapping chunks with improved logic."""
+        if not text or not text.strip():
+            return []
+
+        # Clean and normalize the text
+        text = self._clean_text(text)
+
+        # Try sentence-based chunking first
+        chunks = self._chunk_by_sentences(text, chunk_size, overlap)
+
+        # If sentence-based chunking fails or produces too few chunks, use paragraph-based
+        if len(chunks) <= 1 and len(text) > chunk_size * 2:
+            chunks = self._chunk_by_paragraphs(text, chunk_size, overlap)
+
+        # If still not good, use word-based chunking as fallback
+        if len(chunks) <= 1 and len(text) > chunk_size * 2:
+            chunks = self._chunk_by_words(text, chunk_size, overlap)
+
+        # Filter out very short chunks
+        chunks = [chunk for chunk in chunks if len(chunk.strip()) > 50]
+
+        # Return original text if all methods fail
+        return chunks if chunks else [text]
+
+    def _clean_text(self, text: str) -> str:
+        """Clean and normalize text."""
+        # Replace multiple whitespace characters with single space
+        text = re.sub(r'\s+', ' ', text)
+
+        # Remove excessive newlines but keep paragraph breaks
+        text = re.sub(r'\n\s*\n', '\n\n', text)
+
+        # Fix common PDF extraction issues
+        text = text.replace('\n', ' ')  # Convert newlines to spaces
+        text = re.sub(r'\s+', ' ', text)  # Multiple spaces to single space
+
+        return text.strip()
+
+    def _chunk_by_sentences(self, text: str, chunk_size: int, overlap: int) -> List[str]:
+        """Chunk text by sentences."""
+        # More comprehensive sentence splitting
+        sentences = re.split(r'(?<=[.!?])\s+', text)
+
+        if len(sentences) <= 1:
+            return []
+
+        chunks = []
+        current_chunk = ""
+
+        for sentence in sentences:
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+
+            # Check if adding this sentence would exceed chunk size
+            if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
+                chunks.append(current_chunk.strip())
+
+                # Add overlap from the end of current chunk
+                if overlap > 0:
+                    words = current_chunk.split()
+                    overlap_words = words[-min(overlap, len(words)):]
+                    current_chunk = ' '.join(overlap_words) + ' ' + sentence
+                else:
+                    current_chunk = sentence
+            else:
+                current_chunk += (' ' if current_chunk else '') + sentence
+
+        # Add the last chunk
+        if current_chunk.strip():
+            chunks.append(current_chunk.strip())
+
+        return chunks
+
+    def _chunk_by_paragraphs(self, text: str, chunk_size: int, overlap: int) -> List[str]:
+        """Chunk text by paragraphs."""
+        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+
+        if len(paragraphs) <= 1:
+            return []
+
+        chunks = []
+        current_chunk = ""
+
+        for paragraph in paragraphs:
+            if len(current_chunk) + len(paragraph) > chunk_size and current_chunk:
+                chunks.append(current_chunk.strip())
+
+                # Add overlap
+                if overlap > 0:
+                    words = current_chunk.split()
+                    overlap_words = words[-min(overlap, len(words)):]
+                    current_chunk = ' '.join(overlap_words) + ' ' + paragraph
+                else:
+                    current_chunk = paragraph
+            else:
+                current_chunk += ('\n\n' if current_chunk else '') + paragraph
+
+        if current_chunk.strip():
+            chunks.append(current_chunk.strip())
+
+        return chunks
+
+    def _chunk_by_words(self, text: str, chunk_size: int, overlap: int) -> List[str]:
+        """Chunk text by words (fallback method)."""
+        words = text.split()
+
+        if len(words) <= 10:  # Too few words to chunk meaningfully
+            return []
+
+        chunks = []
+        # Convert character-based chunk_size to approximate word count
+        # Rough estimate: 6 chars per word
+        words_per_chunk = max(50, chunk_size // 6)
+        overlap_words = max(5, overlap // 6)
+
+        for i in range(0, len(words), words_per_chunk - overlap_words):
+            chunk_words = words[i:i + words_per_chunk]
+            if len(chunk_words) > 10:  # Only include chunks with sufficient content
+                chunks.append(' '.join(chunk_words))
+
+        return chunks
@@ -0,0 +1,290 @@
+"""End-to-end ingestion and question-answering benchmark.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --sizes 10KB,1MB,50MB --output bench.json
+
+Every document in the corpus goes through the same stages as an upload
+(extract, chunk, embed, store) and is then queried (similarity search,
+answer generation, full answer_question). By default the embedding model,
+vector store and DeepSeek client are replaced by offline stand-ins, so the
+run needs no network or GPU. The store and query stages write to a
+throwaway test database created from DATABASES['default'].
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'document_intelligence.settings')
+
+# Extraction and chunking always run: every later stage needs their output
+STAGES = ('extract', 'chunk', 'embed', 'store', 'query')
+_DATABASE_STAGES = ('store', 'query')
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--formats', default='txt,pdf,docx', help='Comma-separated synthetic formats')
+    parser.add_argument('--sizes', default='10KB,1MB', help='Comma-separated text sizes, e.g. 10KB,1MB,50MB')
+    parser.add_argument('--fixtures', help='Directory of real .txt/.pdf/.docx files to benchmark as well')
+    parser.add_argument('--corpus-dir', help='Where synthetic files are written and reused (default: a temp dir)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"Comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument('--queries', type=int, default=50, help='Questions asked in the query stage')
+    parser.add_argument('--num-chunks', type=int, default=3)
+    parser.add_argument('--retrieval-mode', choices=['vector', 'hybrid'], default='vector')
+    parser.add_argument('--embedder', choices=['stub', 'model'], default='stub',
+                        help="'stub' hashes words; 'model' loads EMBEDDING_MODEL_NAME on EMBEDDING_BACKEND")
+    parser.add_argument('--vector-store', choices=['numpy', 'configured'], default='numpy',
+                        help="'numpy' uses a temporary embedded store; 'configured' uses VECTOR_STORE_BACKEND")
+    parser.add_argument('--llm-latency-ms', type=float, default=200.0, help='Stub LLM time to first token')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=0.0, help='Stub LLM generation speed (0 = instant)')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+
+def _open_fixture(path: str):
+    """Open a corpus file the way DocumentProcessor sees a large upload spooled to disk."""
+    from django.core.files import File
+
+    file = File(open(path, 'rb'), name=os.path.basename(path))
+    file.temporary_file_path = lambda: path
+    return file
+
+
+def _reset_peak_rss() -> None:
+    # Linux resets VmHWM (peak resident set) when "5" is written to clear_refs
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextmanager
+def _stage(results: Dict[str, Any], name: str):
+    _reset_peak_rss()
+    stats = {}
+    started = time.perf_counter()
+    yield stats
+    stats['seconds'] = round(time.perf_counter() - started, 4)
+    stats['peak_rss_mb'] = _peak_rss_mb()
+    results[name] = stats
+
+
+def _rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds > 0 else 0.0
+
+
+def _latency_summary(samples: List[float]) -> Dict[str, Any]:
+    import numpy as np
+
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples) * 1000.0
+    return {
+        'count': len(samples),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3)
+    }
+
+
+def _build_engine(args, work_dir: str):
+    from documents.rag_engine import RAGEngine
+    from documents.vector_store import NumpyVectorStore
+    from .stubs import StubEmbedder, StubLLMClient
+
+    engine = RAGEngine()
+    if args.embedder == 'stub':
+        engine._embedding_model = StubEmbedder()
+    if args.vector_store == 'numpy':
+        engine._vector_store = NumpyVectorStore(os.path.join(work_dir, 'vector_store'))
+    engine._client = StubLLMClient(
+        latency_ms=args.llm_latency_ms,
+        tokens_per_second=args.llm_tokens_per_second
+    )
+    return engine
+
+
+def _benchmark_document(engine, path: str, stages: List[str]) -> Dict[str, Any]:
+    from documents.document_processor import DocumentProcessor
+    from documents.models import Document
+
+    report = {
+        'file': os.path.basename(path),
+        'format': os.path.splitext(path)[1].lstrip('.').lower(),
+        'file_bytes': os.path.getsize(path),
+        'stages': {}
+    }
+    results = report['stages']
+
+    with _stage(results, 'extract') as stats:
+        with _open_fixture(path) as source:
+            text, pages = DocumentProcessor.extract_text_from_file(source)
+    stats['mb_per_second'] = _rate(report['file_bytes'] / 1048576, stats['seconds'])
+    report['text_chars'] = len(text)
+    report['pages'] = pages
+
+    with _stage(results, 'chunk') as stats:
+        chunks = engine.chunk_document(text)
+    stats['chunks'] = len(chunks)
+    stats['chunks_per_second'] = _rate(len(chunks), stats['seconds'])
+
+    if 'embed' in stages:
+        with _stage(results, 'embed') as stats:
+            engine.generate_embeddings([chunk.text for chunk in chunks])
+        stats['embeddings'] = len(chunks)
+        stats['embeddings_per_second'] = _rate(len(chunks), stats['seconds'])
+
+    if 'store' in stages:
+        document = Document.objects.create(
+            title=report['file'],
+            file_path=f"benchmarks/{report['file']}",
+            file_type=report['format'],
+            file_size=report['file_bytes'],
+            pages=pages,
+            processing_status='completed'
+        )
+        report['document_id'] = document.id
+        with _stage(results, 'store') as stats:
+            stats.update(engine.store_document_embeddings(document, chunks))
+        stats['chunks_per_second'] = _rate(stats['chunks'], stats['seconds'])
+
+    return report
+
+
+def _benchmark_queries(engine, args) -> Dict[str, Any]:
+    from .corpus import synthetic_questions
+
+    questions = synthetic_questions(args.queries, seed=args.seed + 1)
+    search_seconds = []
+    answer_seconds = []
+    end_to_end_seconds = []
+
+    _reset_peak_rss()
+    for question in questions:
+        started = time.perf_counter()
+        chunks = engine.similarity_search(question, None, args.num_chunks, mode=args.retrieval_mode)
+        search_seconds.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        engine.generate_answer(question, chunks, 'all uploaded documents', multi_document=True)
+        answer_seconds.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        engine.answer_question(question, None, args.num_chunks, retrieval_mode=args.retrieval_mode)
+        end_to_end_seconds.append(time.perf_counter() - started)
+
+    return {
+        'retrieval_mode': args.retrieval_mode,
+        'num_chunks': args.num_chunks,
+        'similarity_search': _latency_summary(search_seconds),
+        'generate_answer': _latency_summary(answer_seconds),
+        'answer_question': _latency_summary(end_to_end_seconds),
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    from django.test.utils import override_settings, setup_databases, teardown_databases
+    from .corpus import FORMATS, build_corpus, parse_size
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+    formats = [f.strip().lower() for f in args.formats.split(',') if f.strip()]
+    if set(formats) - set(FORMATS):
+        raise SystemExit(f"Formats must be among {', '.join(FORMATS)}")
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'embedder': args.embedder,
+            'vector_store': args.vector_store,
+            'llm_latency_ms': args.llm_latency_ms,
+            'llm_tokens_per_second': args.llm_tokens_per_second,
+            'seed': args.seed
+        },
+        'documents': []
+    }
+
+    with tempfile.TemporaryDirectory(prefix='rag-bench-') as work_dir:
+        corpus_started = time.perf_counter()
+        paths = build_corpus(args.corpus_dir or os.path.join(work_dir, 'corpus'), formats, sizes, seed=args.seed)
+        if args.fixtures:
+            paths += sorted(
+                os.path.join(args.fixtures, name) for name in os.listdir(args.fixtures)
+                if os.path.splitext(name)[1].lower() in ('.txt', '.pdf', '.docx')
+            )
+        report['environment']['corpus_build_seconds'] = round(time.perf_counter() - corpus_started, 3)
+
+        needs_database = any(stage in _DATABASE_STAGES for stage in stages)
+        old_config = setup_databases(verbosity=0, interactive=False) if needs_database else None
+
+        try:
+            # Repeated questions must reach the LLM, not the answer cache
+            with override_settings(ANSWER_CACHE_ENABLED=False, RETRIEVAL_MODE=args.retrieval_mode):
+                engine = _build_engine(args, work_dir)
+
+                started = time.perf_counter()
+                engine.embedding_model
+                report['environment']['model_load_seconds'] = round(time.perf_counter() - started, 3)
+
+                for path in paths:
+                    print(f"Benchmarking {os.path.basename(path)}", file=sys.stderr)
+                    report['documents'].append(_benchmark_document(engine, path, stages))
+
+                if 'query' in stages:
+                    print(f"Running {args.queries} queries", file=sys.stderr)
+                    report['queries'] = _benchmark_queries(engine, args)
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+
+    report['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    report['children_peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    return report
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    django.setup()
+
+    report = run(args)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
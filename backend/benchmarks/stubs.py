@@ -0,0 +1,88 @@
+"""Offline stand-ins for the embedding model and the DeepSeek client."""
+import re
+import time
+import zlib
+from types import SimpleNamespace
+from typing import List
+import numpy as np
+
+_WORD = re.compile(r'\w+')
+_WORD_PIECE = re.compile(r'\w{1,4}|[^\w\s]')
+
+
+class StubTokenizer:
+    """Rough WordPiece stand-in: one token per four word characters or punctuation mark."""
+
+    def tokenize(self, text: str) -> List[str]:
+        return _WORD_PIECE.findall(text)
+
+
+class StubEmbedder:
+    """Deterministic hashed bag-of-words embeddings with the SentenceTransformer `encode` interface.
+
+    Similar texts get similar vectors, so retrieval results are meaningful,
+    but encoding costs microseconds instead of a transformer forward pass.
+    """
+
+    def __init__(self, dimension: int = 384, latency_ms_per_text: float = 0.0):
+        self.dimension = dimension
+        self.latency_ms_per_text = latency_ms_per_text
+        self.tokenizer = StubTokenizer()
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        if self.latency_ms_per_text:
+            time.sleep(self.latency_ms_per_text * len(texts) / 1000.0)
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = [zlib.crc32(word.encode('utf-8')) % self.dimension for word in _WORD.findall(text.lower())]
+            if buckets:
+                vectors[row] = np.bincount(buckets, minlength=self.dimension)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class StubLLMClient:
+    """Mimics `openai.OpenAI` for `chat.completions.create`, with configurable latency.
+
+    A call waits `latency_ms` before the first token, then emits
+    `completion_tokens` tokens at `tokens_per_second`; streaming calls yield
+    them one chunk at a time.
+    """
+
+    def __init__(self, latency_ms: float = 200.0, tokens_per_second: float = 0.0, completion_tokens: int = 120):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model: str, messages: List[dict], stream: bool = False, **kwargs):
+        self.calls += 1
+        prompt_tokens = sum(len(message['content'].split()) for message in messages)
+        tokens = [f"word{i} " for i in range(self.completion_tokens)]
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(tokens),
+            total_tokens=prompt_tokens + len(tokens)
+        )
+
+        if stream:
+            return self._stream(tokens)
+
+        time.sleep(self.latency_ms / 1000.0 + self._generation_seconds(len(tokens)))
+        message = SimpleNamespace(role='assistant', content='The document states that ' + ''.join(tokens).strip() + '.')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')], usage=usage)
+
+    def _stream(self, tokens: List[str]):
+        time.sleep(self.latency_ms / 1000.0)
+        for token in tokens:
+            time.sleep(self._generation_seconds(1))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token), finish_reason=None)])
+
+    def _generation_seconds(self, token_count: int) -> float:
+        return token_count / self.tokens_per_second if self.tokens_per_second else 0.0
@@ -22,14 +22,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'documents',
 ]
 
 MIDDLEWARE = [
+    'documents.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  
+    'documents.middleware.WhiteNoiseMiddleware',  # Async-capable WhiteNoise
     'corsheaders.middleware.CorsMiddleware',  
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,9 +41,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')  # After SecurityMiddleware
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760
+# Larger uploads are spooled to a temporary file instead of held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', '2621440'))  # 2.5MB
 ROOT_URLCONF = 'document_intelligence.urls'
 
 TEMPLATES = [
@@ -138,3 +140,126 @@ CSRF_TRUSTED_ORIGINS = CORS_ALLOWED_ORIGINS
 DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY')
 DEEPSEEK_API_URL = "https://api.deepseek.com"
 
+
+# Ingestion job queue
+# Uploads are processed by `python manage.py run_ingestion_worker`, which claims
+# jobs from Postgres with SELECT ... FOR UPDATE SKIP LOCKED.
+INGESTION_MAX_ATTEMPTS = int(os.getenv('INGESTION_MAX_ATTEMPTS', '3'))
+INGESTION_POLL_INTERVAL = float(os.getenv('INGESTION_POLL_INTERVAL', '2.0'))
+INGESTION_STALE_AFTER_SECONDS = int(os.getenv('INGESTION_STALE_AFTER_SECONDS', '900'))
+# Workers claim up to INGESTION_CLAIM_BATCH_SIZE jobs at once, extract them in
+# INGESTION_EXTRACTION_WORKERS processes and embed their chunks together.
+INGESTION_CLAIM_BATCH_SIZE = int(os.getenv('INGESTION_CLAIM_BATCH_SIZE', '16'))
+INGESTION_EXTRACTION_WORKERS = int(os.getenv('INGESTION_EXTRACTION_WORKERS', str(os.cpu_count() or 1)))
+# Extraction and embedding metrics live in the worker process; scrape them here
+INGESTION_METRICS_PORT = int(os.getenv('INGESTION_METRICS_PORT', '0'))
+
+# Streaming ingestion
+# Files of at least INGESTION_STREAM_MIN_BYTES are read INGESTION_STREAM_WINDOW_BYTES
+# (or a PDF page range) at a time, and their chunks are embedded and stored
+# INGESTION_STREAM_BATCH_SIZE at a time, so worker memory does not grow with the file.
+INGESTION_STREAM_MIN_BYTES = int(os.getenv('INGESTION_STREAM_MIN_BYTES', str(20 * 1024 * 1024)))
+INGESTION_STREAM_WINDOW_BYTES = int(os.getenv('INGESTION_STREAM_WINDOW_BYTES', str(1024 * 1024)))
+INGESTION_STREAM_BATCH_SIZE = int(os.getenv('INGESTION_STREAM_BATCH_SIZE', '256'))
+
+# Query embedding micro-batching
+# Concurrent questions are collected for up to EMBEDDING_BATCH_WAIT_MS (or until
+# EMBEDDING_BATCH_MAX_SIZE texts are waiting) and encoded in a single call.
+# On by default only with gunicorn's uvicorn (ASGI) workers: a sync worker
+# serves one request at a time, so each query would just wait out the window.
+_ASYNC_WORKERS = 'uvicorn' in os.getenv('GUNICORN_WORKER_CLASS', 'sync').lower()
+EMBEDDING_BATCH_ENABLED = os.getenv('EMBEDDING_BATCH_ENABLED', 'true' if _ASYNC_WORKERS else 'false').lower() == 'true'
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '32'))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '3'))
+
+# Semantic answer cache
+# Questions whose embedding is at least ANSWER_CACHE_SIMILARITY_THRESHOLD cosine
+# similar to a cached question about the same document reuse its answer.
+ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv('ANSWER_CACHE_SIMILARITY_THRESHOLD', '0.95'))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '1024'))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv('ANSWER_CACHE_TTL_SECONDS', '3600'))
+
+# Vector store
+# 'chroma' uses the remote ChromaDB collection; 'numpy' keeps memory-mapped
+# per-document .npy files under VECTOR_STORE_PATH and searches in-process.
+VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'chroma')
+VECTOR_STORE_PATH = os.getenv('VECTOR_STORE_PATH', os.path.join(BASE_DIR, 'vector_store'))
+CHROMA_HOST = os.getenv('CHROMA_HOST', 'chroma-db.zeabur.app')
+CHROMA_PORT = int(os.getenv('CHROMA_PORT', '8000'))
+CHROMA_COLLECTION = os.getenv('CHROMA_COLLECTION', 'document_embeddings')
+# Keep chunk text in the vector store as well as in Postgres. With false the
+# vector store holds ids, vectors and document ids only, and search reads the
+# text of its hits from DocumentChunk; `manage.py strip_vector_text` drops the
+# text already stored.
+VECTOR_STORE_STORE_TEXT = os.getenv('VECTOR_STORE_STORE_TEXT', 'true').lower() == 'true'
+
+# Retrieval
+# 'vector' searches embeddings only; 'hybrid' also runs a Postgres full-text
+# query over chunk content and merges both rankings with reciprocal rank fusion.
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'vector')
+RETRIEVAL_CANDIDATE_MULTIPLIER = int(os.getenv('RETRIEVAL_CANDIDATE_MULTIPLIER', '4'))
+RETRIEVAL_RRF_K = int(os.getenv('RETRIEVAL_RRF_K', '60'))
+# Maximal marginal relevance: re-rank RETRIEVAL_CANDIDATE_MULTIPLIER x k candidates
+# for diversity; lambda 1.0 is pure relevance, 0.0 pure diversity.
+RETRIEVAL_MMR_ENABLED = os.getenv('RETRIEVAL_MMR_ENABLED', 'false').lower() == 'true'
+RETRIEVAL_MMR_LAMBDA = float(os.getenv('RETRIEVAL_MMR_LAMBDA', '0.5'))
+RETRIEVAL_THREADS = int(os.getenv('RETRIEVAL_THREADS', '4'))
+FULL_TEXT_SEARCH_CONFIG = os.getenv('FULL_TEXT_SEARCH_CONFIG', 'english')
+
+# PDF extraction
+# PDFs with at least PDF_PARALLEL_MIN_PAGES pages are extracted by a pool of
+# PDF_EXTRACTION_WORKERS processes, each handling a slice of the page range.
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '16'))
+
+# Embeddings
+# Chunk embeddings are cached in Postgres by content hash and model name, so
+# repeated text (duplicate uploads, shared boilerplate) is never re-encoded.
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+# 'torch' runs SentenceTransformer; 'onnx' runs the same model on ONNX Runtime,
+# exported once to EMBEDDING_ONNX_PATH and int8-quantized with EMBEDDING_ONNX_QUANTIZE.
+# Check agreement with `python manage.py validate_embedding_backend`.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_ENCODE_BATCH_SIZE = int(os.getenv('EMBEDDING_ENCODE_BATCH_SIZE', '32'))
+EMBEDDING_ONNX_PATH = os.getenv('EMBEDDING_ONNX_PATH', os.path.join(BASE_DIR, 'onnx_models'))
+EMBEDDING_ONNX_QUANTIZE = os.getenv('EMBEDDING_ONNX_QUANTIZE', 'true').lower() == 'true'
+EMBEDDING_ONNX_THREADS = int(os.getenv('EMBEDDING_ONNX_THREADS', '0'))
+
+# Prompt context
+# Retrieved chunks are merged where they are neighbours, stripped of repeated
+# overlap and packed into about CONTEXT_TOKEN_BUDGET tokens (0 = no limit).
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '3000'))
+
+# Chunking
+# Chunks hold up to CHUNK_SIZE characters with CHUNK_OVERLAP words shared
+# between neighbours. With CHUNK_SIZE_UNIT='tokens' they are sized in
+# embedding-model tokens instead, capped at CHUNK_MAX_TOKENS.
+CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '500'))
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '50'))
+CHUNK_SIZE_UNIT = os.getenv('CHUNK_SIZE_UNIT', 'chars')
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '254'))
+
+# Async question path
+# Under an ASGI worker, /api/ask/ awaits the LLM on the event loop and runs
+# embedding and retrieval on a pool of ASYNC_OFFLOAD_THREADS threads.
+ASYNC_OFFLOAD_THREADS = int(os.getenv('ASYNC_OFFLOAD_THREADS', '8'))
+
+# Batch questions
+# /api/ask/batch/ accepts up to ASK_BATCH_MAX_QUESTIONS questions and keeps at
+# most ASK_BATCH_CONCURRENCY DeepSeek calls in flight per request.
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv('ASK_BATCH_MAX_QUESTIONS', '100'))
+ASK_BATCH_CONCURRENCY = int(os.getenv('ASK_BATCH_CONCURRENCY', '8'))
+
+# Document listing
+# GET /api/documents/ returns DOCUMENT_LIST_PAGE_SIZE documents per page unless
+# the client asks for another `limit`, capped at DOCUMENT_LIST_MAX_PAGE_SIZE.
+DOCUMENT_LIST_PAGE_SIZE = int(os.getenv('DOCUMENT_LIST_PAGE_SIZE', '50'))
+DOCUMENT_LIST_MAX_PAGE_SIZE = int(os.getenv('DOCUMENT_LIST_MAX_PAGE_SIZE', '200'))
+
+# Batch ingestion
+# POST /api/documents/upload/batch/ and `manage.py ingest` accept many files or
+# ZIP archives; archives may expand to at most BATCH_ZIP_MAX_BYTES.
+BATCH_UPLOAD_MAX_FILES = int(os.getenv('BATCH_UPLOAD_MAX_FILES', '5000'))
+BATCH_ZIP_MAX_BYTES = int(os.getenv('BATCH_ZIP_MAX_BYTES', str(2 * 1024 ** 3)))
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.getenv('DATA_UPLOAD_MAX_NUMBER_FILES', '1000'))
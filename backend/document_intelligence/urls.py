@@ -2,8 +2,10 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from documents import views as document_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('documents.urls')),
+    path('metrics', document_views.metrics, name='metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Document, DocumentChunk
+from .models import Document, DocumentChunk, IngestionBatch, IngestionJob
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
@@ -13,3 +13,16 @@ class DocumentChunkAdmin(admin.ModelAdmin):
     list_display = ['document', 'chunk_index', 'page_number', 'created_at']
     list_filter = ['document', 'page_number']
     search_fields = ['document__title', 'content']
+
+@admin.register(IngestionBatch)
+class IngestionBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'source', 'total_files', 'created_at']
+    search_fields = ['source']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = ['document', 'batch', 'status', 'stage', 'attempts', 'locked_by', 'updated_at']
+    list_filter = ['status', 'stage']
+    search_fields = ['document__title', 'error']
+    readonly_fields = ['created_at', 'updated_at']
@@ -0,0 +1,127 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+
+class AnswerCache:
+    """LRU/TTL cache of generated answers keyed by document scope and question embedding.
+
+    A document scope is a document id, a tuple of ids, or 'all'. A lookup hits
+    when a stored question for the same scope and the same
+    retrieval `variant` (e.g. number of chunks and retrieval mode) has a cosine
+    similarity of at least `similarity_threshold` with the incoming question,
+    so exact repeats and near-duplicate phrasings skip the LLM call.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()
+        self._by_scope = {}
+        self._keys = itertools.count()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, document_scope: Any, query_embedding: List[float], variant: Any, version: str = None) -> Optional[Dict[str, Any]]:
+        """Return the cached answer for a matching question, or None."""
+        vector = self._normalize(query_embedding)
+        scope = (document_scope, variant)
+
+        with self._lock:
+            keys = self._live_keys(scope, version)
+            if not keys:
+                self.misses += 1
+                return None
+
+            matrix = np.stack([self._entries[key]['vector'] for key in keys])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            key = keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]['result']
+
+    def store(self, document_scope: Any, query_embedding: List[float], variant: Any, result: Dict[str, Any], version: str = None) -> None:
+        vector = self._normalize(query_embedding)
+        scope = (document_scope, variant)
+
+        with self._lock:
+            key = next(self._keys)
+            self._entries[key] = {
+                'scope': scope,
+                'vector': vector,
+                'result': result,
+                'version': version,
+                'stored_at': time.monotonic()
+            }
+            self._by_scope.setdefault(scope, {})[key] = None
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate(self, document_id: int) -> None:
+        """Drop every cached answer whose scope includes a document."""
+        with self._lock:
+            for scope in [scope for scope in self._by_scope if self._covers(scope[0], document_id)]:
+                for key in list(self._by_scope.get(scope, ())):
+                    self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'similarity_threshold': self.similarity_threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _live_keys(self, scope, version) -> List[int]:
+        """Return the keys for a scope, evicting expired or outdated entries."""
+        now = time.monotonic()
+        live = []
+        for key in list(self._by_scope.get(scope, ())):
+            entry = self._entries[key]
+            if now - entry['stored_at'] > self.ttl_seconds or entry['version'] != version:
+                self._remove(key)
+            else:
+                live.append(key)
+        return live
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key)
+        scope_keys = self._by_scope.get(entry['scope'])
+        if scope_keys is not None:
+            scope_keys.pop(key, None)
+            if not scope_keys:
+                del self._by_scope[entry['scope']]
+
+    @staticmethod
+    def _covers(document_scope: Any, document_id: int) -> bool:
+        if document_scope == 'all':
+            return True
+        if isinstance(document_scope, tuple):
+            return document_id in document_scope
+        return document_scope == document_id
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import zipfile
+from typing import Any, Dict, Iterable, Iterator, Tuple
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, Q
+from .metrics import track_stage
+from .models import Document, IngestionBatch, IngestionJob
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.docx', '.doc')
+
+
+def hash_upload(file) -> str:
+    """SHA-256 of the raw upload, read in chunks."""
+    digest = hashlib.sha256()
+    for data in file.chunks():
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def iter_directory(path: str) -> Iterator[Tuple[str, File]]:
+    """Yield (name, file) for every file under `path`, expanding ZIP archives."""
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(names):
+            if name.startswith('.'):
+                continue
+            full_path = os.path.join(root, name)
+            if name.lower().endswith('.zip'):
+                yield from iter_archive(full_path)
+                continue
+            with open(full_path, 'rb') as f:
+                yield os.path.relpath(full_path, path), File(f, name=name)
+
+
+def iter_archive(archive) -> Iterator[Tuple[str, File]]:
+    """Yield (name, file) for the members of a ZIP archive, given a path or file object.
+
+    Members are streamed from the archive rather than extracted to disk. The
+    total uncompressed size is checked against BATCH_ZIP_MAX_BYTES up front,
+    so a small archive cannot expand into an unbounded amount of data.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        members = [
+            info for info in zf.infolist()
+            if not info.is_dir() and not os.path.basename(info.filename).startswith('.')
+            and not info.filename.startswith('__MACOSX/')
+        ]
+        total = sum(info.file_size for info in members)
+        if total > settings.BATCH_ZIP_MAX_BYTES:
+            raise ValueError(f"Archive expands to {total} bytes, more than BATCH_ZIP_MAX_BYTES ({settings.BATCH_ZIP_MAX_BYTES})")
+
+        for info in members:
+            with zf.open(info) as member:
+                file = File(member, name=os.path.basename(info.filename))
+                file.size = info.file_size
+                yield info.filename, file
+
+
+def create_batch(files: Iterable[Tuple[str, File]], source: str = '') -> IngestionBatch:
+    """Store files as pending documents and queue one ingestion job per file.
+
+    Unsupported or empty files are recorded in `batch.skipped`. Files whose
+    bytes match a processed document, or an earlier file in the batch, share
+    the stored file instead of writing another copy; documents and jobs are
+    written with one bulk insert each.
+    """
+    field = Document._meta.get_field('file_path')
+    documents = []
+    skipped = []
+    stored = {}
+    saved = []  # Files this call wrote, removed again if the batch isn't created
+
+    try:
+        with track_stage('upload_save'):
+            for name, file in files:
+                if len(documents) >= settings.BATCH_UPLOAD_MAX_FILES:
+                    raise ValueError(f"A batch may hold at most {settings.BATCH_UPLOAD_MAX_FILES} files")
+
+                extension = os.path.splitext(file.name)[1].lower()
+                if extension not in SUPPORTED_EXTENSIONS:
+                    skipped.append({'name': name, 'reason': f"Unsupported file format: {extension or 'none'}"})
+                    continue
+                if not file.size:
+                    skipped.append({'name': name, 'reason': 'Empty file'})
+                    continue
+
+                file_hash = hash_upload(file)
+                if file_hash not in stored:
+                    stored[file_hash] = (
+                        Document.objects
+                        .filter(content_hash=file_hash, processing_status='completed')
+                        .values_list('file_path', flat=True)
+                        .first()
+                    )
+                    if not stored[file_hash]:
+                        stored[file_hash] = field.storage.save(field.generate_filename(None, file.name), file)
+                        saved.append(stored[file_hash])
+                documents.append(Document(
+                    title=os.path.splitext(file.name)[0],
+                    file_path=stored[file_hash],
+                    file_type=extension,
+                    file_size=file.size,
+                    content_hash=file_hash,
+                    processing_status='pending'
+                ))
+
+        with transaction.atomic():
+            batch = IngestionBatch.objects.create(source=source[:255], total_files=len(documents), skipped=skipped)
+            documents = Document.objects.bulk_create(documents, batch_size=500)
+            IngestionJob.objects.bulk_create(
+                [
+                    IngestionJob(document=document, batch=batch, max_attempts=settings.INGESTION_MAX_ATTEMPTS)
+                    for document in documents
+                ],
+                batch_size=500
+            )
+    except BaseException:
+        for file_path in saved:
+            try:
+                field.storage.delete(file_path)
+            except Exception as e:
+                print(f"Could not remove {file_path} after a failed batch: {e}")
+        raise
+
+    print(f"Queued ingestion batch {batch.id}: {len(documents)} files, {len(skipped)} skipped")
+    return batch
+
+
+def batch_progress(batch: IngestionBatch, include_files: bool = True) -> Dict[str, Any]:
+    """Overall and per-file progress of a batch, counted in one aggregate query."""
+    counts = batch.jobs.aggregate(
+        queued=Count('id', filter=Q(status='queued')),
+        running=Count('id', filter=Q(status='running')),
+        completed=Count('id', filter=Q(status='completed')),
+        failed=Count('id', filter=Q(status='failed'))
+    )
+    finished = counts['completed'] + counts['failed']
+    if finished < batch.total_files:
+        state = 'processing'
+    else:
+        state = 'completed_with_errors' if counts['failed'] or batch.skipped else 'completed'
+
+    progress = {
+        'id': batch.id,
+        'source': batch.source,
+        'status': state,
+        'created_at': batch.created_at,
+        'total_files': batch.total_files,
+        **counts,
+        'percent_complete': round(100.0 * finished / batch.total_files, 1) if batch.total_files else 100.0,
+        'skipped': batch.skipped
+    }
+    if include_files:
+        progress['files'] = [
+            {
+                'document_id': job['document_id'],
+                'title': job['document__title'],
+                'job_id': job['id'],
+                'status': job['status'],
+                'stage': job['stage'],
+                'attempts': job['attempts'],
+                'error': job['error'],
+                'chunks': (job['stats'] or {}).get('chunks')
+            }
+            for job in batch.jobs.order_by('id').values(
+                'id', 'document_id', 'document__title', 'status', 'stage', 'attempts', 'error', 'stats'
+            )
+        ]
+    return progress
@@ -0,0 +1,200 @@
+import re
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# One pass over the text finds words and the markers DocumentProcessor writes:
+# "=== Page N ===" tells chunks which pages they span, and a "=== Heading ==="
+# line is kept whole as one word so a chunk can start at it.
+_TOKEN = re.compile(r'===\s*Page\s+(\d+)\s*===|===[^=\n]+===|\S+')
+_SENTENCE_END = ('.', '!', '?')
+# Longest partial line `iter_stream_words` holds back between windows
+_MAX_LINE = 65536
+
+
+class Chunk(NamedTuple):
+    text: str
+    start_offset: int
+    end_offset: int
+    page_start: int
+    page_end: int
+
+
+def iter_words(text: str, offset: int = 0, page: int = 1) -> Iterator[Tuple[str, int, int, int]]:
+    """Yield (word, start, end, page) for every word, consuming page markers."""
+    for match in _TOKEN.finditer(text):
+        if match.lastindex:
+            page = int(match.group(1))
+            continue
+        yield match.group(), match.start() + offset, match.end() + offset, page
+
+
+def iter_stream_words(windows: Iterable[str]) -> Iterator[Tuple[str, int, int, int]]:
+    """`iter_words` over text arriving in consecutive pieces, as if they were one string.
+
+    The last line of each piece is held back until the next piece arrives,
+    so words and page markers cut by a window boundary are read whole.
+    """
+    offset = 0
+    page = 1
+    pending = ''
+    for window in windows:
+        text = pending + window
+        cut = text.rfind('\n') + 1
+        if not cut and len(text) > _MAX_LINE:
+            # A very long line is cut at a space instead; page markers sit on lines of their own
+            cut = max(text.rfind(' '), text.rfind('\t')) + 1
+        if not cut:
+            pending = text
+            continue
+
+        for match in _TOKEN.finditer(text, 0, cut):
+            if match.lastindex:
+                page = int(match.group(1))
+                continue
+            yield match.group(), match.start() + offset, match.end() + offset, page
+        pending = text[cut:]
+        offset += cut
+
+    if pending:
+        yield from iter_words(pending, offset, page)
+
+
+class Chunker:
+    """Linear-time, single-pass chunker.
+
+    Words are packed into chunks of at most `chunk_size` characters (or tokens,
+    when `token_counter` is given), preferring to end a chunk at a sentence
+    boundary. Consecutive chunks share up to `overlap` words. Each chunk
+    records its character offsets in the source text and the pages it spans.
+    """
+
+    def __init__(self, chunk_size: int = 500, overlap: int = 50, min_chunk_length: int = 50,
+                 token_counter: Optional[Callable[[str], int]] = None):
+        self.chunk_size = max(1, chunk_size)
+        self.overlap = max(0, overlap)
+        self.min_chunk_length = min_chunk_length
+        self.token_counter = token_counter
+
+    def chunk(self, text: str) -> List[Chunk]:
+        """Chunk a whole text, dropping fragments too short to be useful."""
+        if not text or not text.strip():
+            return []
+
+        chunks = [
+            chunk for chunk in self.iter_chunks(iter_words(text))
+            if len(chunk.text) > self.min_chunk_length
+        ]
+        if chunks:
+            return chunks
+
+        # Nothing long enough: keep the whole text as one chunk
+        words = list(iter_words(text))
+        if not words:
+            return []
+        return [Chunk(
+            text=' '.join(word for word, _, _, _ in words),
+            start_offset=words[0][1],
+            end_offset=words[-1][2],
+            page_start=words[0][3],
+            page_end=words[-1][3]
+        )]
+
+    def chunk_stream(self, windows: Iterable[str]) -> Iterator[Chunk]:
+        """`chunk` for text arriving in windows, yielding each chunk as soon as it is full.
+
+        Memory is bounded by one window plus one chunk, whatever the text length.
+        """
+        emitted = False
+        short = None
+        for chunk in self.iter_chunks(iter_stream_words(windows)):
+            if len(chunk.text) > self.min_chunk_length:
+                emitted = True
+                yield chunk
+            elif short is None:
+                short = chunk
+
+        # Only the last chunk can be short, so a short text arrives here as one chunk
+        if not emitted and short is not None:
+            yield short
+
+    def iter_chunks(self, words: Iterable[Tuple[str, int, int, int]]) -> Iterator[Chunk]:
+        """Pack a stream of (word, start, end, page) tuples into chunks.
+
+        Only the current chunk is buffered, so any iterable of words works,
+        including one produced incrementally from a large file.
+        """
+        chunk_size = self.chunk_size
+        overlap = self.overlap
+        measure = self.token_counter or len
+        # Characters pay for the joining space; tokens don't
+        separator = 0 if self.token_counter else 1
+
+        # The buffered words, as their texts and (start, end, page, total) tuples,
+        # where total is the running size of every word read so far, separators
+        # included. The size of buffered words joined by spaces is then
+        # `total - base - separator`, with `base` the total before the first of them
+        texts = []
+        spans = []
+        total = 0
+        base = 0
+        carried = 0  # Leading buffer words already emitted as the previous chunk's overlap
+        dropped = 0  # Words read and no longer buffered
+        heading = -1  # Word number of the last heading marker read
+
+        for text, start, end, page in words:
+            size = measure(text)
+
+            if texts and total - base + size > chunk_size:
+                cut = self._cut(texts, carried, heading - dropped)
+                yield self._make_chunk(texts, spans, cut)
+
+                # Always leave at least one word behind so every chunk makes progress;
+                # the next chunk starts with the last `carried` emitted words
+                carried = max(0, min(overlap, cut - 1))
+                drop = cut - carried
+
+                # Shrink the overlap if it would leave no room for the next word
+                while carried and total - spans[drop - 1][3] + size > chunk_size:
+                    drop += 1
+                    carried -= 1
+
+                base = spans[drop - 1][3]
+                dropped += drop
+                del texts[:drop]
+                del spans[:drop]
+
+            if text[0] == '=' and text.startswith('=== '):
+                heading = dropped + len(texts)
+            total += separator + size
+            texts.append(text)
+            spans.append((start, end, page, total))
+
+        if texts:
+            yield self._make_chunk(texts, spans, len(texts))
+
+    @staticmethod
+    def _cut(texts: List[str], carried: int, heading: int) -> int:
+        """Return how many buffered words to emit: up to the last heading, else the last sentence end.
+
+        `heading` is the buffer position of the last heading marker read. The
+        cut stays in the second half of the buffer and after the carried
+        overlap, so every chunk is reasonably full and contains new text.
+        """
+        lowest = max(len(texts) // 2, carried)
+        if heading >= lowest and heading > carried:
+            # Leave the heading to open the next chunk
+            return heading
+        for cut in range(len(texts) - 1, lowest - 1, -1):
+            if texts[cut].endswith(_SENTENCE_END):
+                return cut + 1
+        return len(texts)
+
+    @staticmethod
+    def _make_chunk(texts: List[str], spans: List[tuple], length: int) -> Chunk:
+        """The chunk made of the first `length` buffered words."""
+        return Chunk(
+            text=' '.join(texts[:length]),
+            start_offset=spans[0][0],
+            end_offset=spans[length - 1][1],
+            page_start=spans[0][2],
+            page_end=spans[length - 1][2]
+        )
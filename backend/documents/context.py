@@ -0,0 +1,150 @@
+"""Assemble retrieved chunks into a compact prompt context.
+
+Neighbouring chunks share up to CHUNK_OVERLAP words, so sending each hit in
+full repeats text. `pack_context` merges chunks that are adjacent in their
+document into one passage, drops the repeated words and stops adding chunks
+once the token budget is spent.
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Rough allowance for an excerpt's "=== Excerpt from ... ===" header line
+HEADER_TOKENS = 20
+
+
+class Passage(NamedTuple):
+    text: str
+    document_id: Optional[int]
+    document_title: Optional[str]
+    chunk_indexes: List[int]
+    page_start: int
+    page_end: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM tokens as one per four characters."""
+    return (len(text) + 3) // 4
+
+
+def pack_context(chunks: List[Dict[str, Any]], token_budget: int,
+                 count_tokens: Callable[[str], int] = estimate_tokens) -> Tuple[List[Passage], List[Dict[str, Any]]]:
+    """Pack chunks, given in relevance order, into passages that fit `token_budget`.
+
+    Returns the passages in the order of their most relevant chunk, and the
+    original chunks that made it in. Repeated chunks (the same chunk twice, or
+    identical text in two documents) are kept once. When the first chunk alone
+    exceeds the budget it is truncated; any later chunk that does not fit is
+    skipped in favour of smaller ones further down. A budget of 0 disables
+    the limit.
+    """
+    selected = {}  # (document_id, chunk_index or None, rank) -> (rank, words, chunk)
+    used = []
+    seen_text = set()
+    spent = 0
+
+    for rank, chunk in enumerate(chunks):
+        metadata = chunk['metadata']
+        words = chunk['content'].split()
+        document_id, index = metadata.get('document_id'), metadata.get('chunk_index')
+        # Chunks without an index can't be placed next to others
+        key = (document_id, index, None if index is not None else rank)
+        if not words or key in selected or chunk['content'] in seen_text:
+            continue
+
+        previous = following = None
+        if index is not None:
+            previous = selected.get((document_id, index - 1, None))
+            following = selected.get((document_id, index + 1, None))
+        new_words = words
+        if previous is not None:
+            new_words = new_words[_overlap(previous[2], chunk, previous[1], new_words):]
+        if following is not None:
+            new_words = new_words[:len(new_words) - _overlap(chunk, following[2], new_words, following[1])]
+
+        cost = count_tokens(' '.join(new_words)) if new_words else 0
+        if previous is None and following is None:
+            cost += HEADER_TOKENS
+
+        if token_budget and spent + cost > token_budget:
+            if used:
+                continue
+            # Always answer from something: cut the best chunk down to the budget
+            words = _truncate(words, max(1, token_budget - HEADER_TOKENS), count_tokens)
+            chunk = {**chunk, 'content': ' '.join(words)}
+            cost = token_budget
+
+        selected[key] = (rank, words, chunk)
+        used.append(chunk)
+        seen_text.add(chunk['content'])
+        spent += cost
+
+    return _merge(selected), used
+
+
+def _merge(selected) -> List[Passage]:
+    """Join runs of consecutive chunk indexes into passages, without repeated words."""
+    passages = []
+    run = []
+    ordered = sorted(selected, key=lambda key: (str(key[0]), key[1] is None, key[1] or 0, key[2] or 0))
+    for key in ordered:
+        last = run[-1][0] if run else None
+        if run and (key[1] is None or last[1] is None or key[0] != last[0] or key[1] != last[1] + 1):
+            passages.append(_passage(run))
+            run = []
+        run.append((key, selected[key]))
+    if run:
+        passages.append(_passage(run))
+
+    passages.sort(key=lambda item: item[0])
+    return [passage for _, passage in passages]
+
+
+def _passage(run) -> Tuple[int, Passage]:
+    words = []
+    previous = None
+    for _, (_, chunk_words, chunk) in run:
+        skip = _overlap(previous[1], chunk, previous[0], chunk_words) if previous is not None else 0
+        words.extend(chunk_words[skip:])
+        previous = (chunk_words, chunk)
+
+    chunks = [chunk for _, (_, _, chunk) in run]
+    first = chunks[0]['metadata']
+    return min(rank for _, (rank, _, _) in run), Passage(
+        text=' '.join(words),
+        document_id=first.get('document_id'),
+        document_title=first.get('document_title'),
+        chunk_indexes=[key[1] for key, _ in run if key[1] is not None],
+        page_start=min(chunk['metadata'].get('page_number', 1) for chunk in chunks),
+        page_end=max(chunk['metadata'].get('page_end', chunk['metadata'].get('page_number', 1)) for chunk in chunks)
+    )
+
+
+def _overlap(first: Dict[str, Any], second: Dict[str, Any], first_words: List[str], second_words: List[str]) -> int:
+    """Number of leading words of `second` that repeat the end of `first`.
+
+    Chunks record their character offsets, so chunks that do not overlap in
+    the source are recognised without comparing words.
+    """
+    first_end = first['metadata'].get('end_offset')
+    second_start = second['metadata'].get('start_offset')
+    if first_end is not None and second_start is not None and second_start >= first_end:
+        return 0
+
+    # The longest suffix of `first` that is a prefix of `second` starts earliest
+    limit = min(len(first_words), len(second_words))
+    head = second_words[0]
+    for start in range(len(first_words) - limit, len(first_words)):
+        if first_words[start] == head and first_words[start:] == second_words[:len(first_words) - start]:
+            return len(first_words) - start
+    return 0
+
+
+def _truncate(words: List[str], budget: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Longest prefix of `words` within `budget` tokens."""
+    low, high = 1, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(' '.join(words[:middle])) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return words[:low]
@@ -1,64 +1,234 @@
+import codecs
 import os
+import tempfile
 import PyPDF2
-import docx
-from typing import Tuple, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple, List
+from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
+from .metrics import count_items, track_stage
+from .word_documents import CELL_SEPARATOR, OLE_SIGNATURE, ZIP_SIGNATURE, file_signature, iter_doc_text, iter_docx_blocks
 import re
 
+# Compiled once: PDF cleaning runs these on every page
+_CAMEL_CASE_JOIN = re.compile(r'([a-z])([A-Z])')
+_DIGIT_LETTER_JOIN = re.compile(r'([0-9])([a-zA-Z])')
+_LETTER_DIGIT_JOIN = re.compile(r'([a-zA-Z])([0-9])')
+_HORIZONTAL_WHITESPACE = re.compile(r'[ \t]+')
+_EXCESS_NEWLINES = re.compile(r'\n[ \t]*\n[ \t]*\n+')
+_INDENTED_LINE = re.compile(r'\n[ \t]+')
+_MISSING_SENTENCE_SPACE = re.compile(r'\.([A-Z])')
+_BULLET = re.compile(r'•\s*')
+_UNICODE_BULLET = re.compile(r'[\u2022\u2023\u25E6\u2043\u2219]\s*')
+_EMAIL = re.compile(r'([a-zA-Z0-9._-]+)@([a-zA-Z0-9.-]+)\.([a-zA-Z]{2,})')
+_NO_LETTERS = re.compile(r'^[^a-zA-Z]*$')
+_EXCESS_BLANK_LINES = re.compile(r'\n{3,}')
+_SECTION_MARKER = re.compile(r'(===.*?===)')
+
+# Pages per process pool task when a large PDF is streamed
+_STREAM_PDF_SLICE_PAGES = 32
+
 class DocumentProcessor:
     @staticmethod
-    def extract_text_from_file(file: UploadedFile) -> Tuple[str, int]:
-        """Extract text from uploaded file and return text and page count."""
+    def extract_text_from_file(file: UploadedFile, pdf_workers: Optional[int] = None) -> Tuple[str, int]:
+        """Extract text from uploaded file and return text and page count.
+
+        `pdf_workers` caps the processes extracting a large PDF; it defaults
+        to PDF_EXTRACTION_WORKERS.
+        """
         file_extension = os.path.splitext(file.name)[1].lower()
         
+        with track_stage('extract'):
+            if file_extension == '.txt':
+                text, page_count = DocumentProcessor._extract_from_txt(file), 1
+            elif file_extension == '.pdf':
+                text, page_count = DocumentProcessor._extract_from_pdf(file, pdf_workers)
+            elif file_extension in ['.docx', '.doc']:
+                text, page_count = DocumentProcessor._extract_from_docx(file), 1
+            else:
+                raise ValueError(f"Unsupported file format: {file_extension}")
+        
+        count_items('extract', page_count)
+        return text, page_count
+    
+    @staticmethod
+    @contextmanager
+    def open_text_stream(file: UploadedFile):
+        """Yield (windows, page_count) for reading a file's text piece by piece.
+
+        `windows` is a generator of consecutive pieces of the text that
+        `extract_text_from_file` would return: up to INGESTION_STREAM_WINDOW_BYTES
+        of a text file, one cleaned page of a PDF, one paragraph or table row
+        of a Word file.
+        Only the window being read is held in memory. Consume it before the
+        context exits; a PDF may be read from a temporary copy.
+        """
+        file_extension = os.path.splitext(file.name)[1].lower()
+
         if file_extension == '.txt':
-            return DocumentProcessor._extract_from_txt(file), 1
+            page_count = 1
+            windows = DocumentProcessor._iter_txt(file)
         elif file_extension == '.pdf':
-            return DocumentProcessor._extract_from_pdf(file)
+            with DocumentProcessor._local_path(file) as path:
+                try:
+                    page_count = len(PyPDF2.PdfReader(path).pages)
+                except Exception as e:
+                    print(f"PDF extraction error: {e}")
+                    raise ValueError(f"Failed to extract text from PDF: {e}")
+                count_items('extract', page_count)
+                yield DocumentProcessor._iter_pdf(path, page_count), page_count
+            return
         elif file_extension in ['.docx', '.doc']:
-            return DocumentProcessor._extract_from_docx(file), 1
+            page_count = 1
+            windows = DocumentProcessor._iter_word(file)
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
-    
+
+        count_items('extract', page_count)
+        yield windows, page_count
+
+    @staticmethod
+    def _iter_txt(file: UploadedFile) -> Iterator[str]:
+        # Incremental decoding keeps a multi-byte character split across reads intact
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for data in file.chunks(settings.INGESTION_STREAM_WINDOW_BYTES):
+            text = decoder.decode(data)
+            if text:
+                yield text
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+
+    @staticmethod
+    def _iter_pdf(path: str, page_count: int) -> Iterator[str]:
+        """Cleaned pages in order; large files are extracted by a process pool.
+
+        At most two slices per worker are in flight, so pages extracted ahead
+        of the consumer stay bounded.
+        """
+        workers = min(settings.PDF_EXTRACTION_WORKERS, page_count)
+        if workers <= 1 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+            segments = _iter_pdf_pages(path, 0, page_count)
+        else:
+            segments = DocumentProcessor._iter_pdf_parallel(path, page_count, workers)
+
+        separator = ''
+        for segment in segments:
+            text = DocumentProcessor._post_process_extracted_text(segment)
+            if text:
+                yield separator + text
+                separator = '\n\n'
+
+    @staticmethod
+    def _iter_pdf_parallel(path: str, page_count: int, workers: int) -> Iterator[str]:
+        starts = iter(range(0, page_count, _STREAM_PDF_SLICE_PAGES))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for start in starts:
+                pending.append(executor.submit(
+                    _extract_pdf_page_range, path, start, min(start + _STREAM_PDF_SLICE_PAGES, page_count)
+                ))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                segments = pending.popleft().result()
+                start = next(starts, None)
+                if start is not None:
+                    pending.append(executor.submit(
+                        _extract_pdf_page_range, path, start, min(start + _STREAM_PDF_SLICE_PAGES, page_count)
+                    ))
+                yield from segments
+
+    @staticmethod
+    def _iter_word(file: UploadedFile) -> Iterator[str]:
+        separator = ''
+        for block in DocumentProcessor._iter_word_blocks(file):
+            text = DocumentProcessor._post_process_extracted_text(block)
+            if text:
+                yield separator + text
+                separator = '\n'
+
+    @staticmethod
+    def _iter_word_blocks(file: UploadedFile) -> Iterator[str]:
+        """Paragraphs of a .docx or .doc file, told apart by content rather than extension."""
+        signature = file_signature(file)
+        if signature.startswith(ZIP_SIGNATURE):
+            yield from iter_docx_blocks(file)
+        elif signature.startswith(OLE_SIGNATURE):
+            # Legacy binary Word document; the converters need a file on disk
+            with DocumentProcessor._local_path(file) as path:
+                yield from iter_doc_text(path)
+        else:
+            raise ValueError("Not a Word document: expected a .docx (ZIP) or .doc (OLE) file")
+
     @staticmethod
     def _extract_from_txt(file: UploadedFile) -> str:
         """Extract text from TXT file."""
         return file.read().decode('utf-8')
     
     @staticmethod
-    def _extract_from_pdf(file: UploadedFile) -> Tuple[str, int]:
-        """Extract text from PDF file with improved processing."""
+    def _extract_from_pdf(file: UploadedFile, workers: Optional[int] = None) -> Tuple[str, int]:
+        """Extract text from PDF file with improved processing.
+
+        Large files are split into page ranges that a process pool extracts
+        and cleans in parallel; page order and page markers are preserved.
+        """
         try:
-            pdf_reader = PyPDF2.PdfReader(file)
-            page_count = len(pdf_reader.pages)
-            text = ""
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    # Extract text from page
-                    page_text = page.extract_text()
-                    
-                    if page_text:
-                        # Clean the extracted text
-                        cleaned_text = DocumentProcessor._clean_pdf_text(page_text)
-                        
-                        # Add page marker for better organization
-                        text += f"\n=== Page {page_num + 1} ===\n{cleaned_text}\n"
-                    
-                except Exception as e:
-                    print(f"Error extracting text from page {page_num + 1}: {e}")
-                    continue
-            
+            with DocumentProcessor._local_path(file) as path:
+                page_count = len(PyPDF2.PdfReader(path).pages)
+                workers = min(workers or settings.PDF_EXTRACTION_WORKERS, page_count)
+
+                if workers <= 1 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+                    page_texts = _extract_pdf_page_range(path, 0, page_count)
+                else:
+                    # Several slices per worker so one slow range doesn't hold up the rest
+                    slice_size = max(1, -(-page_count // (workers * 4)))
+                    starts = range(0, page_count, slice_size)
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        slices = executor.map(
+                            _extract_pdf_page_range,
+                            [path] * len(starts),
+                            starts,
+                            [min(start + slice_size, page_count) for start in starts]
+                        )
+                        page_texts = [text for page_slice in slices for text in page_slice]
+
             # Final text processing
-            final_text = DocumentProcessor._post_process_extracted_text(text)
-            
+            final_text = DocumentProcessor._post_process_extracted_text(''.join(page_texts))
+
             return final_text, page_count
-            
+
         except Exception as e:
             print(f"PDF extraction error: {e}")
             raise ValueError(f"Failed to extract text from PDF: {e}")
-    
-    @staticmethod  
+
+    @staticmethod
+    @contextmanager
+    def _local_path(file: UploadedFile):
+        """Yield a filesystem path for the file, spooling it to disk if necessary."""
+        if hasattr(file, 'temporary_file_path'):
+            yield file.temporary_file_path()
+            return
+
+        try:
+            path = file.path
+        except (AttributeError, NotImplementedError, ValueError):
+            path = None
+        if path and os.path.exists(path):
+            yield path
+            return
+
+        suffix = os.path.splitext(file.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix) as temp_file:
+            file.seek(0)
+            for data in file.chunks():
+                temp_file.write(data)
+            temp_file.flush()
+            yield temp_file.name
+
+    @staticmethod
     def _clean_pdf_text(text: str) -> str:
         """Clean PDF extracted text to make it more readable."""
         if not text:
@@ -66,30 +236,30 @@ class DocumentProcessor:
         
         # Step 1: Handle common PDF extraction issues
         # Fix words that got concatenated (no space between words)
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+        text = _CAMEL_CASE_JOIN.sub(r'\1 \2', text)
         
         # Fix number-letter combinations
-        text = re.sub(r'([0-9])([a-zA-Z])', r'\1 \2', text)
-        text = re.sub(r'([a-zA-Z])([0-9])', r'\1 \2', text)
+        text = _DIGIT_LETTER_JOIN.sub(r'\1 \2', text)
+        text = _LETTER_DIGIT_JOIN.sub(r'\1 \2', text)
         
         # Step 2: Clean up whitespace
         # Replace multiple spaces with single space
-        text = re.sub(r'[ \t]+', ' ', text)
+        text = _HORIZONTAL_WHITESPACE.sub(' ', text)
         
         # Clean up newlines - preserve paragraph breaks but remove excessive newlines
-        text = re.sub(r'\n[ \t]*\n[ \t]*\n+', '\n\n', text)  # Multiple newlines -> double newline
-        text = re.sub(r'\n[ \t]+', '\n', text)  # Remove spaces after newlines
+        text = _EXCESS_NEWLINES.sub('\n\n', text)  # Multiple newlines -> double newline
+        text = _INDENTED_LINE.sub('\n', text)  # Remove spaces after newlines
         
         # Step 3: Fix common formatting issues
         # Add space after periods if missing (for sentences)
-        text = re.sub(r'\.([A-Z])', r'. \1', text)
+        text = _MISSING_SENTENCE_SPACE.sub(r'. \1', text)
         
         # Fix bullet points and list items
-        text = re.sub(r'•\s*', '• ', text)
-        text = re.sub(r'[\u2022\u2023\u25E6\u2043\u2219]\s*', '• ', text)  # Various bullet Unicode
+        text = _BULLET.sub('• ', text)
+        text = _UNICODE_BULLET.sub('• ', text)  # Various bullet Unicode
         
         # Step 4: Handle email and URL formatting
-        text = re.sub(r'([a-zA-Z0-9._-]+)@([a-zA-Z0-9.-]+)\.([a-zA-Z]{2,})', r'\1@\2.\3', text)
+        text = _EMAIL.sub(r'\1@\2.\3', text)
         
         return text.strip()
     
@@ -109,8 +279,9 @@ class DocumentProcessor:
             if len(line) < 2:
                 continue
                 
-            # Skip lines with only special characters or numbers
-            if re.match(r'^[^a-zA-Z]*$', line):
+            # Skip lines with only special characters or numbers, except table
+            # rows, whose cells are often all figures
+            if _NO_LETTERS.match(line) and CELL_SEPARATOR not in line:
                 continue
             
             # Add the line
@@ -120,22 +291,47 @@ class DocumentProcessor:
         result = '\n'.join(processed_lines)
         
         # Final cleanup
-        result = re.sub(r'\n{3,}', '\n\n', result)  # Max 2 consecutive newlines
+        result = _EXCESS_BLANK_LINES.sub('\n\n', result)  # Max 2 consecutive newlines
         
         # Ensure sections are properly separated
-        result = re.sub(r'(===.*?===)', r'\n\1\n', result)
+        result = _SECTION_MARKER.sub(r'\n\1\n', result)
         
         return result.strip()
     
     @staticmethod
     def _extract_from_docx(file: UploadedFile) -> str:
-        """Extract text from DOCX file."""
-        doc = docx.Document(file)
-        text = ""
-        
-        for paragraph in doc.paragraphs:
-            para_text = paragraph.text.strip()
-            if para_text:  # Only add non-empty paragraphs
-                text += para_text + "\n"
-        
-        return DocumentProcessor._post_process_extracted_text(text)
\ No newline at end of file
+        """Extract text from a DOCX or legacy DOC file, tables and headings included."""
+        text = '\n'.join(DocumentProcessor._iter_word_blocks(file))
+        return DocumentProcessor._post_process_extracted_text(text)
+
+
+def _extract_pdf_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Extract and clean pages [start, stop) of a PDF, one marked segment per page.
+
+    Module-level so process pool workers can run it; each opens the file itself.
+    """
+    return list(_iter_pdf_pages(path, start, stop))
+
+
+def _iter_pdf_pages(path: str, start: int, stop: int) -> Iterator[str]:
+    pdf_reader = PyPDF2.PdfReader(path)
+
+    for page_num in range(start, stop):
+        segment = None
+        try:
+            # Extract text from page
+            page_text = pdf_reader.pages[page_num].extract_text()
+
+            if page_text:
+                # Clean the extracted text
+                cleaned_text = DocumentProcessor._clean_pdf_text(page_text)
+
+                # Add page marker for better organization
+                segment = f"\n=== Page {page_num + 1} ===\n{cleaned_text}\n"
+
+        except Exception as e:
+            print(f"Error extracting text from page {page_num + 1}: {e}")
+            continue
+
+        if segment:
+            yield segment
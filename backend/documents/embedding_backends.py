@@ -0,0 +1,206 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Union
+import numpy as np
+from django.conf import settings
+
+BACKENDS = ('torch', 'onnx')
+
+_CONFIG_FILE = 'embedding_config.json'
+_export_lock = threading.Lock()
+
+
+@contextmanager
+def _exclusive_export(directory: str):
+    """Let one thread of one process at a time export or quantize into `directory`.
+
+    The lock file sits next to the directory, so workers sharing
+    EMBEDDING_ONNX_PATH wait for the first one's export instead of writing
+    the same files at once.
+    """
+    os.makedirs(os.path.dirname(directory) or '.', exist_ok=True)
+    with _export_lock:
+        with open(directory + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def embedding_model_key() -> str:
+    """Name the configured model and backend, e.g. 'all-MiniLM-L6-v2:onnx-int8'.
+
+    Vectors from different backends agree closely but not exactly, so cached
+    embeddings are keyed by backend. The torch backend keeps the bare model
+    name used by caches written before backends existed.
+    """
+    if settings.EMBEDDING_BACKEND == 'onnx':
+        return f"{settings.EMBEDDING_MODEL_NAME}:onnx{'-int8' if settings.EMBEDDING_ONNX_QUANTIZE else ''}"
+    return settings.EMBEDDING_MODEL_NAME
+
+
+def load_embedding_model(backend: str = None):
+    """Build the configured embedding model; both backends share the `encode` interface."""
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == 'torch':
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+    if backend == 'onnx':
+        return OnnxEmbedder(
+            onnx_model_dir(settings.EMBEDDING_MODEL_NAME),
+            quantize=settings.EMBEDDING_ONNX_QUANTIZE,
+            batch_size=settings.EMBEDDING_ENCODE_BATCH_SIZE,
+            threads=settings.EMBEDDING_ONNX_THREADS
+        )
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+
+def onnx_model_dir(model_name: str) -> str:
+    return os.path.join(settings.EMBEDDING_ONNX_PATH, model_name.replace('/', '__'))
+
+
+def export_onnx_model(model_name: str, directory: str, quantize: bool = True) -> Dict[str, Any]:
+    """Export a SentenceTransformer's transformer to ONNX, plus an int8 copy.
+
+    This is the only step that needs torch. It writes model.onnx,
+    model.int8.onnx (with `quantize`), the tokenizer files and the pooling
+    settings to `directory`, which later processes load without torch.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    os.makedirs(directory, exist_ok=True)
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    pooling = next((module for module in model if isinstance(module, Pooling)), None)
+    config = {
+        'model_name': model_name,
+        'max_seq_length': model.max_seq_length,
+        'pooling': pooling.get_pooling_mode_str() if pooling is not None else 'mean',
+        'normalize': any(isinstance(module, Normalize) for module in model),
+        'dimension': model.get_sentence_embedding_dimension()
+    }
+    if config['pooling'] not in ('mean', 'cls'):
+        raise ValueError(f"{model_name} uses {config['pooling']} pooling; the ONNX backend supports mean and cls")
+
+    sample = tokenizer(['export sample'], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            os.path.join(directory, 'model.onnx'),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            do_constant_folding=True
+        )
+    tokenizer.save_pretrained(directory)
+
+    if quantize:
+        _quantize(directory)
+
+    # The config file marks a finished export, so it goes in last and whole
+    config_file = os.path.join(directory, _CONFIG_FILE)
+    with open(config_file + '.tmp', 'w') as f:
+        json.dump(config, f, indent=2)
+    os.replace(config_file + '.tmp', config_file)
+    return config
+
+
+def _quantize(directory: str) -> None:
+    # Dynamic quantization: int8 weights, activations quantized per batch at run time
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # Written aside and moved into place, so an interrupted run leaves no partial model
+    quantize_dynamic(
+        os.path.join(directory, 'model.onnx'),
+        os.path.join(directory, 'model.int8.tmp.onnx'),
+        weight_type=QuantType.QInt8
+    )
+    os.replace(os.path.join(directory, 'model.int8.tmp.onnx'), os.path.join(directory, 'model.int8.onnx'))
+
+
+class OnnxEmbedder:
+    """SentenceTransformer-compatible encoder running on ONNX Runtime.
+
+    Loads the files written by `export_onnx_model`, exporting them first if
+    `directory` is empty. Texts are sorted by length before batching so each
+    batch pads to similar lengths, then pooled and normalized as the original
+    SentenceTransformer pipeline does.
+    """
+
+    def __init__(self, directory: str, quantize: bool = True, batch_size: int = 32, threads: int = 0):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        model_file = os.path.join(directory, 'model.int8.onnx' if quantize else 'model.onnx')
+        with _exclusive_export(directory):
+            if not os.path.exists(os.path.join(directory, _CONFIG_FILE)):
+                export_onnx_model(settings.EMBEDDING_MODEL_NAME, directory, quantize=quantize)
+            elif not os.path.exists(model_file):
+                _quantize(directory)
+
+        with open(os.path.join(directory, _CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.batch_size = max(1, batch_size)
+        self.max_seq_length = self.config['max_seq_length']
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        # Batches run one at a time; parallelism comes from intra-op threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_file, options, providers=['CPUExecutionProvider'])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = None, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        batch_size = batch_size or self.batch_size
+
+        embeddings = np.zeros((len(texts), self.config['dimension']), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda index: -len(texts[index]))
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            embeddings[indices] = self._encode_batch([texts[index] for index in indices])
+
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        features = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors='np'
+        )
+        inputs = {name: value.astype(np.int64) for name, value in features.items() if name in self._input_names}
+        hidden = self.session.run(None, inputs)[0]
+
+        if self.config['pooling'] == 'cls':
+            pooled = hidden[:, 0]
+        else:
+            mask = features['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.config['normalize']:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
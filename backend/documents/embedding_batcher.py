@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Dict, Any
+from .metrics import Histogram
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent single-text embedding requests into batched encodes.
+
+    Callers block in `embed` while a background thread gathers requests for up
+    to `max_wait_ms` (or until `max_batch_size` texts are queued), encodes them
+    with one call and hands each caller its own vector.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], Any], max_batch_size: int = 32, max_wait_ms: float = 3.0):
+        self._encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.batch_size_histogram = Histogram(
+            'embedding_batch_size',
+            'Number of query texts encoded per batch.',
+            buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+        )
+        self.queue_wait_histogram = Histogram(
+            'embedding_queue_wait_seconds',
+            'Time a query text waited in the batcher before encoding started.',
+            buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+        )
+
+    def embed(self, text: str, timeout: float = None) -> List[float]:
+        """Return the embedding for a single text."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        return future.result(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'batch_size': self.batch_size_histogram.snapshot(),
+            'queue_wait_seconds': self.queue_wait_histogram.snapshot()
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='embedding-batcher',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+
+            # Keep collecting until the window closes or the batch is full
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch) -> None:
+        started = time.perf_counter()
+        self.batch_size_histogram.observe(len(batch))
+        for _, enqueued_at, _ in batch:
+            self.queue_wait_histogram.observe(started - enqueued_at)
+
+        try:
+            vectors = self._encode([text for text, _, _ in batch])
+            for (_, _, future), vector in zip(batch, vectors):
+                future.set_result(vector.tolist() if hasattr(vector, 'tolist') else list(vector))
+        except Exception as e:
+            print(f"Error encoding embedding batch of {len(batch)}: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
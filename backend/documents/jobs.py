@@ -0,0 +1,345 @@
+import os
+import socket
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .metrics import INGESTION_JOBS, track_stage
+from .models import Document, IngestionBatch, IngestionJob
+from .document_processor import DocumentProcessor
+
+
+def default_worker_id() -> str:
+    """Identify this worker process in job locks."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_ingestion(document: Document) -> IngestionJob:
+    """Queue a document for background processing."""
+    return IngestionJob.objects.create(
+        document=document,
+        max_attempts=settings.INGESTION_MAX_ATTEMPTS
+    )
+
+
+def claim_next_job(worker_id: str) -> Optional[IngestionJob]:
+    """Claim the oldest runnable job without blocking other workers."""
+    jobs = claim_jobs(worker_id, 1)
+    return jobs[0] if jobs else None
+
+
+def claim_jobs(worker_id: str, limit: int, batch: IngestionBatch = None) -> List[IngestionJob]:
+    """Claim up to `limit` of the oldest runnable jobs, optionally from one batch.
+
+    Jobs left in 'running' by a worker that died are reclaimed once their
+    lock is older than INGESTION_STALE_AFTER_SECONDS; those that died on
+    their last attempt are failed instead, along with their documents.
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.INGESTION_STALE_AFTER_SECONDS)
+
+    with transaction.atomic():
+        _fail_exhausted_jobs(stale_before)
+
+        runnable = (
+            IngestionJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status='queued') |
+                Q(status='running', locked_at__lt=stale_before)
+            )
+            .filter(attempts__lt=F('max_attempts'))
+        )
+        if batch is not None:
+            runnable = runnable.filter(batch=batch)
+        jobs = list(runnable.select_related('document').order_by('created_at', 'id')[:limit])
+
+        now = timezone.now()
+        for job in jobs:
+            job.status = 'running'
+            job.stage = ''
+            job.locked_by = worker_id
+            job.locked_at = now
+            job.attempts += 1
+            job.updated_at = now
+        IngestionJob.objects.bulk_update(jobs, ['status', 'stage', 'locked_by', 'locked_at', 'attempts', 'updated_at'])
+
+    return jobs
+
+
+def _fail_exhausted_jobs(stale_before) -> None:
+    """Fail stale running jobs with no attempts left, which nothing would otherwise pick up."""
+    exhausted = list(
+        IngestionJob.objects
+        .select_for_update(skip_locked=True)
+        .filter(status='running', locked_at__lt=stale_before, attempts__gte=F('max_attempts'))
+        .values_list('id', 'document_id')
+    )
+    if not exhausted:
+        return
+
+    now = timezone.now()
+    IngestionJob.objects.filter(id__in=[job_id for job_id, _ in exhausted]).update(
+        status='failed',
+        error='The worker stopped responding during the last attempt',
+        updated_at=now
+    )
+    Document.objects.filter(id__in=[document_id for _, document_id in exhausted]).update(
+        processing_status='failed',
+        updated_at=now
+    )
+    INGESTION_JOBS.inc(len(exhausted), outcome='failed')
+    print(f"Failed {len(exhausted)} ingestion jobs whose worker stopped during their last attempt")
+
+
+def _set_stage(job: IngestionJob, stage: str) -> None:
+    # Every stage change renews the lock, like each batch of a streamed file
+    job.stage = stage
+    job.locked_at = timezone.now()
+    job.save(update_fields=['stage', 'locked_at', 'updated_at'])
+
+
+def _renew_locks(jobs: List[IngestionJob]) -> None:
+    """Move the jobs' lock time to now, so a long group isn't taken for a dead worker's."""
+    now = timezone.now()
+    for job in jobs:
+        job.locked_at = now
+    IngestionJob.objects.filter(id__in=[job.id for job in jobs], status='running').update(locked_at=now)
+
+
+def run_job(job: IngestionJob, rag_engine) -> None:
+    """Extract, chunk and embed the job's document, recording progress."""
+    document = job.document
+    document.processing_status = 'processing'
+    document.save(update_fields=['processing_status', 'updated_at'])
+
+    try:
+        with track_stage('ingest'):
+            _set_stage(job, 'extracting')
+            if document.file_size >= settings.INGESTION_STREAM_MIN_BYTES:
+                job.stats = _stream_document(job, rag_engine)
+            else:
+                with document.file_path.open('rb') as file:
+                    text_content, page_count = DocumentProcessor.extract_text_from_file(file)
+                document.pages = page_count
+                document.save(update_fields=['pages', 'updated_at'])
+
+                _set_stage(job, 'chunking')
+                chunks = rag_engine.chunk_document(text_content)
+
+                _set_stage(job, 'embedding')
+                job.stats = rag_engine.store_document_embeddings(document, chunks, heartbeat=lambda: _renew_locks([job]))
+
+            document.processing_status = 'completed'
+            document.save(update_fields=['processing_status', 'updated_at'])
+
+            job.status = 'completed'
+            job.stage = 'done'
+            job.error = ''
+            job.save(update_fields=['status', 'stage', 'error', 'stats', 'updated_at'])
+            print(f"Ingestion job {job.id} completed: {job.stats['chunks']} chunks for document {document.id}")
+        INGESTION_JOBS.inc(outcome='completed')
+
+    except Exception as e:
+        _fail_job(job, e)
+
+
+def _stream_document(job: IngestionJob, rag_engine) -> Dict[str, int]:
+    """Ingest a large file window by window, saving progress to the job after each batch.
+
+    Each save also renews the job's lock, so a long ingestion isn't taken
+    for a dead worker's and reclaimed.
+    """
+    document = job.document
+
+    def record(stats: Dict[str, int]) -> None:
+        job.stats = stats
+        job.locked_at = timezone.now()
+        job.save(update_fields=['stats', 'locked_at', 'updated_at'])
+
+    with document.file_path.open('rb') as file:
+        with DocumentProcessor.open_text_stream(file) as (windows, page_count):
+            document.pages = page_count
+            document.save(update_fields=['pages', 'updated_at'])
+
+            # Chunking and embedding run together from here
+            _set_stage(job, 'embedding')
+            return rag_engine.store_document_stream(document, windows, progress=record)
+
+
+def _fail_job(job: IngestionJob, error: Exception) -> None:
+    """Record a failed attempt: requeue the job, or fail it and its document."""
+    document = job.document
+    print(f"Ingestion job {job.id} failed on attempt {job.attempts}: {error}")
+    job.error = str(error)
+
+    # Retry until the attempt budget is spent, then fail the document
+    if job.attempts < job.max_attempts:
+        job.status = 'queued'
+        document.processing_status = 'pending'
+        INGESTION_JOBS.inc(outcome='retried')
+    else:
+        job.status = 'failed'
+        document.processing_status = 'failed'
+        INGESTION_JOBS.inc(outcome='failed')
+
+    job.save(update_fields=['status', 'error', 'updated_at'])
+    document.save(update_fields=['processing_status', 'updated_at'])
+
+
+def run_jobs(jobs: List[IngestionJob], rag_engine) -> None:
+    """Ingest several claimed jobs together.
+
+    Files are extracted in a process pool, chunks from every document are
+    embedded in shared batches and stored with one bulk insert and one
+    vector store add. A file that fails to extract fails only its own job;
+    a failed store requeues every job in the group. Files of at least
+    INGESTION_STREAM_MIN_BYTES are streamed one at a time by `run_job`.
+    """
+    # Large files stream on their own, after the group, instead of being held in memory with it
+    streamed = [job for job in jobs if job.document.file_size >= settings.INGESTION_STREAM_MIN_BYTES]
+    if streamed:
+        grouped = [job for job in jobs if job not in streamed]
+        if grouped:
+            run_jobs(grouped, rag_engine)
+        for job in streamed:
+            run_job(job, rag_engine)
+        return
+    if len(jobs) == 1:
+        run_job(jobs[0], rag_engine)
+        return
+
+    # Every stage change and embedding batch renews the group's locks
+    now = timezone.now()
+    for job in jobs:
+        job.stage = 'extracting'
+        job.locked_at = now
+        job.updated_at = now
+        job.document.processing_status = 'processing'
+        job.document.updated_at = now
+    IngestionJob.objects.bulk_update(jobs, ['stage', 'locked_at', 'updated_at'])
+    Document.objects.bulk_update([job.document for job in jobs], ['processing_status', 'updated_at'])
+
+    try:
+        with track_stage('ingest_batch'):
+            # Identical bytes already processed: copy that document's chunks instead
+            sources = _completed_duplicates([job.document for job in jobs])
+            to_extract = [job for job in jobs if job.document_id not in sources]
+
+            extracted = []
+            extractions = _extract_documents([job.document for job in to_extract], heartbeat=lambda: _renew_locks(jobs))
+            for job, result in zip(to_extract, extractions):
+                if isinstance(result, Exception):
+                    _fail_job(job, result)
+                    continue
+                text_content, page_count = result
+                job.document.pages = page_count
+                extracted.append((job, rag_engine.chunk_document(text_content)))
+
+            for job in jobs:
+                if job.document_id in sources:
+                    source = sources[job.document_id]
+                    job.document.pages = source.pages
+                    extracted.append((job, rag_engine.stored_chunks(source)))
+            if not extracted:
+                return
+
+            now = timezone.now()
+            for job, _ in extracted:
+                job.stage = 'embedding'
+                job.locked_at = now
+                job.updated_at = now
+            IngestionJob.objects.bulk_update([job for job, _ in extracted], ['stage', 'locked_at', 'updated_at'])
+
+            all_stats = rag_engine.store_documents_embeddings(
+                [(job.document, chunks) for job, chunks in extracted],
+                heartbeat=lambda: _renew_locks([job for job, _ in extracted])
+            )
+
+            now = timezone.now()
+            for (job, _), stats in zip(extracted, all_stats):
+                job.status = 'completed'
+                job.stage = 'done'
+                job.error = ''
+                job.stats = stats
+                job.updated_at = now
+                job.document.processing_status = 'completed'
+                job.document.updated_at = now
+            IngestionJob.objects.bulk_update([job for job, _ in extracted], ['status', 'stage', 'error', 'stats', 'updated_at'])
+            Document.objects.bulk_update(
+                [job.document for job, _ in extracted],
+                ['pages', 'processing_status', 'updated_at']
+            )
+    except Exception as e:
+        # Jobs that failed extraction were already requeued or failed on their own
+        for job in jobs:
+            if job.status == 'running':
+                _fail_job(job, e)
+        return
+
+    INGESTION_JOBS.inc(len(extracted), outcome='completed')
+    print(f"Ingested {len(extracted)} of {len(jobs)} documents: {sum(stats['chunks'] for stats in all_stats)} chunks")
+
+
+def _completed_duplicates(documents: List[Document]) -> Dict[int, Document]:
+    """Map document ids to an already processed document with the same content hash."""
+    hashes = {document.content_hash for document in documents if document.content_hash}
+    processed = {}
+    for source in (
+        Document.objects
+        .filter(content_hash__in=hashes, processing_status='completed')
+        .exclude(id__in=[document.id for document in documents])
+        .order_by('created_at')
+    ):
+        processed.setdefault(source.content_hash, source)
+    return {document.id: processed[document.content_hash] for document in documents if document.content_hash in processed}
+
+
+def _extract_documents(documents: List[Document], heartbeat: Callable[[], None] = None) -> List[Union[Tuple[str, int], Exception]]:
+    """Extract each document's text, in parallel processes when files are on local disk.
+
+    `heartbeat`, if given, is called as each file's text arrives.
+    """
+    paths = []
+    for document in documents:
+        try:
+            paths.append(document.file_path.path)
+        except NotImplementedError:
+            paths.append(None)
+
+    results = []
+    workers = min(settings.INGESTION_EXTRACTION_WORKERS, len(documents))
+    if workers <= 1 or None in paths:
+        for document in documents:
+            results.append(_extract_file(document.file_path))
+            if heartbeat is not None:
+                heartbeat()
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_extract_path, paths):
+            results.append(result)
+            if heartbeat is not None:
+                heartbeat()
+    return results
+
+
+def _extract_path(path: str) -> Union[Tuple[str, int], Exception]:
+    """Process pool entry point; runs one extraction in a worker process."""
+    file = File(open(path, 'rb'), name=path)
+    # Lets PDF extraction read the file in place instead of spooling a copy
+    file.path = path
+    # Documents are already spread over processes, so large PDFs don't get a pool of their own
+    return _extract_file(file, pdf_workers=1)
+
+
+def _extract_file(file, pdf_workers: Optional[int] = None) -> Union[Tuple[str, int], Exception]:
+    try:
+        with file.open('rb') as f:
+            return DocumentProcessor.extract_text_from_file(f, pdf_workers=pdf_workers)
+    except Exception as e:
+        # Returned rather than raised so one bad file doesn't fail the whole map
+        return e
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from documents.rag_engine import get_rag_engine
+from documents.snapshots import DTYPES, export_snapshot
+
+
+class Command(BaseCommand):
+    help = "Export chunk embeddings to a snapshot directory, rewriting only documents changed since the last export."
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Snapshot directory; created if missing.")
+        parser.add_argument(
+            '--dtype',
+            choices=DTYPES,
+            default='float16',
+            help="Stored precision; float16 halves the size (default: float16)."
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Rewrite every document instead of only those changed since the last export."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            stats = export_snapshot(
+                options['directory'],
+                get_rag_engine().vector_store,
+                dtype=options['dtype'],
+                full=options['full']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {stats['exported']} documents ({stats['unchanged']} unchanged, "
+            f"{stats['removed']} removed, {stats['skipped']} skipped) to {options['directory']}"
+        ))
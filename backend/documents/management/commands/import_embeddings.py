@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from documents.rag_engine import get_rag_engine
+from documents.snapshots import import_snapshot
+
+
+class Command(BaseCommand):
+    help = "Load an embedding snapshot into the configured vector store without running the model."
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Directory written by export_embeddings.")
+        parser.add_argument(
+            '--document-id',
+            type=int,
+            action='append',
+            dest='document_ids',
+            help="Only import this document (repeatable). Default: every document in the snapshot."
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Vectors per add call to the vector store."
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Importing into the {settings.VECTOR_STORE_BACKEND} vector store")
+        try:
+            stats = import_snapshot(
+                options['directory'],
+                get_rag_engine().vector_store,
+                document_ids=options['document_ids'],
+                batch_size=options['batch_size']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['chunks']} chunks for {stats['documents']} documents ({stats['skipped']} skipped)"
+        ))
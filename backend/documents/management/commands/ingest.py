@@ -0,0 +1,69 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from documents.batch_ingestion import batch_progress, create_batch, iter_archive, iter_directory
+from documents.jobs import claim_jobs, default_worker_id, run_jobs
+from documents.rag_engine import get_rag_engine
+
+
+class Command(BaseCommand):
+    help = "Ingest every supported file in a directory or ZIP archive as one batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Directory (searched recursively) or .zip archive.")
+        parser.add_argument(
+            '--enqueue-only',
+            action='store_true',
+            help="Queue the batch for the ingestion workers instead of processing it here."
+        )
+        parser.add_argument(
+            '--claim-size',
+            type=int,
+            default=settings.INGESTION_CLAIM_BATCH_SIZE,
+            help="Documents ingested together; their chunks share embedding batches."
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if os.path.isdir(path):
+            files = iter_directory(path)
+        elif os.path.isfile(path) and path.lower().endswith('.zip'):
+            files = iter_archive(path)
+        else:
+            raise CommandError(f"{path} is not a directory or .zip archive")
+
+        try:
+            batch = create_batch(files, source=os.path.abspath(path))
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Created batch {batch.id}: {batch.total_files} files, {len(batch.skipped)} skipped")
+        for skipped in batch.skipped:
+            self.stdout.write(f"  skipped {skipped['name']}: {skipped['reason']}")
+
+        if options['enqueue_only']:
+            return
+
+        rag_engine = get_rag_engine()
+        worker_id = f"{default_worker_id()}:ingest"
+        started = time.perf_counter()
+
+        # Only this batch's jobs; running workers may claim some of them too
+        while True:
+            jobs = claim_jobs(worker_id, max(1, options['claim_size']), batch=batch)
+            if not jobs:
+                break
+            run_jobs(jobs, rag_engine)
+            progress = batch_progress(batch, include_files=False)
+            self.stdout.write(
+                f"{progress['percent_complete']:5.1f}% - {progress['completed']} completed, "
+                f"{progress['failed']} failed, {progress['queued']} queued"
+            )
+
+        progress = batch_progress(batch, include_files=False)
+        self.stdout.write(f"Batch {batch.id} {progress['status']} in {time.perf_counter() - started:.1f}s")
+        if progress['queued'] or progress['running']:
+            self.stdout.write(
+                f"{progress['queued'] + progress['running']} file(s) still queued or being processed by workers; "
+                f"follow /api/documents/batches/{batch.id}/"
+            )
@@ -0,0 +1,75 @@
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from documents.jobs import claim_jobs, default_worker_id, run_jobs
+from documents.metrics import start_metrics_server
+from documents.rag_engine import get_rag_engine
+
+
+class Command(BaseCommand):
+    help = "Process queued document ingestion jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Exit once the queue is empty instead of polling."
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.INGESTION_POLL_INTERVAL,
+            help="Seconds to wait between polls when the queue is empty."
+        )
+        parser.add_argument(
+            '--worker-id',
+            default=default_worker_id(),
+            help="Identifier recorded on claimed jobs."
+        )
+        parser.add_argument(
+            '--claim-size',
+            type=int,
+            default=settings.INGESTION_CLAIM_BATCH_SIZE,
+            help="Jobs claimed and ingested together; their chunks share embedding batches."
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=settings.INGESTION_METRICS_PORT,
+            help="Serve Prometheus metrics for this worker on the port (0 disables)."
+        )
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        worker_id = options['worker_id']
+        if options['metrics_port']:
+            start_metrics_server(options['metrics_port'])
+            self.stdout.write(f"Serving metrics on port {options['metrics_port']}")
+
+        rag_engine = get_rag_engine()
+        rag_engine.warm_up()
+        self.stdout.write(f"Ingestion worker {worker_id} started")
+
+        while not self._stopping:
+            close_old_connections()
+            jobs = claim_jobs(worker_id, max(1, options['claim_size']))
+
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f"Claimed {len(jobs)} job(s) for documents {', '.join(str(job.document_id) for job in jobs)}")
+            run_jobs(jobs, rag_engine)
+
+        self.stdout.write(f"Ingestion worker {worker_id} stopped")
+
+    def _request_stop(self, signum, frame):
+        # Finish the current job, then exit the loop
+        self._stopping = True
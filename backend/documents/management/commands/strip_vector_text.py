@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from documents.rag_engine import get_rag_engine
+
+
+class Command(BaseCommand):
+    help = "Remove chunk text from vector store records; search reads it from Postgres instead."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--document-id',
+            type=int,
+            action='append',
+            dest='document_ids',
+            help="Only strip this document's records (repeatable). Default: every record."
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Records read and rewritten per request to the vector store."
+        )
+
+    def handle(self, *args, **options):
+        if settings.VECTOR_STORE_STORE_TEXT:
+            self.stdout.write(self.style.WARNING(
+                "VECTOR_STORE_STORE_TEXT is true, so newly indexed chunks will still store their text."
+            ))
+
+        rag_engine = get_rag_engine()
+        where = rag_engine.document_filter(options['document_ids'])
+
+        stripped = rag_engine.vector_store.strip_documents(where=where, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Stripped text from {stripped} vector store records"))
@@ -0,0 +1,98 @@
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from documents.embedding_backends import OnnxEmbedder, onnx_model_dir
+from documents.models import DocumentChunk
+
+
+class Command(BaseCommand):
+    help = "Compare ONNX Runtime embeddings with the torch SentenceTransformer on a sample of chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample-size',
+            type=int,
+            default=500,
+            help="Chunks to embed with both backends."
+        )
+        parser.add_argument(
+            '--text-file',
+            help="Chunk this text file instead of sampling stored chunks."
+        )
+        parser.add_argument(
+            '--quantize',
+            action='store_true',
+            default=settings.EMBEDDING_ONNX_QUANTIZE,
+            help="Validate the int8 model (default: EMBEDDING_ONNX_QUANTIZE)."
+        )
+        parser.add_argument(
+            '--no-quantize',
+            action='store_false',
+            dest='quantize',
+            help="Validate the float32 model."
+        )
+        parser.add_argument(
+            '--min-agreement',
+            type=float,
+            default=0.99,
+            help="Fail if the mean cosine similarity is below this."
+        )
+
+    def handle(self, *args, **options):
+        from sentence_transformers import SentenceTransformer
+
+        texts = self._sample(options)
+        if not texts:
+            raise CommandError("No text to embed: store some documents or pass --text-file.")
+        batch_size = settings.EMBEDDING_ENCODE_BATCH_SIZE
+
+        self.stdout.write(f"Embedding {len(texts)} chunks with {settings.EMBEDDING_MODEL_NAME}")
+        torch_model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME, device='cpu')
+        # Exports (and quantizes) the model on first run
+        onnx_model = OnnxEmbedder(
+            onnx_model_dir(settings.EMBEDDING_MODEL_NAME),
+            quantize=options['quantize'],
+            batch_size=batch_size,
+            threads=settings.EMBEDDING_ONNX_THREADS
+        )
+
+        torch_vectors, torch_seconds = self._timed(torch_model, texts, batch_size)
+        onnx_vectors, onnx_seconds = self._timed(onnx_model, texts, batch_size)
+
+        cosines = np.sum(_normalize(torch_vectors) * _normalize(onnx_vectors), axis=1)
+        label = 'onnx-int8' if options['quantize'] else 'onnx'
+        self.stdout.write(f"torch:     {len(texts) / torch_seconds:.1f} chunks/s")
+        self.stdout.write(f"{label + ':':<10} {len(texts) / onnx_seconds:.1f} chunks/s ({torch_seconds / onnx_seconds:.2f}x)")
+        self.stdout.write(
+            f"cosine agreement: mean {cosines.mean():.5f}, "
+            f"p1 {np.percentile(cosines, 1):.5f}, min {cosines.min():.5f}"
+        )
+
+        if cosines.mean() < options['min_agreement']:
+            raise CommandError(f"Mean cosine agreement {cosines.mean():.5f} is below {options['min_agreement']}")
+        self.stdout.write(self.style.SUCCESS(f"{label} agrees with torch"))
+
+    def _sample(self, options):
+        if options['text_file']:
+            from documents.rag_engine import get_rag_engine
+
+            with open(options['text_file'], encoding='utf-8', errors='ignore') as f:
+                text = f.read()
+            return get_rag_engine().chunk_text(text)[:options['sample_size']]
+
+        return list(
+            DocumentChunk.objects.order_by('?').values_list('content', flat=True)[:options['sample_size']]
+        )
+
+    @staticmethod
+    def _timed(model, texts, batch_size):
+        # One warm-up call so session and thread pool start-up are not timed
+        model.encode(texts[:1], batch_size=batch_size)
+        started = time.perf_counter()
+        vectors = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32)
+        return vectors, time.perf_counter() - started
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
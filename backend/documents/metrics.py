@@ -0,0 +1,272 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Sequence, Any, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a cached embedding lookup up to a slow LLM answer or a large PDF
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format.
+
+    Metrics live in process memory, so each process (gunicorn worker,
+    ingestion worker) exposes its own values.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric) -> None:
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, such as the number of requests in flight."""
+
+    type = 'gauge'
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket histogram that is safe to observe from many threads."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        super().__init__(name, description, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        # Per-bucket counts; snapshot() and render() make them cumulative
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * (len(self.buckets) + 1), 'count': 0, 'sum': 0.0}
+            series['counts'][index] += 1
+            series['count'] += 1
+            series['sum'] += value
+
+    def snapshot(self, **labels) -> Dict[str, Any]:
+        """Return cumulative bucket counts plus the total count and sum."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            counts = list(series['counts']) if series else [0] * (len(self.buckets) + 1)
+            count, total = (series['count'], series['sum']) if series else (0, 0.0)
+
+        return {
+            'name': self.name,
+            'description': self.description,
+            'buckets': {str(upper_bound): cumulative for upper_bound, cumulative in zip(self.buckets, _cumulative(counts))},
+            'count': count,
+            'sum': total
+        }
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, list(s['counts']), s['count'], s['sum']) for key, s in self._series.items())
+
+        bounds = [f'le="{_number(upper_bound)}"' for upper_bound in self.buckets]
+        infinity = 'le="+Inf"'
+        lines = []
+        for key, counts, count, total in series:
+            for bound, cumulative in zip(bounds, _cumulative(counts)):
+                lines.append(f"{self.name}_bucket{self._format_labels(key, bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, infinity)} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+# Pipeline instrumentation shared by the views, the RAG engine and the document processor
+
+STAGE_DURATION = Histogram(
+    'rag_stage_duration_seconds',
+    'Wall time of each ingestion and question-answering stage.',
+    labelnames=('stage',)
+)
+STAGE_ERRORS = Counter(
+    'rag_stage_errors_total',
+    'Stage invocations that raised an exception.',
+    labelnames=('stage',)
+)
+STAGE_IN_PROGRESS = Gauge(
+    'rag_stage_in_progress',
+    'Stage invocations currently running.',
+    labelnames=('stage',)
+)
+STAGE_ITEMS = Counter(
+    'rag_stage_items_total',
+    'Items handled per stage: pages, chunks, embeddings, vectors or rows.',
+    labelnames=('stage',)
+)
+LLM_TOKENS = Counter(
+    'rag_llm_tokens_total',
+    'Tokens reported by the LLM API usage field.',
+    labelnames=('type',)
+)
+INGESTION_JOBS = Counter(
+    'rag_ingestion_jobs_total',
+    'Ingestion job attempts by outcome: completed, retried or failed.',
+    labelnames=('outcome',)
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Wall time of API requests by view and status code.',
+    labelnames=('view', 'method', 'status')
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress',
+    'API requests currently being handled.',
+    labelnames=('view',)
+)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Time a pipeline stage, counting errors and in-flight invocations."""
+    STAGE_IN_PROGRESS.inc(stage=stage)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # GeneratorExit (a client leaving a stream) is not an error
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started, stage=stage)
+        STAGE_IN_PROGRESS.dec(stage=stage)
+
+
+def record_llm_usage(usage) -> None:
+    """Count prompt and completion tokens from an OpenAI-style `usage` object."""
+    if usage is None:
+        return
+    for token_type in ('prompt_tokens', 'completion_tokens'):
+        value = getattr(usage, token_type, None)
+        if value:
+            LLM_TOKENS.inc(value, type=token_type[:-len('_tokens')])
+
+
+def count_items(stage: str, items: int) -> None:
+    if items:
+        STAGE_ITEMS.inc(items, stage=stage)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve /metrics from a background thread, for processes without a web server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+def _cumulative(counts):
+    total = 0
+    for count in counts[:-1]:
+        total += count
+        yield total
+
+
+def _number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
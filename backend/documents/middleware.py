@@ -0,0 +1,95 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+from .metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS
+
+
+class MetricsMiddleware:
+    """Record request latency and in-flight requests per URL route.
+
+    Routes (e.g. "api/documents/<int:document_id>/") keep label cardinality
+    bounded. For streaming responses the duration covers the time until the
+    response starts; the 'llm_stream' stage covers the rest.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self._request_finished(request)
+        return self._record(request, response, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._request_finished(request)
+        return self._record(request, response, started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        request._metrics_view = match.route if match is not None and match.route else getattr(view_func, '__name__', 'unknown')
+        HTTP_REQUESTS_IN_PROGRESS.inc(view=request._metrics_view)
+        return None
+
+    @staticmethod
+    def _request_finished(request) -> None:
+        view = getattr(request, '_metrics_view', None)
+        if view is not None:
+            HTTP_REQUESTS_IN_PROGRESS.dec(view=view)
+
+    @staticmethod
+    def _record(request, response, started: float):
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            view=getattr(request, '_metrics_view', None) or 'unmatched',
+            method=request.method,
+            status=response.status_code
+        )
+        return response
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """WhiteNoise that can run on the event loop under ASGI.
+
+    Django runs sync-only middleware in a thread per request, which would tie
+    up a thread for the whole of every async /ask/ request. Static lookups
+    are a dict read, so only serving an actual file leaves the loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:30
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='documents_chunk_search_idx'),
+        ),
+        # Index the chunks that already exist, with the configuration queries use
+        migrations.RunSQL(
+            [(
+                "UPDATE documents_documentchunk SET search_vector = to_tsvector(%s::regconfig, content);",
+                [settings.FULL_TEXT_SEARCH_CONFIG],
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
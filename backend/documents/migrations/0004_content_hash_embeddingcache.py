@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_documentchunk_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='documentchunk',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        # Hash the chunks that already exist, as compute_content_hash does:
+        # SHA-256 of the UTF-8 text as lowercase hex
+        migrations.RunSQL(
+            "UPDATE documents_documentchunk "
+            "SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') "
+            "WHERE content_hash = '';",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('model_name', models.CharField(max_length=100)),
+                ('embedding', models.BinaryField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('content_hash', 'model_name')},
+            },
+        ),
+    ]
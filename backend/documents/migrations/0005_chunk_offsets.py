@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_content_hash_embeddingcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='end_offset',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentchunk',
+            name='page_end',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='documentchunk',
+            name='start_offset',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
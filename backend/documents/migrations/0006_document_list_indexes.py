@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_chunk_offsets'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['-created_at', '-id'], name='documents_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['processing_status', '-created_at', '-id'], name='documents_status_list_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:40
+
+from django.db import migrations, models
+import django.db.models.constraints
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_ingestionbatch'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='documentchunk',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='documentchunk',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('document', 'chunk_index'), name='documents_chunk_index_uniq'),
+        ),
+    ]
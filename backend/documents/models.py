@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
 
@@ -14,6 +16,7 @@ class Document(models.Model):
     file_type = models.CharField(max_length=10)
     file_size = models.BigIntegerField()
     pages = models.IntegerField(default=0)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
     processing_status = models.CharField(
         max_length=20, 
         choices=PROCESSING_STATUS_CHOICES, 
@@ -28,13 +31,23 @@ class Document(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the document list, optionally by status
+            models.Index(fields=['-created_at', '-id'], name='documents_list_idx'),
+            models.Index(fields=['processing_status', '-created_at', '-id'], name='documents_status_list_idx'),
+        ]
 
 class DocumentChunk(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='chunks')
     chunk_index = models.IntegerField()
     content = models.TextField()
     page_number = models.IntegerField(default=1)
+    page_end = models.IntegerField(default=1)
+    start_offset = models.IntegerField(null=True, blank=True)
+    end_offset = models.IntegerField(null=True, blank=True)
     embedding_id = models.CharField(max_length=255, unique=True)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
@@ -42,4 +55,83 @@ class DocumentChunk(models.Model):
     
     class Meta:
         ordering = ['chunk_index']
-        unique_together = ['document', 'chunk_index']
\ No newline at end of file
+        constraints = [
+            # Checked at commit, so re-indexing can renumber chunks in any order
+            models.UniqueConstraint(
+                fields=['document', 'chunk_index'],
+                name='documents_chunk_index_uniq',
+                deferrable=models.Deferrable.DEFERRED
+            ),
+        ]
+        indexes = [
+            GinIndex(fields=['search_vector'], name='documents_chunk_search_idx'),
+        ]
+
+class IngestionBatch(models.Model):
+    """A group of files uploaded or imported together, tracked as one unit."""
+
+    source = models.CharField(max_length=255, blank=True, default='')
+    total_files = models.IntegerField(default=0)
+    # Files rejected before ingestion: [{"name": ..., "reason": ...}]
+    skipped = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ingestion batch {self.id} ({self.total_files} files from {self.source or 'upload'})"
+
+    class Meta:
+        ordering = ['-created_at']
+
+class IngestionJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    STAGE_CHOICES = [
+        ('', 'Not started'),
+        ('extracting', 'Extracting'),
+        ('chunking', 'Chunking'),
+        ('embedding', 'Embedding'),
+        ('done', 'Done'),
+    ]
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='ingestion_jobs')
+    batch = models.ForeignKey(IngestionBatch, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    locked_by = models.CharField(max_length=255, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    stats = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ingestion job {self.id} for {self.document.title} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='documents_job_queue_idx'),
+        ]
+
+
+class EmbeddingCache(models.Model):
+    """Embeddings keyed by the SHA-256 of the chunk text, shared by every document."""
+
+    content_hash = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=100)
+    embedding = models.BinaryField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.model_name} embedding for {self.content_hash[:12]}"
+
+    class Meta:
+        unique_together = ['content_hash', 'model_name']
@@ -1,276 +1,1414 @@
+import asyncio
+import hashlib
+import threading
 import uuid
-import openai
-import chromadb
 import re
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, reduce
+from operator import or_
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Tuple, Union
 from django.conf import settings
-from .models import Document, DocumentChunk
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import transaction
+from django.db.models import F, Max
+from .models import Document, DocumentChunk, EmbeddingCache
+from .chunking import Chunk, Chunker
+from .context import pack_context
+from .reranking import mmr
+from .embedding_backends import embedding_model_key, load_embedding_model
+from .embedding_batcher import EmbeddingBatcher
+from .metrics import count_items, record_llm_usage, track_stage
+from .answer_cache import AnswerCache
+from .vector_store import get_vector_store
 
 
 class RAGEngine:
+    """Retrieval-augmented question answering over uploaded documents.
+
+    Construction is cheap: the embedding model, vector store and DeepSeek
+    client are built on first use (or by `warm_up`), so importing the views
+    or running management commands never loads a model or contacts Chroma.
+    """
+
+    ANSWER_ERROR_MESSAGE = (
+        "I encountered an issue generating the answer. Please try again with a "
+        "different question or check the document content."
+    )
+
     def __init__(self):
-        # Initialize ChromaDB
-        self.chroma_client = chromadb.HttpClient(host="chroma-db.zeabur.app", port=8000)
-        self.collection = self.chroma_client.get_or_create_collection(
-            name="document_embeddings",
-            metadata={"hnsw:space": "cosine"}
+        self._embedding_model = None
+        self._vector_store = None
+        self._client = None
+        self._embedding_model_lock = threading.Lock()
+        self._vector_store_lock = threading.Lock()
+        self._client_lock = threading.Lock()
+        self._async_client = None
+        self._llm_loop = None
+        self._token_counts = {}
+
+        # Runs the vector half of hybrid retrieval next to the full-text query
+        self._retrieval_executor = ThreadPoolExecutor(
+            max_workers=settings.RETRIEVAL_THREADS,
+            thread_name_prefix='retrieval'
         )
 
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-
-        # Configure DeepSeek API
-        self.client = openai.OpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com"
+        # Blocking work (embedding, vector search, full-text queries) on the async
+        # path; bounded so a burst of questions cannot spawn unbounded threads
+        self._offload_executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_OFFLOAD_THREADS,
+            thread_name_prefix='rag-offload'
         )
 
-    def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
+        # Coalesce concurrent query embeddings into batched encodes
+        self.embedding_batcher = None
+        if settings.EMBEDDING_BATCH_ENABLED:
+            self.embedding_batcher = EmbeddingBatcher(
+                lambda texts: self.embedding_model.encode(texts),
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS
+            )
+
+        # Reuse answers for repeated or near-duplicate questions
+        self.answer_cache = None
+        if settings.ANSWER_CACHE_ENABLED:
+            self.answer_cache = AnswerCache(
+                similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS
+            )
+
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            with self._embedding_model_lock:
+                if self._embedding_model is None:
+                    self._embedding_model = load_embedding_model()
+        return self._embedding_model
+
+    @property
+    def vector_store(self):
+        # Initialize the vector store (ChromaDB or the embedded NumPy backend)
+        if self._vector_store is None:
+            with self._vector_store_lock:
+                if self._vector_store is None:
+                    self._vector_store = get_vector_store()
+        return self._vector_store
+
+    @property
+    def client(self):
+        # Configure DeepSeek API
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import openai
+                    self._client = openai.OpenAI(
+                        api_key=settings.DEEPSEEK_API_KEY,
+                        base_url=settings.DEEPSEEK_API_URL
+                    )
+        return self._client
+
+    @property
+    def async_client(self):
+        # One AsyncOpenAI per worker. Its connection pool is bound to the loop it
+        # first runs on, and under WSGI every async view gets a fresh loop, so the
+        # client lives on an event loop thread of its own; see `_on_llm_loop`.
+        if self._async_client is None:
+            with self._client_lock:
+                if self._async_client is None:
+                    import openai
+                    client = openai.AsyncOpenAI(
+                        api_key=settings.DEEPSEEK_API_KEY,
+                        base_url=settings.DEEPSEEK_API_URL
+                    )
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='llm-loop', daemon=True).start()
+                    self._llm_loop = loop
+                    self._async_client = client
+        return self._async_client
+
+    async def _on_llm_loop(self, coroutine):
+        """Await a coroutine using `async_client` on the client's own event loop."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._llm_loop)
+        return await asyncio.wrap_future(future)
+
+    def warm_up(self) -> None:
+        """Load the embedding model, connect to the vector store and build the LLM clients ahead of the first request."""
+        self.embedding_model.encode(["warm up"])
+        try:
+            self.vector_store
+        except Exception as e:
+            # Retried on first use; a vector store outage must not block startup
+            print(f"Vector store unavailable during warm-up: {e}")
+        self.client
+        # The async views use their own client and event loop thread
+        self.async_client
+
+    def readiness(self) -> Dict[str, bool]:
+        return {
+            'embedding_model_loaded': self._embedding_model is not None,
+            'vector_store_connected': self._vector_store is not None,
+            'llm_client_ready': self._client is not None,
+            'llm_async_client_ready': self._async_client is not None
+        }
+
+    def chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
         """Split text into overlapping chunks with improved logic."""
-        if not text or not text.strip():
-            return []
+        return [chunk.text for chunk in self.chunk_document(text, chunk_size, overlap)]
 
-        # Clean and normalize the text
-        text = self._clean_text(text)
+    def chunk_document(self, text: str, chunk_size: int = None, overlap: int = None) -> List[Chunk]:
+        """Split text into overlapping chunks that carry character offsets and page spans."""
+        with track_stage('chunk'):
+            chunks = self._chunker(chunk_size, overlap).chunk(text)
+        count_items('chunk', len(chunks))
+        return chunks
 
-        # Try sentence-based chunking first
-        chunks = self._chunk_by_sentences(text, chunk_size, overlap)
+    def _chunker(self, chunk_size: int = None, overlap: int = None) -> Chunker:
+        overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
 
-        # If sentence-based chunking fails or produces too few chunks, use paragraph-based
-        if len(chunks) <= 1 and len(text) > chunk_size * 2:
-            chunks = self._chunk_by_paragraphs(text, chunk_size, overlap)
+        if settings.CHUNK_SIZE_UNIT == 'tokens':
+            # Size chunks in model tokens so nothing is truncated at the model's sequence limit
+            return Chunker(
+                chunk_size=chunk_size or settings.CHUNK_MAX_TOKENS,
+                overlap=overlap,
+                token_counter=self._count_tokens
+            )
 
-        # If still not good, use word-based chunking as fallback
-        if len(chunks) <= 1 and len(text) > chunk_size * 2:
-            chunks = self._chunk_by_words(text, chunk_size, overlap)
+        return Chunker(chunk_size=chunk_size or settings.CHUNK_SIZE, overlap=overlap)
 
-        # Filter out very short chunks
-        chunks = [chunk for chunk in chunks if len(chunk.strip()) > 50]
+    def _count_tokens(self, word: str) -> int:
+        count = self._token_counts.get(word)
+        if count is None:
+            count = len(self.embedding_model.tokenizer.tokenize(word))
+            if len(self._token_counts) < 500000:
+                self._token_counts[word] = count
+        return count
 
-        # Return original text if all methods fail
-        return chunks if chunks else [text]
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for text chunks."""
+        if not texts:
+            return []
+        with track_stage('embed'):
+            embeddings = self.embedding_model.encode(texts, batch_size=settings.EMBEDDING_ENCODE_BATCH_SIZE).tolist()
+        count_items('embed', len(texts))
+        return embeddings
+
+    def embed_query(self, query: str) -> List[float]:
+        """Generate the embedding for a single query, batched with concurrent callers."""
+        with track_stage('embed_query'):
+            if self.embedding_batcher is not None:
+                return self.embedding_batcher.embed(query)
+
+            embeddings = self.generate_embeddings([query])
+            return embeddings[0] if embeddings else None
+
+    def generate_embeddings_cached(self, texts: List[str]) -> Tuple[List[List[float]], Dict[str, int]]:
+        """Generate embeddings, reusing any text embedded before by content hash.
+
+        Returns the embeddings in input order plus hit/miss counts; only texts
+        never seen before go through the embedding model.
+        """
+        embeddings, cached = self._embed_with_cache(texts)
+        hits = sum(cached)
+        return embeddings, {'hits': hits, 'misses': len(texts) - hits}
+
+    def _embed_with_cache(self, texts: List[str]) -> Tuple[List[List[float]], List[bool]]:
+        """Embeddings in input order, plus whether each came from the cache."""
+        if not texts:
+            return [], []
+
+        model_name = embedding_model_key()
+        hashes = [compute_content_hash(text) for text in texts]
+
+        with track_stage('embedding_cache_read'):
+            vectors = {
+                entry['content_hash']: np.frombuffer(bytes(entry['embedding']), dtype=np.float32).tolist()
+                for entry in EmbeddingCache.objects.filter(
+                    content_hash__in=set(hashes),
+                    model_name=model_name
+                ).values('content_hash', 'embedding')
+            }
+        cached = [text_hash in vectors for text_hash in hashes]
+
+        # Encode each unseen text once, even if it repeats within the batch
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+
+        if missing:
+            new_vectors = self.generate_embeddings(list(missing.values()))
+            with track_stage('db_write'):
+                EmbeddingCache.objects.bulk_create(
+                    [
+                        EmbeddingCache(
+                            content_hash=text_hash,
+                            model_name=model_name,
+                            embedding=np.asarray(vector, dtype=np.float32).tobytes()
+                        )
+                        for text_hash, vector in zip(missing, new_vectors)
+                    ],
+                    ignore_conflicts=True,
+                    batch_size=1000
+                )
+            vectors.update(zip(missing, new_vectors))
+
+        return [vectors[text_hash] for text_hash in hashes], cached
+
+    def store_document_embeddings(self, document: Document, chunks: List[Union[str, Chunk]],
+                                  heartbeat: Callable[[], None] = None) -> Dict[str, int]:
+        """Store document chunks and their embeddings in the vector store.
+
+        `chunks` are plain strings or `Chunk`s from `chunk_document`, whose
+        page span and character offsets are kept with each chunk. Returns the
+        number of chunks stored and how many of their embeddings came from the
+        embedding cache.
+        """
+        return self.store_documents_embeddings([(document, chunks)], heartbeat=heartbeat)[0]
+
+    def store_documents_embeddings(self, documents_chunks: List[Tuple[Document, List[Union[str, Chunk]]]],
+                                   heartbeat: Callable[[], None] = None) -> List[Dict[str, int]]:
+        """Store the chunks of several documents with one pass through each backend.
+
+        Chunks from every new document are embedded together, so the model
+        sees large batches, then written with a single bulk insert and a
+        single vector store add. Documents that already have chunks are
+        re-indexed incrementally by `reindex_document`. Returns
+        `store_document_embeddings` stats per document.
+
+        `heartbeat`, if given, is called after every INGESTION_STREAM_BATCH_SIZE
+        embeddings and before each write, so a caller holding a lock can renew it.
+        """
+        documents_chunks = [
+            (document, [chunk if isinstance(chunk, Chunk) else Chunk(chunk, None, None, 1, 1) for chunk in chunks])
+            for document, chunks in documents_chunks
+        ]
+        indexed = set(
+            DocumentChunk.objects
+            .filter(document__in=[document for document, _ in documents_chunks])
+            .order_by()
+            .values_list('document_id', flat=True)
+            .distinct()
+        )
 
-    def _clean_text(self, text: str) -> str:
-        """Clean and normalize text."""
-        # Replace multiple whitespace characters with single space
-        text = re.sub(r'\s+', ' ', text)
+        new_stats = iter(self._store_new_documents([
+            (document, chunks) for document, chunks in documents_chunks if document.id not in indexed
+        ], heartbeat=heartbeat))
+        return [
+            self.reindex_document(document, chunks, heartbeat=heartbeat) if document.id in indexed else next(new_stats)
+            for document, chunks in documents_chunks
+        ]
+
+    def _embed_in_batches(self, texts: List[str], heartbeat: Callable[[], None] = None) -> Tuple[List[List[float]], List[bool]]:
+        """`_embed_with_cache`, calling `heartbeat` after every INGESTION_STREAM_BATCH_SIZE texts."""
+        if heartbeat is None:
+            return self._embed_with_cache(texts)
+
+        embeddings = []
+        cached = []
+        for start in range(0, len(texts), settings.INGESTION_STREAM_BATCH_SIZE):
+            batch_embeddings, batch_cached = self._embed_with_cache(texts[start:start + settings.INGESTION_STREAM_BATCH_SIZE])
+            embeddings.extend(batch_embeddings)
+            cached.extend(batch_cached)
+            heartbeat()
+        return embeddings, cached
+
+    def _store_new_documents(self, documents_chunks: List[Tuple[Document, List[Chunk]]],
+                             heartbeat: Callable[[], None] = None) -> List[Dict[str, int]]:
+        """Replace every chunk and vector of the documents with `documents_chunks`."""
+        if not documents_chunks:
+            return []
 
-        # Remove excessive newlines but keep paragraph breaks
-        text = re.sub(r'\n\s*\n', '\n\n', text)
+        for document, chunks in documents_chunks:
+            if not chunks:
+                print(f"No chunks to store for document {document.id}")
+
+        texts = [chunk.text for _, chunks in documents_chunks for chunk in chunks]
+        embeddings, cached = self._embed_in_batches(texts, heartbeat)
+
+        all_stats = []
+        position = 0
+        for document, chunks in documents_chunks:
+            hits = sum(cached[position:position + len(chunks)])
+            position += len(chunks)
+            all_stats.append({
+                'chunks': len(chunks),
+                'embedding_cache_hits': hits,
+                'embedding_cache_misses': len(chunks) - hits
+            })
+        if not embeddings:
+            return all_stats
 
-        # Fix common PDF extraction issues
-        text = text.replace('\n', ' ')  # Convert newlines to spaces
-        text = re.sub(r'\s+', ' ', text)  # Multiple spaces to single space
+        stored = [document for document, chunks in documents_chunks if chunks]
 
-        return text.strip()
+        # Answers cached against the old chunks are no longer valid
+        if self.answer_cache is not None:
+            for document in stored:
+                self.answer_cache.invalidate(document.id)
 
-    def _chunk_by_sentences(self, text: str, chunk_size: int, overlap: int) -> List[str]:
-        """Chunk text by sentences."""
-        # More comprehensive sentence splitting
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        ids = []
+        metadatas = []
+        rows = []
+
+        for document, chunks in documents_chunks:
+            for i, chunk in enumerate(chunks):
+                embedding_id = str(uuid.uuid4())
+
+                ids.append(embedding_id)
+                metadatas.append(self.vector_metadata(document, i, chunk))
+
+                rows.append(DocumentChunk(
+                    document=document,
+                    chunk_index=i,
+                    content=chunk.text,
+                    page_number=chunk.page_start,
+                    page_end=chunk.page_end,
+                    start_offset=chunk.start_offset,
+                    end_offset=chunk.end_offset,
+                    content_hash=compute_content_hash(chunk.text),
+                    embedding_id=embedding_id
+                ))
+
+        # Rows and vectors are replaced together: the vector add comes last in the
+        # transaction, so if it fails no chunk rows are left without vectors and a
+        # retry indexes the documents from scratch
+        with transaction.atomic():
+            with track_stage('db_write'):
+                DocumentChunk.objects.filter(document__in=stored).delete()
+                DocumentChunk.objects.bulk_create(rows, batch_size=500)
+                self._index_chunk_text(DocumentChunk.objects.filter(document__in=stored))
+            count_items('db_write', len(rows))
 
-        if len(sentences) <= 1:
+            try:
+                with track_stage('vector_delete'):
+                    # By document rather than by id, so vectors left behind by an earlier failure go too
+                    self.vector_store.delete(where=self.document_filter([document.id for document in stored]))
+                with track_stage('vector_add'):
+                    self.vector_store.add(
+                        embeddings=embeddings,
+                        documents=texts if settings.VECTOR_STORE_STORE_TEXT else None,
+                        metadatas=metadatas,
+                        ids=ids
+                    )
+                count_items('vector_add', len(ids))
+            except Exception as e:
+                print(f"Error storing embeddings in the vector store: {e}")
+                raise
+
+        for document, stats in zip((document for document, _ in documents_chunks), all_stats):
+            if stats['chunks']:
+                print(
+                    f"Successfully stored {stats['chunks']} chunks for document {document.id} "
+                    f"({stats['embedding_cache_hits']} embeddings reused)")
+
+        return all_stats
+
+    def reindex_document(self, document: Document, chunks: List[Chunk], heartbeat: Callable[[], None] = None) -> Dict[str, int]:
+        """Bring an indexed document's chunks up to date, embedding only new text.
+
+        New chunks are matched to stored ones by content hash. A matched chunk
+        keeps its row, embedding id and vector and is only renumbered; only
+        unmatched chunks are embedded, and stored chunks left unmatched are
+        deleted. The Postgres changes commit in one transaction, after which
+        the vector store is reconciled: vanished ids deleted, new vectors
+        added and the metadata of kept ones updated. If reconciling fails the
+        document is rebuilt in full.
+        """
+        if not chunks:
+            print(f"No chunks to store for document {document.id}")
+            return {'chunks': 0, 'embedding_cache_hits': 0, 'embedding_cache_misses': 0}
+
+        # Embed the text that looks new before locking, so row locks are not held for model time
+        _, _, added, _ = self._diff_chunks(document, chunks)
+        embedded = {}
+        for row, vector, hit in zip(added, *self._embed_in_batches([row.content for row in added], heartbeat)):
+            embedded[row.content_hash] = (vector, hit)
+
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(document.id)
+
+        with transaction.atomic():
+            # Serialize re-indexes of the same document, then diff against the rows as locked
+            list(Document.objects.select_for_update().filter(id=document.id).values_list('id', flat=True))
+            kept, moved, added, vanished = self._diff_chunks(document, chunks)
+
+            # Only a concurrent change to the rows leaves text that wasn't embedded above
+            missing = [row for row in added if row.content_hash not in embedded]
+            for row, vector, hit in zip(missing, *self._embed_with_cache([row.content for row in missing])):
+                embedded[row.content_hash] = (vector, hit)
+            embeddings = [embedded[row.content_hash][0] for row in added]
+            cached = [embedded[row.content_hash][1] for row in added]
+
+            with track_stage('db_write'):
+                DocumentChunk.objects.filter(id__in=[row.id for row in vanished]).delete()
+                # The (document, chunk_index) constraint is deferred to commit, so the order doesn't matter
+                DocumentChunk.objects.bulk_update(
+                    moved,
+                    ['chunk_index', 'page_number', 'page_end', 'start_offset', 'end_offset'],
+                    batch_size=1000
+                )
+                DocumentChunk.objects.bulk_create(added, batch_size=500)
+                if added:
+                    self._index_chunk_text(DocumentChunk.objects.filter(id__in=[row.id for row in added]))
+            count_items('db_write', len(added) + len(moved) + len(vanished))
+
+            transaction.on_commit(partial(
+                self._reconcile_vectors, document, chunks, vanished, added, embeddings, kept
+            ))
+
+        hits = sum(cached)
+        print(
+            f"Re-indexed document {document.id}: {len(kept)} chunks kept, "
+            f"{len(added)} added ({hits} embeddings reused), {len(vanished)} removed")
+        return {
+            'chunks': len(chunks),
+            'embedding_cache_hits': hits,
+            'embedding_cache_misses': len(added) - hits,
+            'chunks_kept': len(kept),
+            'chunks_added': len(added),
+            'chunks_removed': len(vanished)
+        }
+
+    def _diff_chunks(self, document: Document, chunks: List[Chunk]):
+        """Match new chunks to the document's stored rows by content hash.
+
+        Returns (kept, moved, added, vanished): rows reused for a chunk, the
+        kept rows whose position changed (updated in memory), unsaved rows for
+        unmatched chunks and stored rows no chunk matched.
+        """
+        with track_stage('reindex_diff'):
+            available = {}
+            for row in DocumentChunk.objects.filter(document=document).order_by('chunk_index'):
+                available.setdefault(row.content_hash, []).append(row)
+
+            kept = []
+            moved = []
+            added = []
+            for i, chunk in enumerate(chunks):
+                rows = available.get(compute_content_hash(chunk.text))
+                if rows:
+                    row = rows.pop(0)
+                    position = (i, chunk.page_start, chunk.page_end, chunk.start_offset, chunk.end_offset)
+                    if position != (row.chunk_index, row.page_number, row.page_end, row.start_offset, row.end_offset):
+                        row.chunk_index, row.page_number, row.page_end, row.start_offset, row.end_offset = position
+                        moved.append(row)
+                    kept.append(row)
+                else:
+                    added.append(DocumentChunk(
+                        document=document,
+                        chunk_index=i,
+                        content=chunk.text,
+                        page_number=chunk.page_start,
+                        page_end=chunk.page_end,
+                        start_offset=chunk.start_offset,
+                        end_offset=chunk.end_offset,
+                        content_hash=compute_content_hash(chunk.text),
+                        embedding_id=str(uuid.uuid4())
+                    ))
+            vanished = [row for rows in available.values() for row in rows]
+        return kept, moved, added, vanished
+
+    def _reconcile_vectors(self, document: Document, chunks: List[Chunk], vanished: List[DocumentChunk],
+                           added: List[DocumentChunk], embeddings: List[List[float]], kept: List[DocumentChunk]) -> None:
+        """Apply a committed re-index to the vector store."""
+        try:
+            if vanished:
+                with track_stage('vector_delete'):
+                    self.vector_store.delete(ids=[row.embedding_id for row in vanished])
+            if added:
+                with track_stage('vector_add'):
+                    self.vector_store.add(
+                        ids=[row.embedding_id for row in added],
+                        embeddings=embeddings,
+                        metadatas=[self.vector_metadata(document, row.chunk_index, chunks[row.chunk_index]) for row in added],
+                        documents=[row.content for row in added] if settings.VECTOR_STORE_STORE_TEXT else None
+                    )
+                count_items('vector_add', len(added))
+            if kept:
+                # Kept rows whose vectors never made it into the store (an earlier
+                # failed add) get them now; the store ignores updates to unknown ids
+                stored = set(self.vector_store.get(where={'document_id': document.id})['ids'])
+                absent = [row for row in kept if row.embedding_id not in stored]
+                present = [row for row in kept if row.embedding_id in stored]
+                if absent:
+                    with track_stage('vector_add'):
+                        self.vector_store.add(
+                            ids=[row.embedding_id for row in absent],
+                            embeddings=self._embed_with_cache([row.content for row in absent])[0],
+                            metadatas=[self.vector_metadata(document, row.chunk_index, chunks[row.chunk_index]) for row in absent],
+                            documents=[row.content for row in absent] if settings.VECTOR_STORE_STORE_TEXT else None
+                        )
+                    count_items('vector_add', len(absent))
+                if present:
+                    # Metadata only, no vectors; it also carries the title, which may have changed
+                    with track_stage('vector_update'):
+                        self.vector_store.update(
+                            ids=[row.embedding_id for row in present],
+                            metadatas=[self.vector_metadata(document, row.chunk_index, chunks[row.chunk_index]) for row in present]
+                        )
+        except Exception as e:
+            print(f"Reconciling the vector store for document {document.id} failed, rebuilding it: {e}")
+            try:
+                self.vector_store.delete(where={'document_id': document.id})
+                self._store_new_documents([(document, chunks)])
+            except Exception:
+                # Leave no chunks behind, so a retry indexes the document from scratch
+                DocumentChunk.objects.filter(document=document).delete()
+                raise
+
+    def store_document_stream(self, document: Document, windows: Iterable[str],
+                              progress: Callable[[Dict[str, int]], None] = None) -> Dict[str, int]:
+        """Chunk, embed and store a document from an iterable of text windows.
+
+        The document's old index is cleared first. Chunks are then embedded
+        and written in batches of INGESTION_STREAM_BATCH_SIZE, each batch going
+        to Postgres and the vector store before the next is read, so memory
+        holds one window and one batch however long the document is.
+        `progress` is called with the running stats after every batch.
+        """
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(document.id)
+
+        with track_stage('vector_delete'):
+            self.vector_store.delete(where={'document_id': document.id})
+        with track_stage('db_write'):
+            DocumentChunk.objects.filter(document=document).delete()
+
+        stats = {'chunks': 0, 'embedding_cache_hits': 0, 'embedding_cache_misses': 0, 'characters_processed': 0}
+        batch = []
+
+        def flush():
+            count_items('chunk', len(batch))
+            embeddings, cached = self._embed_with_cache([chunk.text for chunk in batch])
+            first = stats['chunks']
+            ids = [str(uuid.uuid4()) for _ in batch]
+
+            with track_stage('db_write'):
+                DocumentChunk.objects.bulk_create(
+                    [
+                        DocumentChunk(
+                            document=document,
+                            chunk_index=first + i,
+                            content=chunk.text,
+                            page_number=chunk.page_start,
+                            page_end=chunk.page_end,
+                            start_offset=chunk.start_offset,
+                            end_offset=chunk.end_offset,
+                            content_hash=compute_content_hash(chunk.text),
+                            embedding_id=embedding_id
+                        )
+                        for i, (chunk, embedding_id) in enumerate(zip(batch, ids))
+                    ],
+                    batch_size=500
+                )
+                self._index_chunk_text(DocumentChunk.objects.filter(document=document, chunk_index__gte=first))
+            count_items('db_write', len(batch))
+
+            with track_stage('vector_add'):
+                self.vector_store.add(
+                    ids=ids,
+                    embeddings=embeddings,
+                    metadatas=[self.vector_metadata(document, first + i, chunk) for i, chunk in enumerate(batch)],
+                    documents=[chunk.text for chunk in batch] if settings.VECTOR_STORE_STORE_TEXT else None
+                )
+            count_items('vector_add', len(batch))
+
+            hits = sum(cached)
+            stats['chunks'] += len(batch)
+            stats['embedding_cache_hits'] += hits
+            stats['embedding_cache_misses'] += len(batch) - hits
+            stats['characters_processed'] = batch[-1].end_offset
+            batch.clear()
+            if progress is not None:
+                progress(dict(stats))
+
+        for chunk in self._chunker().chunk_stream(windows):
+            batch.append(chunk)
+            if len(batch) >= settings.INGESTION_STREAM_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+
+        if stats['chunks']:
+            print(
+                f"Successfully stored {stats['chunks']} chunks for document {document.id} "
+                f"({stats['embedding_cache_hits']} embeddings reused)")
+        else:
+            print(f"No chunks to store for document {document.id}")
+        return stats
+
+    @staticmethod
+    def vector_metadata(document: Document, index: int, chunk: Chunk) -> Dict[str, Any]:
+        """Metadata stored with a chunk's vector.
+
+        Without VECTOR_STORE_STORE_TEXT the vector store only keeps what
+        search filters on; the rest is read from Postgres with the text.
+        """
+        metadata = {'document_id': document.id, 'chunk_index': index}
+        if not settings.VECTOR_STORE_STORE_TEXT:
+            return metadata
+
+        metadata.update({
+            'document_title': document.title,
+            'page_number': chunk.page_start,
+            'page_end': chunk.page_end
+        })
+        if chunk.start_offset is not None:
+            metadata['start_offset'] = chunk.start_offset
+            metadata['end_offset'] = chunk.end_offset
+        return metadata
+
+    def clone_document_index(self, source: Document, document: Document) -> Dict[str, int]:
+        """Index a duplicate upload by copying the chunks of an identical, processed document."""
+        return self.store_document_embeddings(document, self.stored_chunks(source))
+
+    def stored_chunks(self, document: Document) -> List[Chunk]:
+        """A processed document's chunks, in order, as `Chunk`s."""
+        return [
+            Chunk(*row)
+            for row in DocumentChunk.objects
+            .filter(document=document)
+            .order_by('chunk_index')
+            .values_list('content', 'start_offset', 'end_offset', 'page_number', 'page_end')
+        ]
+
+    def _index_chunk_text(self, chunks) -> None:
+        """Refresh the full-text search vectors for a queryset of chunks."""
+        chunks.update(search_vector=SearchVector('content', config=settings.FULL_TEXT_SEARCH_CONFIG))
+
+    def similarity_search(self, query: str, document_id: Union[int, List[int], None], num_results: int = 3, query_embedding: List[float] = None, mode: str = None, rerank: bool = None) -> List[Dict[str, Any]]:
+        """Perform similarity search for relevant chunks.
+
+        `document_id` may be a single id, a list of ids searched together as one
+        global top-k, or None to search every indexed document. In 'hybrid' mode
+        the vector query and a Postgres full-text query run concurrently and
+        their rankings are merged with reciprocal rank fusion. With `rerank`
+        (default RETRIEVAL_MMR_ENABLED), RETRIEVAL_CANDIDATE_MULTIPLIER times
+        as many candidates are fetched and re-ranked with maximal marginal
+        relevance, so the results are relevant but not near-duplicates.
+        """
+        if not query or (document_id is not None and not document_id):
             return []
 
-        chunks = []
-        current_chunk = ""
+        try:
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
+            if query_embedding is None:
+                return []
+        except Exception as e:
+            print(f"Error in similarity search: {str(e)}")
+            return []
 
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
+        return self.similarity_search_many([query], document_id, num_results, [query_embedding], mode, rerank)[0]
 
-            # Check if adding this sentence would exceed chunk size
-            if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-                chunks.append(current_chunk.strip())
+    def similarity_search_many(self, queries: List[str], document_id: Union[int, List[int], None], num_results: int = 3, query_embeddings: List[List[float]] = None, mode: str = None, rerank: bool = None) -> List[List[Dict[str, Any]]]:
+        """`similarity_search` for several queries over the same documents.
 
-                # Add overlap from the end of current chunk
-                if overlap > 0:
-                    words = current_chunk.split()
-                    overlap_words = words[-min(overlap, len(words)):]
-                    current_chunk = ' '.join(overlap_words) + ' ' + sentence
-                else:
-                    current_chunk = sentence
+        Returns one result list per query. Queries without embeddings are
+        encoded in one call and all of them go to the vector store in a single
+        multi-query request; a query whose fusion or re-ranking fails gets an
+        empty list without affecting the rest.
+        """
+        if not queries or (document_id is not None and not document_id):
+            return [[] for _ in queries]
+
+        mode = mode or settings.RETRIEVAL_MODE
+        rerank = settings.RETRIEVAL_MMR_ENABLED if rerank is None else rerank
+        num_candidates = num_results * settings.RETRIEVAL_CANDIDATE_MULTIPLIER
+        num_fetched = num_candidates if mode == 'hybrid' or rerank else num_results
+
+        try:
+            if query_embeddings is None:
+                query_embeddings = self.generate_embeddings(list(queries))
+
+            if mode != 'hybrid':
+                vector_results = self._vector_search(query_embeddings, document_id, num_fetched, rerank)
+                lexical_results = [[] for _ in queries]
             else:
-                current_chunk += (' ' if current_chunk else '') + sentence
+                # Vector search runs on the pool; the lexical queries need this thread's DB connection
+                vector_future = self._retrieval_executor.submit(
+                    self._vector_search, query_embeddings, document_id, num_fetched, rerank
+                )
+                lexical_results = []
+                for query in queries:
+                    try:
+                        with track_stage('lexical_search'):
+                            lexical_results.append(self._lexical_search(query, document_id, num_candidates))
+                    except Exception as e:
+                        print(f"Error in full-text search: {e}")
+                        lexical_results.append([])
+                vector_results = vector_future.result()
+
+            self._hydrate_chunks([chunk for chunks in vector_results for chunk in chunks])
+            vector_results = [[chunk for chunk in chunks if chunk['content']] for chunks in vector_results]
 
-        # Add the last chunk
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        except Exception as e:
+            print(f"Error in similarity search: {str(e)}")
+            return [[] for _ in queries]
 
-        return chunks
+        results = []
+        for query_embedding, vector_chunks, lexical_chunks in zip(query_embeddings, vector_results, lexical_results):
+            try:
+                chunks = vector_chunks
+                if mode == 'hybrid':
+                    chunks = self._reciprocal_rank_fusion(
+                        [vector_chunks, lexical_chunks],
+                        num_candidates if rerank else num_results
+                    )
+                results.append(self._rerank(query_embedding, chunks, num_results) if rerank else chunks)
+            except Exception as e:
+                print(f"Error in similarity search: {str(e)}")
+                results.append([])
+        return results
+
+    def _vector_search(self, query_embeddings: List[List[float]], document_id: Union[int, List[int], None], num_results: int, include_embeddings: bool = False) -> List[List[Dict[str, Any]]]:
+        """Run every query embedding in one vector store call; one chunk list per query."""
+        with track_stage('vector_query'):
+            results = self.vector_store.query(
+                query_embeddings=list(query_embeddings),
+                n_results=num_results,
+                where=self.document_filter(document_id),
+                include_embeddings=include_embeddings,
+                include_documents=settings.VECTOR_STORE_STORE_TEXT
+            )
 
-    def _chunk_by_paragraphs(self, text: str, chunk_size: int, overlap: int) -> List[str]:
-        """Chunk text by paragraphs."""
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+        # Validate and process results
+        if not results or not results.get('ids'):
+            return [[] for _ in query_embeddings]
 
-        if len(paragraphs) <= 1:
-            return []
+        return [
+            self._vector_hits(results, q, document_id, include_embeddings) if q < len(results['ids']) else []
+            for q in range(len(query_embeddings))
+        ]
 
-        chunks = []
-        current_chunk = ""
+    @staticmethod
+    def _vector_hits(results: Dict[str, List[List[Any]]], q: int, document_id: Union[int, List[int], None], include_embeddings: bool) -> List[Dict[str, Any]]:
+        relevant_chunks = []
+        for i in range(len(results['ids'][q])):
+            try:
+                chunk_id = results['ids'][q][i]
+                if not chunk_id:
+                    continue
 
-        for paragraph in paragraphs:
-            if len(current_chunk) + len(paragraph) > chunk_size and current_chunk:
-                chunks.append(current_chunk.strip())
+                chunk_data = {
+                    'id': chunk_id,
+                    'content': results['documents'][q][i] if results.get('documents') else None,
+                    'distance': results['distances'][q][i],
+                    'metadata': results['metadatas'][q][i] if results['metadatas'] else {
+                        'document_id': document_id if isinstance(document_id, int) else None,
+                        'chunk_index': i
+                    }
+                }
+                if include_embeddings and results.get('embeddings') is not None:
+                    chunk_data['embedding'] = results['embeddings'][q][i]
+                relevant_chunks.append(chunk_data)
+            except (IndexError, KeyError):
+                continue
 
-                # Add overlap
-                if overlap > 0:
-                    words = current_chunk.split()
-                    overlap_words = words[-min(overlap, len(words)):]
-                    current_chunk = ' '.join(overlap_words) + ' ' + paragraph
-                else:
-                    current_chunk = paragraph
+        return relevant_chunks
+
+    def _hydrate_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        """Fill in the text of vector hits stored without it, in one query by embedding id.
+
+        Page span, offsets and title come from the same rows, so a vector
+        store holding only ids, vectors and document ids still yields
+        complete chunks. Hits whose row no longer exists keep no content.
+        """
+        missing = {chunk['id']: chunk for chunk in chunks if not chunk['content']}
+        if not missing:
+            return
+
+        with track_stage('hydrate'):
+            rows = DocumentChunk.objects.filter(embedding_id__in=list(missing)).order_by().values(
+                'embedding_id', 'content', 'page_number', 'page_end', 'start_offset', 'end_offset', 'document__title'
+            )
+            for row in rows:
+                chunk = missing[row['embedding_id']]
+                chunk['content'] = row['content']
+                metadata = dict(chunk['metadata'], document_title=row['document__title'],
+                                page_number=row['page_number'], page_end=row['page_end'])
+                if row['start_offset'] is not None:
+                    metadata['start_offset'] = row['start_offset']
+                    metadata['end_offset'] = row['end_offset']
+                chunk['metadata'] = metadata
+
+    def _rerank(self, query_embedding: List[float], chunks: List[Dict[str, Any]], num_results: int) -> List[Dict[str, Any]]:
+        """Pick a diverse top `num_results` from `chunks` with maximal marginal relevance."""
+        if len(chunks) <= 1:
+            return [self._without_embedding(chunk) for chunk in chunks]
+
+        with track_stage('rerank'):
+            embeddings = self._candidate_embeddings(chunks)
+            if all(chunk.get('score') is not None for chunk in chunks):
+                # Fused hybrid scores: keep the lexical signal, scaled like a similarity
+                scores = np.array([chunk['score'] for chunk in chunks], dtype=np.float32)
+                relevance = scores / scores.max()
             else:
-                current_chunk += ('\n\n' if current_chunk else '') + paragraph
+                relevance = np.array([
+                    1.0 - chunk['distance'] if chunk.get('distance') is not None else 0.0
+                    for chunk in chunks
+                ], dtype=np.float32)
+            order = mmr(query_embedding, embeddings, num_results, settings.RETRIEVAL_MMR_LAMBDA, relevance)
+
+        return [self._without_embedding(chunks[i]) for i in order]
+
+    def _candidate_embeddings(self, chunks: List[Dict[str, Any]]) -> np.ndarray:
+        """Stored vectors for the candidates; full-text hits are looked up in the embedding cache.
+
+        Nothing is re-encoded: a chunk with neither is left as a zero row,
+        which MMR treats as similar to nothing.
+        """
+        missing = {
+            compute_content_hash(chunk['content']): i
+            for i, chunk in enumerate(chunks) if chunk.get('embedding') is None
+        }
+        cached = {}
+        if missing:
+            cached = {
+                entry['content_hash']: np.frombuffer(bytes(entry['embedding']), dtype=np.float32)
+                for entry in EmbeddingCache.objects.filter(
+                    content_hash__in=list(missing),
+                    model_name=embedding_model_key()
+                ).values('content_hash', 'embedding')
+            }
+        rows = {i: cached[text_hash] for text_hash, i in missing.items() if text_hash in cached}
+
+        vectors = [chunk.get('embedding') if chunk.get('embedding') is not None else rows.get(i) for i, chunk in enumerate(chunks)]
+        dimension = next((len(vector) for vector in vectors if vector is not None), 1)
+        return np.array([
+            vector if vector is not None else np.zeros(dimension, dtype=np.float32)
+            for vector in vectors
+        ], dtype=np.float32)
+
+    @staticmethod
+    def _without_embedding(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in chunk.items() if key != 'embedding'}
+
+    @staticmethod
+    def document_filter(document_id: Union[int, List[int], None]) -> Optional[Dict[str, Any]]:
+        """Build the vector store metadata filter for one, several or all documents."""
+        if document_id is None:
+            return None
+        if isinstance(document_id, (list, tuple)):
+            if len(document_id) == 1:
+                return {"document_id": document_id[0]}
+            return {"document_id": {"$in": list(document_id)}}
+        return {"document_id": document_id}
+
+    def _lexical_search(self, query: str, document_id: Union[int, List[int], None], num_results: int) -> List[Dict[str, Any]]:
+        """Rank chunks against the query terms with Postgres full-text search."""
+        config = settings.FULL_TEXT_SEARCH_CONFIG
+        terms = list(dict.fromkeys(re.findall(r'\w+', query.lower())))[:32]
+        if not terms:
+            return []
 
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        # OR the terms together: a natural-language question rarely matches every word
+        search_query = reduce(or_, [SearchQuery(term, config=config) for term in terms])
+
+        chunks = DocumentChunk.objects.filter(search_vector=search_query)
+        if isinstance(document_id, (list, tuple)):
+            chunks = chunks.filter(document_id__in=document_id)
+        elif document_id is not None:
+            chunks = chunks.filter(document_id=document_id)
+
+        rows = (
+            chunks
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', 'chunk_index')
+            .values('embedding_id', 'content', 'chunk_index', 'page_number', 'document_id', 'document__title', 'rank')
+            [:num_results]
+        )
 
-        return chunks
+        return [
+            {
+                'id': row['embedding_id'],
+                'content': row['content'],
+                'distance': None,
+                'metadata': {
+                    'document_id': row['document_id'],
+                    'chunk_index': row['chunk_index'],
+                    'page_number': row['page_number'],
+                    'document_title': row['document__title']
+                }
+            }
+            for row in rows
+        ]
+
+    def _reciprocal_rank_fusion(self, rankings: List[List[Dict[str, Any]]], num_results: int) -> List[Dict[str, Any]]:
+        """Merge ranked chunk lists, scoring each chunk by the sum of 1 / (k + rank)."""
+        scores = {}
+        chunks = {}
+        for ranking in rankings:
+            for rank, chunk in enumerate(ranking):
+                chunk_id = chunk['id']
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (settings.RETRIEVAL_RRF_K + rank + 1)
+                # Keep the vector hit when both lists return the chunk: it carries the distance
+                chunks.setdefault(chunk_id, chunk)
+
+        ranked_ids = sorted(scores, key=scores.get, reverse=True)[:num_results]
+        return [dict(chunks[chunk_id], score=scores[chunk_id]) for chunk_id in ranked_ids]
+
+    def answer_question(self, question: str, documents: Optional[List[Document]], num_results: int = 3, retrieval_mode: str = None) -> Dict[str, Any]:
+        """Answer a question with one LLM call, serving repeats from the answer cache.
+
+        `documents` lists the documents to search; None searches every indexed document.
+        """
+        scope = self._document_scope(documents)
+        query_embedding, cache_variant, cached = self._check_answer_cache(question, scope, num_results, retrieval_mode)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        relevant_chunks = self.similarity_search(
+            query=question,
+            document_id=scope['filter'],
+            num_results=num_results,
+            query_embedding=query_embedding,
+            mode=retrieval_mode
+        )
+        result = self.generate_answer(
+            question=question,
+            context_chunks=relevant_chunks,
+            document_title=scope['title'],
+            multi_document=scope['multi_document']
+        )
 
-    def _chunk_by_words(self, text: str, chunk_size: int, overlap: int) -> List[str]:
-        """Chunk text by words (fallback method)."""
-        words = text.split()
+        # Only successful answers are worth repeating
+        if cache_variant is not None and result['context_used']:
+            self.answer_cache.store(scope['cache_key'], query_embedding, cache_variant, result, version=scope['version'])
 
-        if len(words) <= 10:  # Too few words to chunk meaningfully
-            return []
+        return dict(result, cached=False)
 
-        chunks = []
-        # Convert character-based chunk_size to approximate word count
-        # Rough estimate: 6 chars per word
-        words_per_chunk = max(50, chunk_size // 6)
-        overlap_words = max(5, overlap // 6)
+    async def aanswer_question(self, question: str, documents: Optional[List[Document]], num_results: int = 3, retrieval_mode: str = None) -> Dict[str, Any]:
+        """Async `answer_question` for ASGI views.
 
-        for i in range(0, len(words), words_per_chunk - overlap_words):
-            chunk_words = words[i:i + words_per_chunk]
-            if len(chunk_words) > 10:  # Only include chunks with sufficient content
-                chunks.append(' '.join(chunk_words))
+        Embedding and retrieval run on a bounded thread pool, the document
+        lookup uses the async ORM and the LLM call is awaited, so one worker
+        keeps many questions in flight while they wait on DeepSeek.
+        """
+        loop = asyncio.get_running_loop()
+        scope = await self._adocument_scope(documents)
 
-        return chunks
+        try:
+            query_embedding = await loop.run_in_executor(self._offload_executor, self.embed_query, question)
+        except Exception as e:
+            print(f"Error embedding question: {e}")
+            query_embedding = None
+
+        query_embedding, cache_variant, cached = self._lookup_answer_cache(query_embedding, scope, num_results, retrieval_mode)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        relevant_chunks = await loop.run_in_executor(
+            self._offload_executor,
+            partial(
+                self.similarity_search,
+                query=question,
+                document_id=scope['filter'],
+                num_results=num_results,
+                query_embedding=query_embedding,
+                mode=retrieval_mode
+            )
+        )
+        result = await self.agenerate_answer(
+            question=question,
+            context_chunks=relevant_chunks,
+            document_title=scope['title'],
+            multi_document=scope['multi_document']
+        )
 
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for text chunks."""
-        if not texts:
-            return []
-        return self.embedding_model.encode(texts).tolist()
+        if cache_variant is not None and result['context_used']:
+            self.answer_cache.store(scope['cache_key'], query_embedding, cache_variant, result, version=scope['version'])
 
-    def store_document_embeddings(self, document: Document, chunks: List[str]) -> None:
-        """Store document chunks and their embeddings in ChromaDB."""
-        if not chunks:
-            print(f"No chunks to store for document {document.id}")
-            return
+        return dict(result, cached=False)
 
-        embeddings = self.generate_embeddings(chunks)
+    async def aanswer_questions(self, questions: List[str], documents: Optional[List[Document]], num_results: int = 3, retrieval_mode: str = None, concurrency: int = None) -> List[Union[Dict[str, Any], Exception]]:
+        """Answer several questions about the same documents, in question order.
 
-        if not embeddings:
-            print(f"No embeddings generated for document {document.id}")
-            return
+        The questions are embedded with one encode call and retrieved with one
+        multi-query vector search; the LLM calls then run concurrently, at most
+        `concurrency` (default ASK_BATCH_CONCURRENCY) at a time, so the batch
+        takes about as long as its slowest question. A question that fails
+        gets the exception it raised in its place instead of failing the batch.
+        """
+        loop = asyncio.get_running_loop()
+        scope = await self._adocument_scope(documents)
 
-        # Clear existing chunks for this document
-        existing_chunks = DocumentChunk.objects.filter(document=document)
-        embedding_ids = [chunk.embedding_id for chunk in existing_chunks]
+        try:
+            embeddings = await loop.run_in_executor(self._offload_executor, self.generate_embeddings, list(questions))
+        except Exception as e:
+            print(f"Error embedding questions: {e}")
+            embeddings = [None] * len(questions)
+
+        lookups = [
+            self._lookup_answer_cache(embedding, scope, num_results, retrieval_mode)
+            for embedding in embeddings
+        ]
+        results = [dict(cached, cached=True) if cached is not None else None for _, _, cached in lookups]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        searchable = [i for i in pending if embeddings[i] is not None]
+        found = await loop.run_in_executor(
+            self._offload_executor,
+            partial(
+                self.similarity_search_many,
+                queries=[questions[i] for i in searchable],
+                document_id=scope['filter'],
+                num_results=num_results,
+                query_embeddings=[embeddings[i] for i in searchable],
+                mode=retrieval_mode
+            )
+        ) if searchable else []
+        relevant_chunks = dict(zip(searchable, found))
+
+        semaphore = asyncio.Semaphore(concurrency or settings.ASK_BATCH_CONCURRENCY)
+
+        async def answer(i: int) -> Dict[str, Any]:
+            async with semaphore:
+                result = await self.agenerate_answer(
+                    question=questions[i],
+                    context_chunks=relevant_chunks.get(i, []),
+                    document_title=scope['title'],
+                    multi_document=scope['multi_document']
+                )
+            query_embedding, cache_variant, _ = lookups[i]
+            if cache_variant is not None and result['context_used']:
+                self.answer_cache.store(scope['cache_key'], query_embedding, cache_variant, result, version=scope['version'])
+            return dict(result, cached=False)
+
+        answers = await asyncio.gather(*(answer(i) for i in pending), return_exceptions=True)
+        for i, result in zip(pending, answers):
+            if isinstance(result, Exception):
+                print(f"Error answering batch question {i}: {result}")
+            results[i] = result
+        return results
+
+    async def _adocument_scope(self, documents: Optional[List[Document]]) -> Dict[str, Any]:
+        if documents is None:
+            latest = (await Document.objects.aaggregate(latest=Max('updated_at')))['latest']
+            return self._all_documents_scope(latest)
+        return self._document_scope(documents)
+
+    def _document_scope(self, documents: Optional[List[Document]]) -> Dict[str, Any]:
+        """Describe the documents a question covers for retrieval, caching and the prompt."""
+        if documents is None:
+            return self._all_documents_scope(Document.objects.aggregate(latest=Max('updated_at'))['latest'])
+
+        if len(documents) == 1:
+            document = documents[0]
+            return {
+                'filter': document.id,
+                'cache_key': document.id,
+                'version': document.updated_at.isoformat(),
+                'title': document.title,
+                'multi_document': False
+            }
 
-        if embedding_ids:
-            try:
-                self.collection.delete(ids=embedding_ids)
-            except Exception as e:
-                print(f"Error deleting existing embeddings: {e}")
+        document_ids = sorted(document.id for document in documents)
+        titles = [f'"{document.title}"' for document in documents]
+        return {
+            'filter': document_ids,
+            'cache_key': tuple(document_ids),
+            'version': max(document.updated_at for document in documents).isoformat(),
+            'title': f"the documents {', '.join(titles)}" if len(titles) <= 5 else f"{len(titles)} selected documents",
+            'multi_document': True
+        }
+
+    @staticmethod
+    def _all_documents_scope(latest_update) -> Dict[str, Any]:
+        return {
+            'filter': None,
+            'cache_key': 'all',
+            'version': latest_update.isoformat() if latest_update else None,
+            'title': 'all uploaded documents',
+            'multi_document': True
+        }
+
+    def _check_answer_cache(self, question: str, scope: Dict[str, Any], num_results: int, retrieval_mode: str):
+        """Embed the question and look it up in the answer cache.
+
+        Returns (query_embedding, cache_variant, cached_result); cache_variant is
+        None when the cache cannot be used for this question.
+        """
+        try:
+            query_embedding = self.embed_query(question)
+        except Exception as e:
+            print(f"Error embedding question: {e}")
+            query_embedding = None
 
-        existing_chunks.delete()
+        return self._lookup_answer_cache(query_embedding, scope, num_results, retrieval_mode)
 
-        # Store new chunks
-        ids = []
-        metadatas = []
-        documents = []
+    def _lookup_answer_cache(self, query_embedding: Optional[List[float]], scope: Dict[str, Any], num_results: int, retrieval_mode: str):
+        if self.answer_cache is None or query_embedding is None:
+            return query_embedding, None, None
 
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            embedding_id = str(uuid.uuid4())
+        cache_variant = (num_results, retrieval_mode or settings.RETRIEVAL_MODE)
+        cached = self.answer_cache.lookup(scope['cache_key'], query_embedding, cache_variant, version=scope['version'])
+        return query_embedding, cache_variant, cached
 
-            # Store in ChromaDB
-            ids.append(embedding_id)
-            metadatas.append({
-                'document_id': document.id,
-                'chunk_index': i,
-                'document_title': document.title
-            })
-            documents.append(chunk)
-
-            # Store in MySQL
-            DocumentChunk.objects.create(
-                document=document,
-                chunk_index=i,
-                content=chunk,
-                embedding_id=embedding_id
-            )
+    def generate_answer(self, question: str, context_chunks: List[Dict[str, Any]], document_title: str, multi_document: bool = False) -> Dict[str, Any]:
+        """Generate answer using the improved context processing.
+
+        With `multi_document`, `document_title` describes the whole collection
+        and every excerpt is attributed to its own document.
+        """
+        prepared = self._prepare_prompt(question, context_chunks, document_title, multi_document)
+        if 'answer' in prepared:
+            return prepared
 
-        # Add to ChromaDB collection
         try:
-            self.collection.add(
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            print(
-                f"Successfully stored {len(chunks)} chunks for document {document.id}")
+            # Call DeepSeek API
+            with track_stage('llm'):
+                response = self.client.chat.completions.create(**self._chat_request(prepared['messages']))
+            return self._answer_from_response(response, prepared)
+
         except Exception as e:
-            print(f"Error storing embeddings in ChromaDB: {e}")
-            raise
+            return self._answer_error(e)
 
-    def similarity_search(self, query: str, document_id: int, num_results: int = 3) -> List[Dict[str, Any]]:
-        """Perform similarity search for relevant chunks."""
-        if not query or not document_id:
-            return []
+    async def agenerate_answer(self, question: str, context_chunks: List[Dict[str, Any]], document_title: str, multi_document: bool = False) -> Dict[str, Any]:
+        """Async `generate_answer`: awaits the DeepSeek call instead of blocking a thread."""
+        prepared = self._prepare_prompt(question, context_chunks, document_title, multi_document)
+        if 'answer' in prepared:
+            return prepared
 
         try:
-            query_embedding = self.generate_embeddings([query])
-            if not query_embedding:
-                return []
+            with track_stage('llm'):
+                client = self.async_client
+                response = await self._on_llm_loop(client.chat.completions.create(**self._chat_request(prepared['messages'])))
+            return self._answer_from_response(response, prepared)
 
-            # Get the first embedding (single query case)
-            query_embedding = query_embedding[0] if query_embedding else None
-            if query_embedding is None:
-                return []
+        except Exception as e:
+            return self._answer_error(e)
+
+    @staticmethod
+    def _chat_request(messages: List[Dict[str, str]], stream: bool = False) -> Dict[str, Any]:
+        request = {
+            'model': "deepseek-chat",
+            'messages': messages,
+            'temperature': 0.3,
+            'max_tokens': 1500,
+            'top_p': 0.9
+        }
+        if stream:
+            request['stream'] = True
+        return request
+
+    def _answer_from_response(self, response, prepared: Dict[str, Any]) -> Dict[str, Any]:
+        record_llm_usage(getattr(response, 'usage', None))
+
+        # Process the response
+        if not response.choices:
+            raise ValueError("No response generated from the model")
+
+        answer = self._post_process_answer(response.choices[0].message.content)
+
+        return {
+            'answer': answer,
+            'sources': prepared['sources'],
+            'context_used': prepared['context_used']
+        }
+
+    def _answer_error(self, error: Exception) -> Dict[str, Any]:
+        print(f"Error generating answer: {error}")
+
+        # Provide a helpful error message without exposing internal details
+        return {
+            'answer': self.ANSWER_ERROR_MESSAGE,
+            'sources': [],
+            'context_used': 0
+        }
+
+    def stream_answer(self, question: str, documents: Optional[List[Document]], num_results: int = 3, retrieval_mode: str = None) -> Iterator[Dict[str, Any]]:
+        """Answer a question as a sequence of events for incremental delivery.
+
+        Yields a 'sources' event once retrieval finishes, one 'token' event per
+        piece of generated text, and a final 'done' event carrying the complete
+        answer and `context_used`. LLM failures yield an 'error' event before 'done'.
+        """
+        scope = self._document_scope(documents)
+        query_embedding, cache_variant, cached = self._check_answer_cache(question, scope, num_results, retrieval_mode)
+        if cached is not None:
+            yield from self._cached_answer_events(cached)
+            return
 
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=num_results,
-                where={"document_id": document_id}
+        relevant_chunks = self.similarity_search(
+            query=question,
+            document_id=scope['filter'],
+            num_results=num_results,
+            query_embedding=query_embedding,
+            mode=retrieval_mode
+        )
+
+        prepared = self._prepare_prompt(question, relevant_chunks, scope['title'], scope['multi_document'])
+        if 'answer' in prepared:
+            yield from self._prepared_answer_events(prepared)
+            return
+
+        yield {'event': 'sources', 'data': {'sources': prepared['sources']}}
+
+        parts = []
+        finish_reason = None
+        try:
+            with track_stage('llm_stream'):
+                response = self.client.chat.completions.create(**self._chat_request(prepared['messages'], stream=True))
+
+                for chunk in response:
+                    text = self._stream_chunk_text(chunk)
+                    finish_reason = self._stream_finish_reason(chunk) or finish_reason
+                    if text:
+                        parts.append(text)
+                        yield {'event': 'token', 'data': {'text': text}}
+
+        except Exception as e:
+            print(f"Error streaming answer: {e}")
+            yield from self._stream_error_events()
+            return
+
+        yield self._stream_done_event(parts, finish_reason, prepared, scope, query_embedding, cache_variant)
+
+    async def astream_answer(self, question: str, documents: Optional[List[Document]], num_results: int = 3, retrieval_mode: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async `stream_answer` for ASGI views.
+
+        Embedding and retrieval run on the offload pool and DeepSeek's stream
+        is read with the async client, so each token is passed on as it
+        arrives without holding a thread for the whole answer.
+        """
+        loop = asyncio.get_running_loop()
+        scope = await self._adocument_scope(documents)
+        query_embedding, cache_variant, cached = await loop.run_in_executor(
+            self._offload_executor,
+            partial(self._check_answer_cache, question, scope, num_results, retrieval_mode)
+        )
+        if cached is not None:
+            for event in self._cached_answer_events(cached):
+                yield event
+            return
+
+        relevant_chunks = await loop.run_in_executor(
+            self._offload_executor,
+            partial(
+                self.similarity_search,
+                query=question,
+                document_id=scope['filter'],
+                num_results=num_results,
+                query_embedding=query_embedding,
+                mode=retrieval_mode
             )
+        )
 
-            # Validate and process results
-            if not results or not results.get('ids'):
-                return []
+        prepared = self._prepare_prompt(question, relevant_chunks, scope['title'], scope['multi_document'])
+        if 'answer' in prepared:
+            for event in self._prepared_answer_events(prepared):
+                yield event
+            return
 
-            relevant_chunks = []
-            for i in range(len(results['ids'][0])):
-                try:
-                    chunk_id = results['ids'][0][i]
-                    if not chunk_id:
-                        continue
-
-                    chunk_data = {
-                        'content': results['documents'][0][i],
-                        'distance': results['distances'][0][i],
-                        'metadata': results['metadatas'][0][i] if results['metadatas'] else {
-                            'document_id': document_id,
-                            'chunk_index': i
-                        }
-                    }
-                    relevant_chunks.append(chunk_data)
-                except (IndexError, KeyError):
-                    continue
+        yield {'event': 'sources', 'data': {'sources': prepared['sources']}}
 
-            return relevant_chunks
+        parts = []
+        finish_reason = None
+        try:
+            with track_stage('llm_stream'):
+                client = self.async_client
+                response = await self._on_llm_loop(
+                    client.chat.completions.create(**self._chat_request(prepared['messages'], stream=True))
+                )
+                try:
+                    while True:
+                        chunk = await self._on_llm_loop(self._next_stream_chunk(response))
+                        if chunk is None:
+                            break
+                        text = self._stream_chunk_text(chunk)
+                        finish_reason = self._stream_finish_reason(chunk) or finish_reason
+                        if text:
+                            parts.append(text)
+                            yield {'event': 'token', 'data': {'text': text}}
+                finally:
+                    # Also reached when the client disconnects mid-answer
+                    await self._on_llm_loop(response.response.aclose())
 
         except Exception as e:
-            print(f"Error in similarity search: {str(e)}")
-            return []
+            print(f"Error streaming answer: {e}")
+            for event in self._stream_error_events():
+                yield event
+            return
+
+        yield self._stream_done_event(parts, finish_reason, prepared, scope, query_embedding, cache_variant)
 
-    def generate_answer(self, question: str, context_chunks: List[Dict[str, Any]], document_title: str) -> Dict[str, Any]:
-        """Generate answer using the improved context processing."""
+    @staticmethod
+    async def _next_stream_chunk(response):
+        """The next chunk of an async completion stream, or None at its end."""
+        try:
+            return await response.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    @staticmethod
+    def _stream_chunk_text(chunk) -> Optional[str]:
+        # Usage arrives on the final chunk when the API reports it for streams
+        record_llm_usage(getattr(chunk, 'usage', None))
+        if not chunk.choices:
+            return None
+        return chunk.choices[0].delta.content
+
+    @staticmethod
+    def _stream_finish_reason(chunk) -> Optional[str]:
+        # Set on the last content chunk: 'stop' when the model finished, 'length' when cut off
+        if not chunk.choices:
+            return None
+        return chunk.choices[0].finish_reason
+
+    @staticmethod
+    def _cached_answer_events(cached: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {'event': 'sources', 'data': {'sources': cached['sources']}},
+            {'event': 'token', 'data': {'text': cached['answer']}},
+            {'event': 'done', 'data': {
+                'answer': cached['answer'],
+                'context_used': cached['context_used'],
+                'cached': True
+            }}
+        ]
+
+    @staticmethod
+    def _prepared_answer_events(prepared: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {'event': 'sources', 'data': {'sources': []}},
+            {'event': 'token', 'data': {'text': prepared['answer']}},
+            {'event': 'done', 'data': {'answer': prepared['answer'], 'context_used': 0, 'cached': False}}
+        ]
+
+    def _stream_error_events(self) -> List[Dict[str, Any]]:
+        return [
+            {'event': 'error', 'data': {'error': self.ANSWER_ERROR_MESSAGE}},
+            {'event': 'done', 'data': {'answer': self.ANSWER_ERROR_MESSAGE, 'context_used': 0, 'cached': False}}
+        ]
+
+    def _stream_done_event(self, parts: List[str], finish_reason: Optional[str], prepared: Dict[str, Any],
+                           scope: Dict[str, Any], query_embedding: Optional[List[float]], cache_variant) -> Dict[str, Any]:
+        """Finish a streamed answer: cache it and describe it in the 'done' event.
+
+        As in `answer_question`, only an answer the model wrote from retrieved
+        context is cached, and only if its stream ran to a normal stop.
+        """
+        answer = self._post_process_answer(''.join(parts))
+        result = {
+            'answer': answer,
+            'sources': prepared['sources'],
+            'context_used': prepared['context_used']
+        }
+
+        if cache_variant is not None and result['context_used'] and answer and finish_reason == 'stop':
+            self.answer_cache.store(scope['cache_key'], query_embedding, cache_variant, result, version=scope['version'])
+
+        return {'event': 'done', 'data': {'answer': answer, 'context_used': prepared['context_used'], 'cached': False}}
+
+    def _prepare_prompt(self, question: str, context_chunks: List[Dict[str, Any]], document_title: str, multi_document: bool = False) -> Dict[str, Any]:
+        """Validate the retrieved chunks and build the chat messages.
+
+        Returns a fallback answer dict (with an 'answer' key) when there is
+        nothing usable to send to the model.
+        """
         # Validate input parameters
         if not question or not isinstance(question, str):
             return {
@@ -311,29 +1449,40 @@ class RAGEngine:
                 'context_used': 0
             }
 
-        # Prepare context for the prompt
-        context_parts = []
-        sources = []
+        # Merge neighbouring chunks, drop repeated text and keep within the token budget
+        with track_stage('context_pack'):
+            passages, used_chunks = pack_context(valid_chunks, settings.CONTEXT_TOKEN_BUDGET)
 
-        for i, chunk in enumerate(valid_chunks):
-            try:
-                chunk_content = chunk['content']
-                chunk_index = chunk['metadata'].get('chunk_index', i)
-                page_num = chunk['metadata'].get('page_number', 1)
+        context_parts = []
+        for passage in passages:
+            source_title = passage.document_title or document_title
+            if len(passage.chunk_indexes) > 1:
+                location = f"Chunks {passage.chunk_indexes[0] + 1}-{passage.chunk_indexes[-1] + 1}"
+            else:
+                location = f"Chunk {passage.chunk_indexes[0] + 1}" if passage.chunk_indexes else "Excerpt"
+            if passage.page_end > passage.page_start:
+                location += f", Pages {passage.page_start}-{passage.page_end}"
+            else:
+                location += f", Page {passage.page_start}"
 
-                context_parts.append(
-                    f"=== Excerpt from Document (Chunk {chunk_index + 1}, Page {page_num}) ===\n"
-                    f"{chunk_content}\n"
-                )
+            if multi_document:
+                header = f'=== Excerpt from "{source_title}" ({location}) ==='
+            else:
+                header = f"=== Excerpt from Document ({location}) ==="
+            context_parts.append(f"{header}\n{passage.text}\n")
 
-                sources.append({
-                    'chunk_index': chunk_index,
-                    'page_number': page_num,
-                    'content_preview': chunk_content[:200] + '...' if len(chunk_content) > 200 else chunk_content,
-                    'length': len(chunk_content)
-                })
-            except Exception:
-                continue
+        # Sources still cite the individual chunks, in relevance order
+        sources = []
+        for i, chunk in enumerate(used_chunks):
+            chunk_content = chunk['content']
+            sources.append({
+                'document_id': chunk['metadata'].get('document_id'),
+                'document_title': chunk['metadata'].get('document_title', document_title),
+                'chunk_index': chunk['metadata'].get('chunk_index', i),
+                'page_number': chunk['metadata'].get('page_number', 1),
+                'content_preview': chunk_content[:200] + '...' if len(chunk_content) > 200 else chunk_content,
+                'length': len(chunk_content)
+            })
 
         if not context_parts:
             return {
@@ -345,7 +1494,14 @@ class RAGEngine:
         context = "\n".join(context_parts)
 
         # Construct the prompt
-        prompt = f"""You are an expert AI assistant analyzing the document titled "{document_title}".
+        if multi_document:
+            subject = f"excerpts from {document_title}"
+            attribution = "\n5. Name the document each piece of information comes from"
+        else:
+            subject = f'the document titled "{document_title}"'
+            attribution = ""
+
+        prompt = f"""You are an expert AI assistant analyzing {subject}.
 Your task is to answer the user's question based ONLY on the provided context from the document.
 
 DOCUMENT CONTEXT:
@@ -358,52 +1514,49 @@ INSTRUCTIONS:
 1. Answer concisely but thoroughly based ONLY on the provided context
 2. If the question cannot be answered from the context, say so explicitly
 3. If multiple chunks contain relevant information, synthesize them into a coherent answer
-4. Maintain an academic tone and be precise with your information
+4. Maintain an academic tone and be precise with your information{attribution}
 
 ANSWER:"""
 
-        try:
-            # Call DeepSeek API
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful AI assistant that provides accurate answers based on document content."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=1500,
-                top_p=0.9
-            )
-
-            # Process the response
-            if not response.choices:
-                raise ValueError("No response generated from the model")
-
-            answer = response.choices[0].message.content.strip()
-
-            # Post-process the answer to ensure quality
-            if not answer or answer.lower().startswith(("i don't know", "i couldn't find", "the context doesn't")):
-                answer = "I couldn't find a definitive answer to your question in the document."
-
-            return {
-                'answer': answer,
-                'sources': sources,
-                'context_used': len(valid_chunks)
-            }
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"Error generating answer: {error_msg}")
-
-            # Provide a helpful error message without exposing internal details
-            return {
-                'answer': "I encountered an issue generating the answer. Please try again with a different question or check the document content.",
-                'sources': [],
-                'context_used': 0
-            }
+        return {
+            'messages': [
+                {
+                    "role": "system",
+                    "content": "You are a helpful AI assistant that provides accurate answers based on document content."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            'sources': sources,
+            'context_used': len(used_chunks)
+        }
+
+    def _post_process_answer(self, answer: str) -> str:
+        """Ensure the model's answer is usable."""
+        answer = (answer or '').strip()
+        if not answer or answer.lower().startswith(("i don't know", "i couldn't find", "the context doesn't")):
+            answer = "I couldn't find a definitive answer to your question in the document."
+        return answer
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_rag_engine() -> RAGEngine:
+    """Return the process-wide RAGEngine, creating it on first call."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RAGEngine()
+    return _engine
+
+
+def compute_content_hash(data: Union[str, bytes]) -> str:
+    """SHA-256 hex digest used to recognise repeated uploads and chunk texts."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,52 @@
+"""Maximal marginal relevance re-ranking of retrieved chunks.
+
+Nearest-neighbour search often returns several near-identical passages.
+MMR picks chunks one at a time, trading relevance to the question against
+similarity to the chunks already picked, so a small top-k covers more ground.
+"""
+from typing import List, Optional
+import numpy as np
+
+
+def mmr(query_embedding, embeddings, k: int, lambda_mult: float = 0.5, relevance: Optional[np.ndarray] = None) -> List[int]:
+    """Return the indexes of `k` candidates in MMR order.
+
+    Each step picks the candidate maximizing
+    `lambda_mult * relevance - (1 - lambda_mult) * max_similarity_to_picked`,
+    so 1.0 ranks by relevance alone and 0.0 by diversity alone. `relevance`
+    defaults to the cosine similarity between each candidate and the query.
+    Rows of `embeddings` that are all zeros (no embedding available) count as
+    similar to nothing. Cost is one (n x d) product per pick.
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    count = len(vectors)
+    k = min(k, count)
+    if k <= 0:
+        return []
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+
+    if relevance is None:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        relevance = vectors @ (query / (np.linalg.norm(query) or 1.0))
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    picked = []
+    max_similarity = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+
+    for step in range(k):
+        if step == 0:
+            scores = relevance.copy()
+        else:
+            scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+
+    return picked
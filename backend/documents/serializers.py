@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Document, DocumentChunk
 
@@ -6,6 +7,14 @@ class DocumentSerializer(serializers.ModelSerializer):
         model = Document
         fields = ['id', 'title', 'file_type', 'file_size', 'pages', 'processing_status', 'created_at']
 
+class DocumentListSerializer(DocumentSerializer):
+    """Documents annotated with `chunk_count` by the listing query."""
+
+    chunk_count = serializers.IntegerField(read_only=True)
+
+    class Meta(DocumentSerializer.Meta):
+        fields = DocumentSerializer.Meta.fields + ['updated_at', 'chunk_count']
+
 class DocumentChunkSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentChunk
@@ -15,7 +24,46 @@ class DocumentUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
     title = serializers.CharField(max_length=255, required=False)
 
+class DocumentIdsField(serializers.Field):
+    """A list of document ids, or the string "all" for every processed document."""
+
+    default_error_messages = {
+        'invalid': 'Expected a non-empty list of document ids or "all".',
+    }
+
+    def to_internal_value(self, data):
+        if data == 'all':
+            return 'all'
+        if not isinstance(data, list) or not data:
+            self.fail('invalid')
+        try:
+            return list(dict.fromkeys(int(document_id) for document_id in data))
+        except (TypeError, ValueError):
+            self.fail('invalid')
+
+    def to_representation(self, value):
+        return value
+
 class QuestionSerializer(serializers.Serializer):
-    document_id = serializers.IntegerField()
+    document_id = serializers.IntegerField(required=False)
+    document_ids = DocumentIdsField(required=False)
     question = serializers.CharField()
-    num_chunks = serializers.IntegerField(default=3, min_value=1, max_value=10)
\ No newline at end of file
+    num_chunks = serializers.IntegerField(default=3, min_value=1, max_value=10)
+    retrieval_mode = serializers.ChoiceField(choices=['vector', 'hybrid'], required=False)
+
+    def validate(self, attrs):
+        if 'document_id' not in attrs and 'document_ids' not in attrs:
+            raise serializers.ValidationError('Provide document_id or document_ids.')
+        if 'document_id' in attrs and 'document_ids' in attrs:
+            raise serializers.ValidationError('Provide only one of document_id and document_ids.')
+        return attrs
+
+class BatchQuestionSerializer(QuestionSerializer):
+    """Several questions about the same document, documents or "all"."""
+
+    question = None
+    questions = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=settings.ASK_BATCH_MAX_QUESTIONS
+    )
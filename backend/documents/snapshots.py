@@ -0,0 +1,232 @@
+"""Embedding snapshots: rebuild a vector store without running the model.
+
+A snapshot directory holds `doc_<id>.npy` per document, the chunk
+embeddings as float16 or float32 rows in chunk order (loadable with
+`mmap_mode='r'`), next to `doc_<id>.json` with the matching columns:
+embedding ids, chunk indexes, page spans, offsets and content hashes.
+`manifest.json` records the embedding model and each document's
+`updated_at`, so a later export only rewrites documents changed since.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from .chunking import Chunk
+from .embedding_backends import embedding_model_key
+from .models import Document, DocumentChunk, EmbeddingCache
+from .rag_engine import RAGEngine
+
+MANIFEST_FILE = 'manifest.json'
+FORMAT_VERSION = 1
+DTYPES = ('float16', 'float32')
+
+_COLUMNS = ('ids', 'chunk_index', 'page_number', 'page_end', 'start_offset', 'end_offset', 'content_hash')
+
+
+def load_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def export_snapshot(directory: str, vector_store, dtype: str = 'float16', full: bool = False) -> Dict[str, int]:
+    """Export the embeddings of completed documents changed since the last snapshot.
+
+    Vectors are read back from `vector_store`; chunks it is missing come
+    from the embedding cache. A document whose vectors cannot all be found is
+    skipped, keeping what the previous snapshot holds for it as long as that
+    came from the same model. Everything is rewritten with `full`, or when
+    the embedding model or dtype differs from the existing snapshot. Returns
+    counts of exported, unchanged, removed and skipped documents.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported snapshot dtype {dtype!r}; expected one of {', '.join(DTYPES)}")
+    os.makedirs(directory, exist_ok=True)
+
+    model = embedding_model_key()
+    previous = load_manifest(directory)
+    same_model = previous is not None and previous['model'] == model
+    reuse = not full and same_model and previous['dtype'] == dtype
+    old_entries = previous['documents'] if previous is not None else {}
+    reusable = old_entries if reuse else {}
+    # Kept for documents that can't be exported now; other models' vectors are of no use
+    fallback = old_entries if same_model else {}
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'model': model,
+        'dtype': dtype,
+        'dimension': previous.get('dimension') if same_model else None,
+        'documents': {}
+    }
+    stats = {'exported': 0, 'unchanged': 0, 'removed': 0, 'skipped': 0}
+
+    documents = Document.objects.filter(processing_status='completed').only('id', 'title', 'updated_at').order_by('id')
+    for document in documents.iterator():
+        key = str(document.id)
+        updated_at = document.updated_at.isoformat()
+        entry = reusable.get(key)
+        if entry is not None and entry['updated_at'] == updated_at:
+            manifest['documents'][key] = entry
+            stats['unchanged'] += 1
+            continue
+
+        matrix, columns = _document_embeddings(document, vector_store)
+        if matrix is None:
+            if key in fallback:
+                print(f"Skipping export of document {key}: its vectors are missing; keeping the previous snapshot of it")
+                manifest['documents'][key] = fallback[key]
+            else:
+                print(f"Skipping export of document {key}: its vectors are missing")
+            stats['skipped'] += 1
+            continue
+
+        matrix = matrix.astype(dtype)
+        _write_document(directory, key, matrix, columns)
+        manifest['dimension'] = int(matrix.shape[1])
+        manifest['documents'][key] = {
+            'title': document.title,
+            'updated_at': updated_at,
+            'chunks': len(matrix)
+        }
+        stats['exported'] += 1
+
+    for key in set(old_entries) - set(manifest['documents']):
+        for path in _files(directory, key):
+            if os.path.exists(path):
+                os.remove(path)
+        stats['removed'] += 1
+
+    manifest['created_at'] = timezone.now().isoformat()
+    # The manifest is written last: an interrupted export leaves the previous one valid
+    _write_json(os.path.join(directory, MANIFEST_FILE), manifest)
+    return stats
+
+
+def import_snapshot(directory: str, vector_store, document_ids: List[int] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """Load snapshot embeddings into `vector_store`, replacing the documents' records.
+
+    Rows are matched to `DocumentChunk` by embedding id, which also supplies
+    the text when VECTOR_STORE_STORE_TEXT is on. Documents deleted or
+    re-chunked since the export are skipped. Raises ValueError, before
+    anything is written, if a file the manifest lists is missing. Returns
+    counts of imported documents and chunks and of skipped documents.
+    """
+    manifest = load_manifest(directory)
+    if manifest is None:
+        raise ValueError(f"No {MANIFEST_FILE} in {directory}")
+    if manifest['model'] != embedding_model_key():
+        raise ValueError(
+            f"Snapshot embeddings come from {manifest['model']}, but the configured model is {embedding_model_key()}"
+        )
+
+    entries = manifest['documents']
+    if document_ids is not None:
+        entries = {key: entry for key, entry in entries.items() if int(key) in document_ids}
+
+    # Checked up front, so a damaged snapshot is refused before any record is replaced
+    missing = [path for key in entries for path in _files(directory, key) if not os.path.exists(path)]
+    if missing:
+        raise ValueError(f"Snapshot file {missing[0]} is missing" + (f" (and {len(missing) - 1} more)" if len(missing) > 1 else ''))
+
+    documents = Document.objects.in_bulk([int(key) for key in entries])
+    stats = {'documents': 0, 'chunks': 0, 'skipped': 0}
+
+    for key in entries:
+        document = documents.get(int(key))
+        if document is None:
+            print(f"Skipping snapshot of document {key}: it no longer exists")
+            stats['skipped'] += 1
+            continue
+
+        matrix_file, columns_file = _files(directory, key)
+        with open(columns_file, 'r', encoding='utf-8') as f:
+            columns = json.load(f)
+        texts = dict(DocumentChunk.objects.filter(document=document).values_list('embedding_id', 'content'))
+        if set(columns['ids']) != set(texts):
+            print(f"Skipping snapshot of document {key}: its chunks changed after the export")
+            stats['skipped'] += 1
+            continue
+
+        matrix = np.load(matrix_file, mmap_mode='r')
+        metadatas = [
+            RAGEngine.vector_metadata(document, index, Chunk(texts[embedding_id], start, end, page, page_end))
+            for embedding_id, index, page, page_end, start, end in zip(
+                columns['ids'], columns['chunk_index'], columns['page_number'],
+                columns['page_end'], columns['start_offset'], columns['end_offset']
+            )
+        ]
+
+        vector_store.delete(where={'document_id': document.id})
+        for start in range(0, len(columns['ids']), batch_size):
+            ids = columns['ids'][start:start + batch_size]
+            vector_store.add(
+                ids=ids,
+                embeddings=np.asarray(matrix[start:start + batch_size], dtype=np.float32).tolist(),
+                metadatas=metadatas[start:start + batch_size],
+                documents=[texts[embedding_id] for embedding_id in ids] if settings.VECTOR_STORE_STORE_TEXT else None
+            )
+        stats['documents'] += 1
+        stats['chunks'] += len(columns['ids'])
+
+    return stats
+
+
+def _document_embeddings(document: Document, vector_store):
+    """(matrix, columns) for a document's chunks in order, or (None, None) if vectors are missing."""
+    rows = list(
+        DocumentChunk.objects
+        .filter(document=document)
+        .order_by('chunk_index')
+        .values_list('embedding_id', 'chunk_index', 'page_number', 'page_end', 'start_offset', 'end_offset', 'content_hash')
+    )
+    if not rows:
+        return None, None
+
+    stored = vector_store.get(where={'document_id': document.id}, include_embeddings=True)
+    embeddings = stored.get('embeddings')
+    vectors = dict(zip(stored['ids'], embeddings if embeddings is not None else []))
+
+    missing = {}
+    for row in rows:
+        if row[0] not in vectors:
+            missing.setdefault(row[6], []).append(row[0])
+    if missing:
+        for content_hash, embedding in EmbeddingCache.objects.filter(
+            content_hash__in=list(missing),
+            model_name=embedding_model_key()
+        ).values_list('content_hash', 'embedding'):
+            for embedding_id in missing[content_hash]:
+                vectors[embedding_id] = np.frombuffer(bytes(embedding), dtype=np.float32)
+
+    absent = sum(1 for row in rows if row[0] not in vectors)
+    if absent:
+        print(f"Skipping document {document.id}: {absent} of {len(rows)} chunk embeddings not found")
+        return None, None
+
+    matrix = np.asarray([vectors[row[0]] for row in rows], dtype=np.float32)
+    columns = {name: [row[i] for row in rows] for i, name in enumerate(_COLUMNS)}
+    return matrix, columns
+
+
+def _write_document(directory: str, key: str, matrix: np.ndarray, columns: Dict[str, list]) -> None:
+    matrix_file, columns_file = _files(directory, key)
+    with open(matrix_file + '.tmp', 'wb') as f:
+        np.save(f, np.ascontiguousarray(matrix))
+    os.replace(matrix_file + '.tmp', matrix_file)
+    _write_json(columns_file, columns)
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+def _files(directory: str, key: str):
+    base = os.path.join(directory, f"doc_{key}")
+    return base + '.npy', base + '.json'
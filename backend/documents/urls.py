@@ -4,6 +4,14 @@ from . import views
 urlpatterns = [
     path('documents/', views.get_documents, name='get_documents'),
     path('documents/upload/', views.upload_document, name='upload_document'),
+    path('documents/upload/batch/', views.upload_documents_batch, name='upload_documents_batch'),
+    path('documents/batches/<int:batch_id>/', views.batch_detail, name='batch_detail'),
     path('documents/<int:document_id>/', views.document_detail, name='document_detail'),
+    path('documents/<int:document_id>/replace/', views.replace_document, name='replace_document'),
+    path('documents/<int:document_id>/reprocess/', views.reprocess_document, name='reprocess_document'),
     path('ask/', views.ask_question, name='ask_question'),
+    path('ask/batch/', views.ask_questions_batch, name='ask_questions_batch'),
+    path('ask/stream/', views.ask_question_stream, name='ask_question_stream'),
+    path('stats/', views.engine_stats, name='engine_stats'),
+    path('health/ready/', views.readiness, name='readiness'),
 ]
\ No newline at end of file
@@ -0,0 +1,517 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from django.conf import settings
+
+
+class VectorStore:
+    """Storage and nearest-neighbour search for chunk embeddings.
+
+    `where` filters follow Chroma's metadata syntax: `{"key": value}`,
+    `{"key": {"$in": [...]}}` and `{"$and": [...]}`. Query results use Chroma's
+    shape as well, one inner list per query embedding, with cosine distances,
+    plus the stored (normalized) vectors under 'embeddings' when
+    `include_embeddings` is set. Chunk texts are optional: records added
+    without `documents`, or stripped by `strip_documents`, come back as None.
+    """
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]], documents: List[str] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str] = None, where: Dict[str, Any] = None) -> None:
+        raise NotImplementedError
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Replace the metadata of existing records, leaving their vectors and text."""
+        raise NotImplementedError
+
+    def query(self, query_embeddings: List[List[float]], n_results: int, where: Dict[str, Any] = None,
+              include_embeddings: bool = False, include_documents: bool = True) -> Dict[str, List[List[Any]]]:
+        raise NotImplementedError
+
+    def count(self, where: Dict[str, Any] = None) -> int:
+        raise NotImplementedError
+
+    def get(self, where: Dict[str, Any] = None, include_embeddings: bool = False) -> Dict[str, List[Any]]:
+        """Matching records as flat 'ids' and 'metadatas' lists, plus 'embeddings' if asked."""
+        raise NotImplementedError
+
+    def strip_documents(self, where: Dict[str, Any] = None, batch_size: int = 1000) -> int:
+        """Drop the stored text of matching records, keeping ids, vectors and metadata.
+
+        Returns the number of records that held text.
+        """
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """Vector store backed by a remote ChromaDB collection."""
+
+    def __init__(self, host: str, port: int, collection_name: str):
+        import chromadb
+
+        self.client = chromadb.HttpClient(host=host, port=port)
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(self, ids, embeddings, metadatas, documents=None):
+        self.collection.add(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=documents
+        )
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def update(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def query(self, query_embeddings, n_results, where=None, include_embeddings=False, include_documents=True):
+        include = ['metadatas', 'distances']
+        if include_documents:
+            include.append('documents')
+        if include_embeddings:
+            include.append('embeddings')
+        return self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=include
+        )
+
+    def count(self, where=None):
+        if where is None:
+            return self.collection.count()
+        return len(self.collection.get(where=where, include=[])['ids'])
+
+    def get(self, where=None, include_embeddings=False):
+        include = ['metadatas', 'embeddings'] if include_embeddings else ['metadatas']
+        return self.collection.get(where=where, include=include)
+
+    def strip_documents(self, where=None, batch_size=1000):
+        stripped = 0
+        offset = 0
+        while True:
+            batch = self.collection.get(
+                where=where,
+                limit=batch_size,
+                offset=offset,
+                include=['documents', 'embeddings']
+            )
+            if not len(batch['ids']):
+                return stripped
+            offset += len(batch['ids'])
+
+            rows = [row for row, text in enumerate(batch['documents']) if text]
+            if rows:
+                # Passing the stored vectors stops Chroma re-embedding the blank text
+                self.collection.update(
+                    ids=[batch['ids'][row] for row in rows],
+                    embeddings=[batch['embeddings'][row] for row in rows],
+                    documents=[''] * len(rows)
+                )
+                stripped += len(rows)
+
+
+class NumpyVectorStore(VectorStore):
+    """In-process vector store keeping each document's vectors in memory-mapped .npy segments.
+
+    Every document gets a `doc_<id>/` directory of numbered segments: `<n>.npy`
+    holding L2-normalized float32 embeddings and `<n>.json` holding the
+    matching ids, metadatas and texts. Adding writes a new segment, so
+    indexing a document batch by batch costs I/O in proportion to each
+    batch; deleting, updating or stripping records compacts the document
+    into one base segment that supersedes the lower-numbered ones. Queries
+    read all of a document's segments and score candidates with a single
+    matrix product, which is exact and takes microseconds for a few
+    thousand chunks per document.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+        self._cache = {}
+        self._segment_cache = {}
+        self._id_index = None
+        self._lock = threading.RLock()
+
+    def add(self, ids, embeddings, metadatas, documents=None):
+        if not ids:
+            return
+
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        documents = documents if documents is not None else [None] * len(ids)
+
+        groups = {}
+        for row, metadata in enumerate(metadatas):
+            groups.setdefault(self._document_key(metadata), []).append(row)
+
+        with self._write_lock():
+            for key, rows in groups.items():
+                self._append(key, vectors[rows], {
+                    'ids': [ids[row] for row in rows],
+                    'metadatas': [metadatas[row] for row in rows],
+                    'documents': [documents[row] for row in rows]
+                })
+
+                if self._id_index is not None:
+                    for row in rows:
+                        self._id_index[ids[row]] = key
+
+    def delete(self, ids=None, where=None):
+        with self._write_lock():
+            if ids is not None:
+                wanted = set(ids)
+                keys = self._keys_for_ids(wanted)
+            else:
+                wanted = None
+                keys = self._keys_for_where(where)
+
+            for key in keys:
+                matrix, records = self._load(key)
+                keep = [
+                    row for row, (record_id, metadata) in enumerate(zip(records['ids'], records['metadatas']))
+                    if not ((wanted is None or record_id in wanted) and self._matches(metadata, where))
+                ]
+                if len(keep) == len(records['ids']):
+                    continue
+
+                if self._id_index is not None:
+                    kept = set(keep)
+                    for row, record_id in enumerate(records['ids']):
+                        if row not in kept:
+                            self._id_index.pop(record_id, None)
+
+                if keep:
+                    self._save(key, np.asarray(matrix)[keep], {
+                        field: [values[row] for row in keep] for field, values in records.items()
+                    })
+                else:
+                    self._remove(key)
+
+    def update(self, ids, metadatas):
+        if not ids:
+            return
+
+        new_metadata = dict(zip(ids, metadatas))
+        with self._write_lock():
+            for key in self._keys_for_ids(set(ids)):
+                matrix, records = self._load(key)
+                # A record stays in its document's files; the document id is not expected to change
+                self._save(key, np.asarray(matrix), dict(records, metadatas=[
+                    new_metadata.get(record_id, metadata)
+                    for record_id, metadata in zip(records['ids'], records['metadatas'])
+                ]))
+
+    def query(self, query_embeddings, n_results, where=None, include_embeddings=False, include_documents=True):
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1))
+
+        scores = []
+        candidates = []
+        for key in self._keys_for_where(where):
+            matrix, records = self._load(key)
+            rows = [
+                row for row, metadata in enumerate(records['metadatas'])
+                if self._matches(metadata, where)
+            ]
+            if not rows:
+                continue
+
+            selected = matrix if len(rows) == len(records['ids']) else matrix[rows]
+            scores.append(selected @ queries.T)
+            candidates.extend((records, row, matrix) for row in rows)
+
+        results = {'ids': [], 'metadatas': [], 'distances': []}
+        if include_documents:
+            results['documents'] = []
+        if include_embeddings:
+            results['embeddings'] = []
+        all_scores = np.concatenate(scores) if scores else np.empty((0, len(queries)), dtype=np.float32)
+        k = min(n_results, len(candidates))
+
+        for q in range(len(queries)):
+            column = all_scores[:, q]
+            if k:
+                top = np.argpartition(-column, k - 1)[:k]
+                top = top[np.argsort(-column[top])]
+            else:
+                top = []
+
+            results['ids'].append([candidates[i][0]['ids'][candidates[i][1]] for i in top])
+            if include_documents:
+                results['documents'].append([candidates[i][0]['documents'][candidates[i][1]] for i in top])
+            results['metadatas'].append([candidates[i][0]['metadatas'][candidates[i][1]] for i in top])
+            results['distances'].append([float(1.0 - column[i]) for i in top])
+            if include_embeddings:
+                results['embeddings'].append([np.asarray(candidates[i][2][candidates[i][1]]) for i in top])
+
+        return results
+
+    def count(self, where=None):
+        total = 0
+        for key in self._keys_for_where(where):
+            _, records = self._load(key)
+            if where is None:
+                total += len(records['ids'])
+            else:
+                total += sum(1 for metadata in records['metadatas'] if self._matches(metadata, where))
+        return total
+
+    def get(self, where=None, include_embeddings=False):
+        results = {'ids': [], 'metadatas': []}
+        if include_embeddings:
+            results['embeddings'] = []
+        for key in self._keys_for_where(where):
+            matrix, records = self._load(key)
+            rows = [row for row, metadata in enumerate(records['metadatas']) if self._matches(metadata, where)]
+            results['ids'].extend(records['ids'][row] for row in rows)
+            results['metadatas'].extend(records['metadatas'][row] for row in rows)
+            if include_embeddings and rows:
+                results['embeddings'].extend(np.asarray(matrix[rows]))
+        return results
+
+    def strip_documents(self, where=None, batch_size=1000):
+        stripped = 0
+        with self._write_lock():
+            for key in self._keys_for_where(where):
+                matrix, records = self._load(key)
+                rows = [
+                    row for row, (text, metadata) in enumerate(zip(records['documents'], records['metadatas']))
+                    if text is not None and self._matches(metadata, where)
+                ]
+                if not rows:
+                    continue
+
+                documents = list(records['documents'])
+                for row in rows:
+                    documents[row] = None
+                self._save(key, np.asarray(matrix), dict(records, documents=documents))
+                stripped += len(rows)
+        return stripped
+
+    # Storage helpers
+
+    def _directory(self, key: str) -> str:
+        return os.path.join(self.path, f"doc_{key}")
+
+    def _all_keys(self) -> List[str]:
+        keys = set()
+        for name in os.listdir(self.path):
+            if not name.startswith('doc_'):
+                continue
+            if name.endswith('.json'):
+                # A document file from before segments
+                keys.add(name[len('doc_'):-len('.json')])
+            elif os.path.isdir(os.path.join(self.path, name)):
+                keys.add(name[len('doc_'):])
+        return sorted(keys)
+
+    def _segments(self, key: str) -> List[Tuple[int, str, str, bool, tuple]]:
+        """(number, .npy path, .json path, is legacy, file identity) of a document's live segments, in order.
+
+        A single-file document written before segments counts as base segment 0.
+        """
+        segments = []
+        legacy = os.path.join(self.path, f"doc_{key}")
+        if os.path.exists(legacy + '.json'):
+            segments.append((0, legacy + '.npy', legacy + '.json', True))
+
+        directory = self._directory(key)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            number, extension = os.path.splitext(name)
+            if extension == '.json' and number.isdigit():
+                base = os.path.join(directory, number)
+                segments.append((int(number), base + '.npy', base + '.json', False))
+        segments.sort()
+        # Numbers restart when a document is removed and added again, so the
+        # inode and mtime tell a segment apart from an earlier one of that name
+        segments = [
+            segment + ((os.stat(segment[2]).st_ino, os.stat(segment[2]).st_mtime_ns),)
+            for segment in segments
+        ]
+
+        # Only the newest base segment and the ones after it are live
+        for i in range(len(segments) - 1, -1, -1):
+            if self._segment(key, segments[i])[2]:
+                return segments[i:]
+        return segments
+
+    def _segment(self, key: str, segment):
+        """(matrix, records, is base) for one segment file pair; segments never change once written."""
+        _, matrix_file, records_file, legacy, identity = segment
+        loaded = self._segment_cache.setdefault(key, {})
+        cached = loaded.get(records_file)
+        if cached is None or cached[0] != identity:
+            with open(records_file, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            base = records.pop('base', False) or legacy
+            cached = (identity, np.load(matrix_file, mmap_mode='r'), records, base)
+            loaded[records_file] = cached
+        return cached[1:]
+
+    def _load(self, key: str, attempt: int = 0):
+        """Return (matrix, records) for a document, reloading when its segments change."""
+        with self._lock:
+            try:
+                segments = self._segments(key)
+                stamp = tuple(segment[4] for segment in segments)
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == stamp:
+                    return cached[1], cached[2]
+
+                loaded = [self._segment(key, segment) for segment in segments]
+            except FileNotFoundError:
+                if attempt < 10:
+                    # A writer compacted the segments we listed; list them again
+                    time.sleep(0.01)
+                    return self._load(key, attempt + 1)
+                raise
+
+            # Forget segments another process has compacted away
+            cached = self._segment_cache.get(key, {})
+            self._segment_cache[key] = {segment[2]: cached[segment[2]] for segment in segments if segment[2] in cached}
+
+            if not loaded:
+                self._cache.pop(key, None)
+                return np.empty((0, 0), dtype=np.float32), {'ids': [], 'metadatas': [], 'documents': []}
+
+            if len(loaded) == 1:
+                matrix = loaded[0][0]
+            else:
+                matrix = np.concatenate([np.asarray(segment[0]) for segment in loaded])
+            records = {
+                field: [value for segment in loaded for value in segment[1][field]]
+                for field in ('ids', 'metadatas', 'documents')
+            }
+
+            self._cache[key] = (stamp, matrix, records)
+            return matrix, records
+
+    def _append(self, key: str, matrix: np.ndarray, records: Dict[str, list], base: bool = False) -> List[tuple]:
+        """Write a new segment after the document's existing ones; returns the segments it follows."""
+        directory = self._directory(key)
+        os.makedirs(directory, exist_ok=True)
+        segments = self._segments(key)
+        number = segments[-1][0] + 1 if segments else 1
+        matrix_file = os.path.join(directory, f"{number}.npy")
+        records_file = os.path.join(directory, f"{number}.json")
+
+        with open(matrix_file + '.tmp', 'wb') as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        with open(records_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(dict(records, base=True) if base else records, f)
+
+        # Vectors first: readers treat the JSON file as the commit point
+        os.replace(matrix_file + '.tmp', matrix_file)
+        os.replace(records_file + '.tmp', records_file)
+        return segments
+
+    def _save(self, key: str, matrix: np.ndarray, records: Dict[str, list]) -> None:
+        """Replace a document's records with one base segment, then drop the old segments."""
+        self._remove_segments(key, self._append(key, matrix, records, base=True))
+
+    def _remove(self, key: str) -> None:
+        self._remove_segments(key, self._segments(key))
+        with self._lock:
+            self._cache.pop(key, None)
+        try:
+            os.rmdir(self._directory(key))
+        except OSError:
+            pass
+
+    def _remove_segments(self, key: str, segments) -> None:
+        with self._lock:
+            for _, matrix_file, records_file, _, _ in segments:
+                # The JSON file goes first, so readers never see records without vectors
+                for file_path in (records_file, matrix_file):
+                    try:
+                        os.remove(file_path)
+                    except FileNotFoundError:
+                        pass
+                self._segment_cache.get(key, {}).pop(records_file, None)
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across threads and processes sharing the directory."""
+        with self._lock:
+            with open(os.path.join(self.path, '.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _keys_for_ids(self, ids) -> List[str]:
+        if self._id_index is None or any(record_id not in self._id_index for record_id in ids):
+            # Another process may have written these ids; rebuild from disk
+            self._id_index = {}
+            for key in self._all_keys():
+                for record_id in self._load(key)[1]['ids']:
+                    self._id_index[record_id] = key
+        return sorted({self._id_index[record_id] for record_id in ids if record_id in self._id_index})
+
+    def _keys_for_where(self, where: Optional[Dict[str, Any]]) -> List[str]:
+        condition = (where or {}).get('document_id')
+        if condition is None:
+            return self._all_keys()
+        if isinstance(condition, dict) and '$in' in condition:
+            return [str(document_id) for document_id in condition['$in']]
+        if isinstance(condition, dict):
+            return self._all_keys()
+        return [str(condition)]
+
+    @staticmethod
+    def _document_key(metadata: Dict[str, Any]) -> str:
+        document_id = metadata.get('document_id')
+        return str(document_id) if document_id is not None else 'none'
+
+    @classmethod
+    def _matches(cls, metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+        if not where:
+            return True
+        for field, condition in where.items():
+            if field == '$and':
+                if not all(cls._matches(metadata, clause) for clause in condition):
+                    return False
+            elif isinstance(condition, dict):
+                if '$in' in condition and metadata.get(field) not in condition['$in']:
+                    return False
+                if '$eq' in condition and metadata.get(field) != condition['$eq']:
+                    return False
+            elif metadata.get(field) != condition:
+                return False
+        return True
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def get_vector_store() -> VectorStore:
+    """Build the vector store selected by VECTOR_STORE_BACKEND."""
+    backend = settings.VECTOR_STORE_BACKEND
+    if backend == 'chroma':
+        return ChromaVectorStore(
+            host=settings.CHROMA_HOST,
+            port=settings.CHROMA_PORT,
+            collection_name=settings.CHROMA_COLLECTION
+        )
+    if backend == 'numpy':
+        return NumpyVectorStore(settings.VECTOR_STORE_PATH)
+    raise ValueError(f"Unsupported vector store backend: {backend}")
@@ -1,37 +1,164 @@
+import base64
+import hashlib
+import json
 import os
+import zipfile
+from datetime import datetime
+from asgiref.sync import markcoroutinefunction
 from rest_framework import status
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, JSONField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, JSONObject, Left
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Document, DocumentChunk
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from .models import Document, DocumentChunk, IngestionBatch, IngestionJob
 from .serializers import (
+    DocumentListSerializer,
     DocumentSerializer, 
     DocumentUploadSerializer, 
+    BatchQuestionSerializer,
     QuestionSerializer
 )
-from .document_processor import DocumentProcessor
-from .rag_engine import RAGEngine
-
-# Initialize RAG engine
-rag_engine = RAGEngine()
+from .batch_ingestion import batch_progress, create_batch, hash_upload, iter_archive
+from .jobs import enqueue_ingestion
+from .metrics import CONTENT_TYPE, render_metrics, track_stage
+from .rag_engine import get_rag_engine
 
 @api_view(['GET'])
 def get_documents(request):
-    """Retrieve all uploaded documents."""
+    """List documents newest first, one keyset-paginated page at a time.
+
+    Query parameters: `limit`, `cursor` (the previous page's `next_cursor`),
+    `status` and `file_type`. Pages carry an ETag and Last-Modified, so a
+    client revalidating an unchanged page gets an empty 304.
+    """
     try:
-        documents = Document.objects.all()
-        serializer = DocumentSerializer(documents, many=True)
-        return Response({
+        try:
+            limit, cursor, filters = _parse_listing_params(request.query_params)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        documents = Document.objects.filter(**filters).order_by('-created_at', '-id')
+        if cursor:
+            created_at, document_id = cursor
+            documents = documents.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=document_id))
+        # One extra row tells whether another page follows
+        page = list(_with_chunk_count(documents)[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        etag, last_modified = _page_validators(request, page)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return _set_validators(not_modified, etag, last_modified)
+
+        serializer = DocumentListSerializer(page, many=True)
+        return _set_validators(Response({
             'success': True,
             'documents': serializer.data,
-            'count': len(serializer.data)
-        })
+            'count': len(serializer.data),
+            'next_cursor': _encode_cursor(page[-1]) if has_more else None
+        }), etag, last_modified)
     except Exception as e:
         return Response({
             'success': False,
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _parse_listing_params(params):
+    """Return (limit, cursor, filters) from the listing query string."""
+    try:
+        limit = int(params.get('limit', settings.DOCUMENT_LIST_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer.')
+    if limit < 1:
+        raise ValueError('limit must be positive.')
+    limit = min(limit, settings.DOCUMENT_LIST_MAX_PAGE_SIZE)
+
+    filters = {}
+    processing_status = params.get('status')
+    if processing_status:
+        if processing_status not in dict(Document.PROCESSING_STATUS_CHOICES):
+            raise ValueError(f"Unknown status: {processing_status}")
+        filters['processing_status'] = processing_status
+    file_type = params.get('file_type', '').strip().lower()
+    if file_type:
+        filters['file_type'] = file_type if file_type.startswith('.') else f".{file_type}"
+
+    cursor = params.get('cursor')
+    return limit, _decode_cursor(cursor) if cursor else None, filters
+
+def _encode_cursor(document) -> str:
+    """Opaque cursor pointing just past `document` in (-created_at, -id) order."""
+    raw = json.dumps([document.created_at.isoformat(), document.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, document_id = json.loads(raw)
+        created_at = datetime.fromisoformat(created_at)
+        document_id = int(document_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor.')
+    if created_at.tzinfo is None:
+        raise ValueError('Invalid cursor.')
+    return created_at, document_id
+
+def _with_chunk_count(documents):
+    """Annotate `chunk_count` as a correlated subquery.
+
+    Unlike Count('chunks'), which joins and groups every chunk before the
+    LIMIT applies, the subquery only runs for the rows actually returned.
+    """
+    counts = (
+        DocumentChunk.objects
+        .filter(document=OuterRef('pk'))
+        .order_by()
+        .values('document')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return documents.annotate(chunk_count=Coalesce(Subquery(counts), 0))
+
+def _page_validators(request, page):
+    """ETag and Last-Modified for a listing page.
+
+    The ETag covers the query string and each row's id, updated_at and chunk
+    count, so it changes when a document is added, removed, reprocessed or
+    re-chunked; Last-Modified is the newest updated_at on the page.
+    """
+    digest = hashlib.sha256(request.GET.urlencode().encode('utf-8'))
+    for document in page:
+        digest.update(f"|{document.id}:{document.updated_at.isoformat()}:{document.chunk_count}".encode('utf-8'))
+    last_modified = max((document.updated_at for document in page), default=None)
+    return (
+        quote_etag(digest.hexdigest()[:32]),
+        # HTTP dates have whole-second precision
+        int(last_modified.timestamp()) if last_modified is not None else None
+    )
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Cacheable, but revalidated on every use
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @api_view(['POST'])
 def upload_document(request):
     """Upload and process a document."""
@@ -46,46 +173,60 @@ def upload_document(request):
         file = serializer.validated_data['file']
         title = serializer.validated_data.get('title', os.path.splitext(file.name)[0])
         
+        with track_stage('upload_hash'):
+            file_hash = hash_upload(file)
+        duplicate_of = (
+            Document.objects
+            .filter(content_hash=file_hash, processing_status='completed')
+            .order_by('created_at')
+            .first()
+        )
+        
         # Create document record
         document = Document.objects.create(
             title=title,
             file_type=os.path.splitext(file.name)[1].lower(),
             file_size=file.size,
-            processing_status='processing'
+            content_hash=file_hash,
+            processing_status='pending'
         )
         
-        # Save file
-        document.file_path = file
-        document.save()
-        
-        try:
-            # Extract text from document
-            text_content, page_count = DocumentProcessor.extract_text_from_file(file)
-            document.pages = page_count
-            
-            # Chunk the text
-            chunks = rag_engine.chunk_text(text_content)
-            
-            # Store embeddings
-            rag_engine.store_document_embeddings(document, chunks)
-            
-            # Update status
-            document.processing_status = 'completed'
+        if duplicate_of is not None:
+            # Identical bytes were processed before: share the stored file and reuse its chunks and vectors
+            document.file_path = duplicate_of.file_path.name
+            document.pages = duplicate_of.pages
+            document.processing_status = 'processing'
             document.save()
             
-            return Response({
-                'success': True,
-                'document': DocumentSerializer(document).data,
-                'chunks_created': len(chunks)
-            }, status=status.HTTP_201_CREATED)
-            
-        except Exception as processing_error:
-            document.processing_status = 'failed'
-            document.save()
-            return Response({
-                'success': False,
-                'error': f"Document processing failed: {str(processing_error)}"
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            try:
+                stats = get_rag_engine().clone_document_index(duplicate_of, document)
+                document.processing_status = 'completed'
+                document.save()
+                
+                return Response({
+                    'success': True,
+                    'document': DocumentSerializer(document).data,
+                    'deduplication': _dedup_summary(stats, duplicate_of)
+                }, status=status.HTTP_201_CREATED)
+            except Exception as e:
+                print(f"Reusing document {duplicate_of.id} failed, processing upload normally: {e}")
+                document.processing_status = 'pending'
+                document.save()
+        else:
+            # Save file
+            with track_stage('upload_save'):
+                document.file_path = file
+                document.save()
+        
+        # Extraction, chunking and embedding run in the ingestion worker
+        job = enqueue_ingestion(document)
+        
+        return Response({
+            'success': True,
+            'document': DocumentSerializer(document).data,
+            'job_id': job.id,
+            'deduplication': _dedup_summary(None, None)
+        }, status=status.HTTP_202_ACCEPTED)
             
     except Exception as e:
         return Response({
@@ -94,84 +235,431 @@ def upload_document(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
-def ask_question(request):
-    """Ask a question about a document using RAG."""
+def replace_document(request, document_id):
+    """Replace a document's file and re-index it, embedding only chunks whose text changed."""
+    document = get_object_or_404(Document, id=document_id)
     try:
-        serializer = QuestionSerializer(data=request.data)
+        serializer = DocumentUploadSerializer(data=request.data)
         if not serializer.is_valid():
             return Response({
                 'success': False,
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        document_id = serializer.validated_data['document_id']
-        question = serializer.validated_data['question']
-        num_chunks = serializer.validated_data.get('num_chunks', 3)
+        error_response = _check_not_ingesting(document)
+        if error_response is not None:
+            return error_response
         
-        # Get document with validation
-        try:
-            document = Document.objects.get(id=document_id)
-        except Document.DoesNotExist:
+        file = serializer.validated_data['file']
+        title = serializer.validated_data.get('title', document.title)
+        
+        with track_stage('upload_hash'):
+            file_hash = hash_upload(file)
+        if file_hash == document.content_hash and document.processing_status == 'completed':
+            if title != document.title:
+                # Same bytes: only the title in the stored chunk metadata changes
+                document.title = title
+                document.save(update_fields=['title', 'updated_at'])
+                job = enqueue_ingestion(_mark_pending(document))
+                return Response({
+                    'success': True,
+                    'document': DocumentSerializer(document).data,
+                    'job_id': job.id,
+                    'changed': False
+                }, status=status.HTTP_202_ACCEPTED)
             return Response({
-                'success': False,
-                'error': f'Document with ID {document_id} not found.'
-            }, status=status.HTTP_404_NOT_FOUND)
+                'success': True,
+                'document': DocumentSerializer(document).data,
+                'job_id': None,
+                'changed': False
+            })
+        
+        # The old file may be shared with duplicate uploads, so it is left in place
+        with track_stage('upload_save'):
+            document.title = title
+            document.file_path = file
+            document.file_type = os.path.splitext(file.name)[1].lower()
+            document.file_size = file.size
+            document.content_hash = file_hash
+            document.save()
+        
+        job = enqueue_ingestion(_mark_pending(document))
+        return Response({
+            'success': True,
+            'document': DocumentSerializer(document).data,
+            'job_id': job.id,
+            'changed': True
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+def reprocess_document(request, document_id):
+    """Extract and chunk a document's current file again, re-embedding only changed chunks."""
+    document = get_object_or_404(Document, id=document_id)
+    try:
+        error_response = _check_not_ingesting(document)
+        if error_response is not None:
+            return error_response
         
-        if document.processing_status != 'completed':
+        job = enqueue_ingestion(_mark_pending(document))
+        return Response({
+            'success': True,
+            'document': DocumentSerializer(document).data,
+            'job_id': job.id
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _check_not_ingesting(document):
+    """A 409 response when the document already has a queued or running ingestion job."""
+    if IngestionJob.objects.filter(document=document, status__in=['queued', 'running']).exists():
+        return Response({
+            'success': False,
+            'error': 'Document is already being processed.'
+        }, status=status.HTTP_409_CONFLICT)
+    return None
+
+def _mark_pending(document):
+    document.processing_status = 'pending'
+    document.save(update_fields=['processing_status', 'updated_at'])
+    return document
+
+@api_view(['POST'])
+def upload_documents_batch(request):
+    """Queue many files, or ZIP archives of files, as one ingestion batch."""
+    try:
+        uploads = request.FILES.getlist('files')
+        if not uploads:
+            return Response({
+                'success': False,
+                'error': 'Provide one or more files (or ZIP archives) in the "files" field.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        def files():
+            for upload in uploads:
+                if upload.name.lower().endswith('.zip'):
+                    yield from iter_archive(upload)
+                else:
+                    yield upload.name, upload
+
+        try:
+            batch = create_batch(files(), source=', '.join(upload.name for upload in uploads))
+        except (ValueError, zipfile.BadZipFile) as e:
             return Response({
                 'success': False,
-                'error': 'Document processing is not yet complete.'
+                'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'batch': batch_progress(batch, include_files=False)
+        }, status=status.HTTP_202_ACCEPTED)
+
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def batch_detail(request, batch_id):
+    """Report overall and per-file progress of an ingestion batch."""
+    batch = get_object_or_404(IngestionBatch, id=batch_id)
+    try:
+        include_files = request.query_params.get('files', 'true').lower() != 'false'
+        return Response({
+            'success': True,
+            'batch': batch_progress(batch, include_files=include_files)
+        })
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _dedup_summary(stats, duplicate_of):
+    """Describe how much of an ingest was served from earlier work."""
+    stats = stats or {}
+    hits = stats.get('embedding_cache_hits', 0)
+    misses = stats.get('embedding_cache_misses', 0)
+    return {
+        'duplicate_of': duplicate_of.id if duplicate_of else None,
+        'chunks_reused': stats.get('chunks', 0) if duplicate_of else 0,
+        'embedding_cache_hits': hits,
+        'embedding_cache_misses': misses,
+        'embedding_cache_hit_rate': hits / (hits + misses) if hits + misses else 0.0
+    }
+
+async def _aresolve_question(payload, serializer_class=QuestionSerializer):
+    """Validate a question request and load the documents it covers.
+
+    Returns (validated_data, documents, None) on success, where documents is a
+    list of Document objects or None for "all", or (None, None, (body, status))
+    when the request cannot be answered.
+    """
+    data, error = _validate_question(payload, serializer_class)
+    if error is not None:
+        return None, None, error
+    
+    if data.get('document_ids') == 'all':
+        available = await Document.objects.filter(processing_status='completed').aexists()
+        documents, error = _check_all_documents(available)
+    else:
+        document_ids = _question_document_ids(data)
+        documents, error = _check_documents(document_ids, await Document.objects.ain_bulk(document_ids))
+    
+    if error is not None:
+        return None, None, error
+    return data, documents, None
+
+def _validate_question(payload, serializer_class=QuestionSerializer):
+    serializer = serializer_class(data=payload)
+    if not serializer.is_valid():
+        return None, ({
+            'success': False,
+            'errors': serializer.errors
+        }, status.HTTP_400_BAD_REQUEST)
+    return serializer.validated_data, None
+
+def _question_document_ids(data):
+    return data['document_ids'] if 'document_ids' in data else [data['document_id']]
+
+def _check_all_documents(available):
+    if not available:
+        return None, ({
+            'success': False,
+            'error': 'No processed documents are available.'
+        }, status.HTTP_400_BAD_REQUEST)
+    return None, None
+
+def _check_documents(document_ids, documents):
+    """Order the loaded documents by request, or describe why they cannot be used."""
+    missing = [document_id for document_id in document_ids if document_id not in documents]
+    if missing:
+        return None, ({
+            'success': False,
+            'error': f"Document with ID {', '.join(map(str, missing))} not found."
+        }, status.HTTP_404_NOT_FOUND)
+    
+    if any(document.processing_status != 'completed' for document in documents.values()):
+        return None, ({
+            'success': False,
+            'error': 'Document processing is not yet complete.'
+        }, status.HTTP_400_BAD_REQUEST)
+    
+    return [documents[document_id] for document_id in document_ids], None
+
+def _scope_summary(documents):
+    """Describe the documents a question covered for the response body."""
+    if documents is None:
+        return {'documents': 'all'}
+    if len(documents) == 1:
+        return {'document': {'id': documents[0].id, 'title': documents[0].title}}
+    return {'documents': [{'id': document.id, 'title': document.title} for document in documents]}
+
+# csrf_exempt returns a plain function in Django 4.2; marking the view keeps it async
+@csrf_exempt
+@markcoroutinefunction
+async def ask_question(request):
+    """Ask a question about one document, several documents or all of them using RAG.
+
+    A native async view: under an ASGI worker the DeepSeek call is awaited on
+    the event loop, so one process serves many questions concurrently.
+    """
+    payload, error_response = _request_payload(request)
+    if error_response is not None:
+        return error_response
+    
+    try:
+        data, documents, error = await _aresolve_question(payload)
+        if error is not None:
+            body, status_code = error
+            return JsonResponse(body, status=status_code)
         
-        # Perform similarity search with validation
-        relevant_chunks = rag_engine.similarity_search(
-            query=question,
-            document_id=document_id,
-            num_results=num_chunks
-        )
+        question = data['question']
+        num_chunks = data.get('num_chunks', 3)
         
-        # Generate answer with the validated chunks
-        result = rag_engine.generate_answer(
+        # Retrieve context and generate the answer (or reuse a cached one)
+        result = await get_rag_engine().aanswer_question(
             question=question,
-            context_chunks=relevant_chunks,
-            document_title=document.title
+            documents=documents,
+            num_results=num_chunks,
+            retrieval_mode=data.get('retrieval_mode')
         )
         
-        return Response({
+        return JsonResponse({
             'success': True,
             'question': question,
             'answer': result['answer'],
             'sources': result['sources'],
-            'document': {
-                'id': document.id,
-                'title': document.title
-            },
-            'context_chunks_used': result['context_used']
+            **_scope_summary(documents),
+            'context_chunks_used': result['context_used'],
+            'cached': result['cached']
         })
         
     except Exception as e:
-        return Response({
+        return JsonResponse({
             'success': False,
             'error': f"An error occurred: {str(e)}"
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@csrf_exempt
+@markcoroutinefunction
+async def ask_questions_batch(request):
+    """Answer a list of questions about the same documents in one request.
+
+    Questions share one embedding call and one vector query, and their LLM
+    calls run concurrently, so the batch takes about as long as its slowest
+    question. Results keep the order of `questions`; a question that fails
+    is reported in its own entry without failing the others.
+    """
+    payload, error_response = _request_payload(request)
+    if error_response is not None:
+        return error_response
+    
+    try:
+        data, documents, error = await _aresolve_question(payload, BatchQuestionSerializer)
+        if error is not None:
+            body, status_code = error
+            return JsonResponse(body, status=status_code)
+        
+        questions = data['questions']
+        results = await get_rag_engine().aanswer_questions(
+            questions=questions,
+            documents=documents,
+            num_results=data.get('num_chunks', 3),
+            retrieval_mode=data.get('retrieval_mode')
+        )
+        
+        answers = []
+        for question, result in zip(questions, results):
+            if isinstance(result, Exception):
+                answers.append({
+                    'success': False,
+                    'question': question,
+                    'error': f"An error occurred: {str(result)}"
+                })
+                continue
+            answers.append({
+                'success': True,
+                'question': question,
+                'answer': result['answer'],
+                'sources': result['sources'],
+                'context_chunks_used': result['context_used'],
+                'cached': result['cached']
+            })
+        
+        return JsonResponse({
+            'success': True,
+            **_scope_summary(documents),
+            'count': len(answers),
+            'failed': sum(1 for answer in answers if not answer['success']),
+            'results': answers
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f"An error occurred: {str(e)}"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _request_payload(request):
+    """Parse a POST body for the async views the way @api_view does.
+
+    DRF 3.14 has no async views, so its configured parsers and error bodies
+    are applied here. Returns (payload, None) or (None, error_response).
+    """
+    if request.method != 'POST':
+        response = JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        response['Allow'] = 'POST, OPTIONS'
+        return None, response
+    
+    drf_request = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+    try:
+        return drf_request.data, None
+    except APIException as e:
+        # ParseError and UnsupportedMediaType, with DRF's {'detail': ...} body
+        return None, JsonResponse({'detail': e.detail}, status=e.status_code)
+
+@csrf_exempt
+@markcoroutinefunction
+async def ask_question_stream(request):
+    """Ask a question and stream the answer as Server-Sent Events.
+
+    Under ASGI the events come from an async generator reading DeepSeek's
+    stream, so Django sends each token as it arrives; it would buffer a sync
+    generator in full first. Under WSGI the sync generator streams as is.
+    """
+    payload, error_response = _request_payload(request)
+    if error_response is not None:
+        return error_response
+    
+    try:
+        data, documents, error = await _aresolve_question(payload)
+        if error is not None:
+            body, status_code = error
+            return JsonResponse(body, status=status_code)
+        
+        question = {
+            'question': data['question'],
+            'documents': documents,
+            'num_results': data.get('num_chunks', 3),
+            'retrieval_mode': data.get('retrieval_mode')
+        }
+        if isinstance(request, ASGIRequest):
+            events = _aformat_sse(get_rag_engine().astream_answer(**question))
+        else:
+            events = (_format_sse(event) for event in get_rag_engine().stream_answer(**question))
+        
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop proxies from buffering the stream
+        return response
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f"An error occurred: {str(e)}"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+async def _aformat_sse(events):
+    async for event in events:
+        yield _format_sse(event)
+
+def _format_sse(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
 @api_view(['GET'])
 def document_detail(request, document_id):
     """Get detailed information about a specific document."""
     try:
-        document = get_object_or_404(Document, id=document_id)
-        chunks = DocumentChunk.objects.filter(document=document)
-        
+        document = get_object_or_404(_detail_queryset(), id=document_id)
+        job = document.latest_job
+
         return Response({
             'success': True,
             'document': DocumentSerializer(document).data,
-            'total_chunks': chunks.count(),
+            'ingestion': {
+                **job,
+                'deduplication': _dedup_summary(job['stats'], None) if job['stats'] else None
+            } if job else None,
+            'total_chunks': document.chunk_count,
             'chunks_sample': [
                 {
-                    'index': chunk.chunk_index,
-                    'content_preview': chunk.content[:200] + "..." if len(chunk.content) > 200 else chunk.content,
-                    'page_number': chunk.page_number
+                    'index': chunk['index'],
+                    'content_preview': chunk['content'][:200] + "..." if len(chunk['content']) > 200 else chunk['content'],
+                    'page_number': chunk['page_number']
                 }
-                for chunk in chunks[:3]  # Show first 3 chunks as sample
+                for chunk in document.chunks_sample or []
             ]
         })
         
@@ -179,4 +667,49 @@ def document_detail(request, document_id):
         return Response({
             'success': False,
             'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _detail_queryset():
+    """Documents with chunk count, first three chunks and latest job in one query."""
+    sample = (
+        DocumentChunk.objects
+        .filter(document=OuterRef('pk'))
+        .order_by('chunk_index')
+        # 201 characters is enough to tell whether the preview is truncated
+        .values(json=JSONObject(index='chunk_index', content=Left('content', 201), page_number='page_number'))[:3]
+    )
+    latest_job = (
+        IngestionJob.objects
+        .filter(document=OuterRef('pk'))
+        .order_by('-created_at')
+        .values(json=JSONObject(job_id='id', status='status', stage='stage', attempts='attempts', error='error', stats='stats'))[:1]
+    )
+    return _with_chunk_count(Document.objects.all()).annotate(
+        chunks_sample=ArraySubquery(sample),
+        latest_job=Subquery(latest_job, output_field=JSONField())
+    )
+
+@api_view(['GET'])
+def engine_stats(request):
+    """Report query embedding batcher histograms and answer cache counters."""
+    rag_engine = get_rag_engine()
+    return Response({
+        'success': True,
+        'embedding_batcher': rag_engine.embedding_batcher.stats() if rag_engine.embedding_batcher else None,
+        'answer_cache': rag_engine.answer_cache.stats() if rag_engine.answer_cache else None
+    })
+
+@api_view(['GET'])
+def readiness(request):
+    """Report whether the embedding model is loaded and requests can be served quickly."""
+    state = get_rag_engine().readiness()
+    ready = state['embedding_model_loaded']
+    return Response({
+        'success': True,
+        'ready': ready,
+        **state
+    }, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+def metrics(request):
+    """Expose pipeline metrics in the Prometheus text format."""
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,209 @@
+"""Text extraction for Word files without building a document object model.
+
+A .docx file is a ZIP archive; its body is `word/document.xml`. That part
+is read with `iterparse` and each top-level paragraph or table is cleared
+once its text has been yielded, so memory does not grow with the document.
+Legacy binary .doc files are converted with antiword or LibreOffice when
+one of them is installed.
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, Set
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_BODY = _W + 'body'
+_PARAGRAPH = _W + 'p'
+_TABLE = _W + 'tbl'
+_ROW = _W + 'tr'
+_CELL = _W + 'tc'
+_TEXT = _W + 't'
+_TAB = _W + 'tab'
+_BREAKS = (_W + 'br', _W + 'cr')
+_STYLE = _W + 'pStyle'
+_OUTLINE_LEVEL = _W + 'outlineLvl'
+_VAL = _W + 'val'
+
+# Style ids python-docx and Word give headings when styles.xml can't be read
+_HEADING_STYLE_ID = re.compile(r'^(Heading\d*|Title|Subtitle)$', re.IGNORECASE)
+
+ZIP_SIGNATURE = b'PK\x03\x04'
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+CELL_SEPARATOR = ' | '
+
+
+def file_signature(file) -> bytes:
+    """First eight bytes of a file object, leaving it at the start."""
+    file.seek(0)
+    head = file.read(8)
+    file.seek(0)
+    return head
+
+
+def iter_docx_blocks(file) -> Iterator[str]:
+    """Yield the text of a .docx body in document order.
+
+    Each paragraph is one block; a heading is written as an
+    "=== Heading ===" marker line. Each table row is one block, its cells
+    joined by " | "; nested tables are folded into the enclosing cell.
+    Empty paragraphs and rows are skipped.
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not a valid DOCX file: {e}")
+
+    with archive:
+        headings = _heading_styles(archive)
+        try:
+            part = archive.open('word/document.xml')
+        except KeyError:
+            raise ValueError("Not a valid DOCX file: word/document.xml is missing")
+
+        with part:
+            yield from _iter_body(part, headings)
+
+
+def _iter_body(part, headings: Set[str]) -> Iterator[str]:
+    body = None
+    depth = 0  # Depth below <w:body>
+    paragraphs = []  # [runs, is heading] per open paragraph; text boxes nest them
+    tables = []  # One entry per open table: [current row cells, current cell texts]
+
+    for event, elem in ET.iterparse(part, events=('start', 'end')):
+        tag = elem.tag
+
+        if event == 'start':
+            if body is not None:
+                depth += 1
+            elif tag == _BODY:
+                body = elem
+            if tag == _PARAGRAPH:
+                paragraphs.append([[], False])
+            elif tag == _TABLE:
+                tables.append([[], []])
+            elif tag == _ROW and tables:
+                tables[-1][0] = []
+            elif tag == _CELL and tables:
+                tables[-1][1] = []
+            continue
+
+        if tag == _TEXT and paragraphs:
+            paragraphs[-1][0].append(elem.text or '')
+        elif tag == _TAB and paragraphs:
+            paragraphs[-1][0].append('\t')
+        elif tag in _BREAKS and paragraphs:
+            paragraphs[-1][0].append('\n')
+        elif tag == _STYLE and paragraphs:
+            paragraphs[-1][1] = paragraphs[-1][1] or elem.get(_VAL) in headings
+        elif tag == _OUTLINE_LEVEL and paragraphs:
+            paragraphs[-1][1] = paragraphs[-1][1] or elem.get(_VAL, '9').isdigit() and int(elem.get(_VAL)) < 9
+        elif tag == _PARAGRAPH and paragraphs:
+            runs, heading = paragraphs.pop()
+            text = ''.join(runs).strip()
+            if text:
+                if tables:
+                    tables[-1][1].append(text)
+                elif heading:
+                    yield f"=== {' '.join(text.split())} ==="
+                else:
+                    yield text
+        elif tag == _CELL and tables:
+            cell = ' '.join(tables[-1][1])
+            tables[-1][0].append(cell)
+        elif tag == _ROW and tables:
+            cells = [cell for cell in tables[-1][0] if cell]
+            if cells:
+                row = CELL_SEPARATOR.join(cells)
+                if len(tables) > 1:
+                    tables[-2][1].append(row)
+                else:
+                    yield row
+        elif tag == _TABLE and tables:
+            tables.pop()
+
+        if body is not None and tag != _BODY:
+            depth -= 1
+            if depth == 0:
+                # A top-level block is done: drop it so the tree stays small
+                body.clear()
+
+
+def _heading_styles(archive: zipfile.ZipFile) -> Set[str]:
+    """Ids of paragraph styles that are headings, read from word/styles.xml."""
+    try:
+        root = ET.fromstring(archive.read('word/styles.xml'))
+    except (KeyError, ET.ParseError):
+        return _DefaultHeadings()
+
+    headings = set()
+    for style in root.iter(_W + 'style'):
+        if style.get(_W + 'type') != 'paragraph':
+            continue
+        style_id = style.get(_W + 'styleId')
+        name = style.find(_W + 'name')
+        name = (name.get(_VAL) if name is not None else '').lower()
+        if name.startswith('heading') or name in ('title', 'subtitle') or style.find(f'{_W}pPr/{_OUTLINE_LEVEL}') is not None:
+            headings.add(style_id)
+    return headings
+
+
+class _DefaultHeadings(set):
+    """Heading style ids matched by name, for files without a styles part."""
+
+    def __contains__(self, style_id) -> bool:
+        return bool(style_id) and _HEADING_STYLE_ID.match(style_id) is not None
+
+
+def iter_doc_text(path: str) -> Iterator[str]:
+    """Yield the non-empty lines of a legacy binary .doc file.
+
+    Uses antiword if it is installed, otherwise LibreOffice (`soffice`) in
+    headless mode. Raises ValueError when neither is available.
+    """
+    antiword = shutil.which('antiword')
+    if antiword:
+        process = subprocess.Popen(
+            [antiword, '-m', 'UTF-8.txt', '-w', '0', path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        try:
+            for line in process.stdout:
+                line = line.decode('utf-8', errors='replace').strip()
+                if line:
+                    yield line
+        finally:
+            process.stdout.close()
+            _, error = process.communicate()
+        if process.returncode:
+            raise ValueError(f"antiword could not read the .doc file: {error.decode('utf-8', errors='replace').strip()}")
+        return
+
+    soffice = shutil.which('soffice') or shutil.which('libreoffice')
+    if soffice:
+        with tempfile.TemporaryDirectory() as out_dir:
+            result = subprocess.run(
+                [soffice, '--headless', '--convert-to', 'txt:Text (encoded):UTF8', '--outdir', out_dir, path],
+                capture_output=True,
+                timeout=600
+            )
+            converted = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + '.txt')
+            if result.returncode or not os.path.exists(converted):
+                raise ValueError(f"LibreOffice could not convert the .doc file: {result.stderr.decode('utf-8', errors='replace').strip()}")
+            with open(converted, 'r', encoding='utf-8-sig', errors='replace') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield line
+        return
+
+    raise ValueError(
+        "Legacy .doc files need antiword or LibreOffice installed on the server; "
+        "alternatively save the file as .docx"
+    )
@@ -1,5 +1,22 @@
 # gunicorn.conf.py
-workers = 1  # Reduce workers (1 is safer for free tier)
+import os
+
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))  # Reduce workers (1 is safer for free tier)
 timeout = 120  # Increase timeout
 keepalive = 5
-worker_class = "sync"  # Default (avoid async workers)
\ No newline at end of file
+# "sync" serves one request per worker at a time. With
+# "uvicorn.workers.UvicornWorker" each worker runs the ASGI app and keeps many
+# /api/ask/ requests in flight while they wait on the LLM.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+wsgi_app = 'documents.asgi:application' if 'uvicorn' in worker_class.lower() else 'document_intelligence.wsgi:application'
+
+def post_worker_init(worker):
+    # Load the embedding model in the background so the worker accepts
+    # requests (and answers readiness probes) straight away
+    import threading
+
+    if os.getenv('RAG_WARMUP_ON_START', 'true').lower() != 'true':
+        return
+
+    from documents.rag_engine import get_rag_engine
+    threading.Thread(target=get_rag_engine().warm_up, name='rag-warm-up', daemon=True).start()